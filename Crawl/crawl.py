@@ -0,0 +1,75 @@
+from openpyxl import load_workbook
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import event_log, http_cache, run_report
+from common.pipeline import EXTRACTORS, run_pipeline
+import extractors  # noqa: F401  (registers the script extractors)
+
+# Runs several scripts' extractors over one URL list, fetching and parsing each
+# page once. Every extractor writes its own output file (see Crawl/extractors.py).
+
+# Config
+INPUT_FILE = "input.xlsx"
+URL_SHEET = "batch1"
+URL_HEADER = "URL"
+ELEMENT_SHEET = "element"       # components to flag, as in Identify-component's input (optional)
+ELEMENT_HEADER = "Component"
+ENABLED = ["components", "invalid_html", "text_blocks", "side_nav"]
+WORKERS = 4                     # pages fetched in parallel while earlier ones are extracted
+PROCESSES = 0                   # >0 parses/extracts in this many processes (one per core) instead of here
+OUTPUT_MAX_ROWS = None          # rotate each output to <name>_2.xlsx, ... after this many rows
+OUTPUT_MAX_MB = None            # or after roughly this much cell data
+EVENT_LOG = "crawl_events.jsonl" # one record per URL (common/event_log.py)
+
+
+def find_column(sheet, header_name):
+    for col in range(1, sheet.max_column + 1):
+        val = sheet.cell(row=1, column=col).value
+        if val and str(val).strip() == header_name:
+            return col
+    raise ValueError(f"Column '{header_name}' not found in sheet '{sheet.title}'")
+
+def read_inputs():
+    """(urls, components or None) from INPUT_FILE."""
+    wb = load_workbook(INPUT_FILE)
+    url_sheet_obj = wb[URL_SHEET]
+    url_col = find_column(url_sheet_obj, URL_HEADER)
+    urls = {}
+    for row in range(2, url_sheet_obj.max_row + 1):
+        url_val = url_sheet_obj.cell(row=row, column=url_col).value
+        if url_val:
+            urls[str(url_val).strip()] = True
+
+    components = None
+    if ELEMENT_SHEET in wb.sheetnames:
+        element_sheet_obj = wb[ELEMENT_SHEET]
+        element_col = find_column(element_sheet_obj, ELEMENT_HEADER)
+        components = set()
+        for row in range(2, element_sheet_obj.max_row + 1):
+            comp_val = element_sheet_obj.cell(row=row, column=element_col).value
+            if comp_val:
+                components.update(c.strip() for c in str(comp_val).split(","))
+        components = sorted(c for c in components if c)
+    return list(urls), components
+
+def main():
+    run_report.start(__file__)
+    urls, components = read_inputs()
+    options = {"components": {"components": components}, "hero_components": {"components": components}} if components else {}
+    extractors = [EXTRACTORS[name](**options.get(name, {})) for name in ENABLED]
+    headers = {"x-user-agent": "AU-AEM-Importer"}
+
+    print(f"🔍 {len(urls)} URLs → {', '.join(extractor.name for extractor in extractors)}")
+    with event_log.EventLog(EVENT_LOG) as events:
+        sinks = run_pipeline(urls, extractors, headers, workers=WORKERS, processes=PROCESSES, events=events,
+                             max_rows=OUTPUT_MAX_ROWS, max_mb=OUTPUT_MAX_MB)
+        for name, sink in sinks.items():
+            print(f"✅ {name} written to {', '.join(sink.files)} ({sink.rows_written} rows)")
+            events.write("output", extractor=name, files=sink.files, rows=sink.rows_written)
+        print(f"🔌 {http_cache.summary()}")
+        events.write("http", summary=http_cache.summary())
+
+
+if __name__ == "__main__":
+    main()
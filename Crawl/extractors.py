@@ -0,0 +1,86 @@
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.css_index import load_css_index
+from common.pipeline import ROOT, Extractor, load_script, register
+
+# The existing scripts' extractors as pipeline plugins. Each runs on the page
+# tree parsed once by run_pipeline instead of fetching and parsing on its own.
+# They look their script's function up when called, rather than keeping it as
+# an attribute, so they pickle to the pipeline's worker processes.
+
+DEFAULT_COMPONENTS = ["2016 Text Block", "2016 Collapsible Content", "2016 Hero Image", "Magazine Article"]
+
+
+@register
+class ComponentFlags(Extractor):
+    """Identify-component/detectComponent.py: 1/0 per component found on the page."""
+    name = "components"
+    output_file = "components.xlsx"
+    script = ("Identify-component", "detectComponent")
+
+    def __init__(self, components=DEFAULT_COMPONENTS):
+        self.components = list(components)
+
+    def extract(self, page):
+        detect = load_script(*self.script).detect_components
+        return [{"URL": page.url, **detect(page.html, self.components, soup=page.soup)}]
+
+    def failed(self, url, reason):
+        # pages that couldn't be fetched still get a row, all 0, as in the script
+        return [{"URL": url, **{comp: 0 for comp in self.components}}]
+
+
+@register
+class HeroComponentFlags(ComponentFlags):
+    """Identify-component/component_check.py: components whose section also has hero-image-full."""
+    name = "hero_components"
+    output_file = "hero_components.xlsx"
+    script = ("Identify-component", "component_check")
+
+
+@register
+class InvalidHtml(Extractor):
+    """GetTextBlockHtml/detectComponent.py: pages with a Text Block / Collapsible that needs an HTML embed."""
+    name = "invalid_html"
+    output_file = "invalid_html.xlsx"
+
+    def extract(self, page):
+        invalid_html_rule = load_script("GetTextBlockHtml", "detectComponent").invalid_html_rule
+        rule = invalid_html_rule(page.html, soup=page.soup)
+        if rule:
+            return [{"URL": page.url, "Invalid HTML": "✅", "Rule": rule}]
+        return []
+
+
+@register
+class TextBlockCF(Extractor):
+    """GetTextBlockHtml/detectAndCreateCF.py: HTML embed CFs for text blocks with invalid HTML."""
+    name = "text_blocks"
+    output_file = "text_block_cf_out.xlsx"
+
+    def __init__(self, element="2016 Text Block"):
+        self.element = element
+        css_dir = os.path.join(ROOT, "GetTextBlockHtml")
+        self.css_index = load_css_index(
+            os.path.join(css_dir, "au-styles.css"),
+            extra_files=[os.path.join(css_dir, "extracted_css.css")],
+            cache_dir=os.path.join(css_dir, ".css_index_cache"),
+        )
+
+    def extract(self, page):
+        extract_text_blocks = load_script("GetTextBlockHtml").extract_text_blocks
+        blocks = extract_text_blocks(page.html, page.url, self.element, self.css_index, soup=page.soup)
+        return [cf for element_id, cf in blocks if cf]
+
+
+@register
+class SideNavCF(Extractor):
+    """SideNav/navtocsv.py: the side nav CF for pages with a left navigation."""
+    name = "side_nav"
+    output_file = "side_nav_cf_out.xlsx"
+
+    def extract(self, page):
+        extract_sidenav = load_script("SideNav", "navtocsv").extract_sidenav
+        row = extract_sidenav(page.html, page.url, soup=page.soup)
+        return [row] if row else []
@@ -1,10 +1,15 @@
 import requests
-from bs4 import BeautifulSoup
 from openpyxl import load_workbook
 from urllib.parse import urlparse
 import os
-import pandas as pd
-import cssutils
+import copy
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import http_cache, run_report
+from common.cf_sink import open_sink
+from common.css_index import load_css_index
+from common.html_parser import parse_html
+from common.markup_rules import MarkupRules, at_most_one, forbidden, jump_to_buttons, parent_is
 
 # Config
 TEMPLATE_PATH = "/conf/au/settings/dam/cfm/models/htmlEmbed"
@@ -12,6 +17,15 @@ OUTPUT_XLSX = "output.xlsx"
 BASE_CF_PATH = "/content/dam/au/cf/html"
 BASE_ASSET_PATH = "/content/dam/au/assets"
 BASE_PAGE_PATH = "/content/au"
+# What makes a section need an HTML embed CF (see common/markup_rules.py)
+INVALID_HTML_RULES = MarkupRules([
+    forbidden("dl", "dt", "form", "table"),
+    at_most_one("img"),
+    at_most_one("figure"),
+    at_most_one("blockquote"),
+    parent_is("img", "figure"),
+    jump_to_buttons(),
+])
 
 
 def convert_url_to_path(url):
@@ -29,55 +43,73 @@ def get_page_name(url):
     page_name, _ = os.path.splitext(filename)
     return page_name
 
-def get_relevant_classes(css_parser, classList):
-    relevant_classes = ""
-    for rule in css_parser.cssRules:
-        if rule.type == rule.STYLE_RULE:
-            selector_text = rule.selectorText
-            for class_name in classList:
-                if f".{class_name}" in selector_text:
-                    processed_selectors = '.html-embed-wrapper ' + selector_text.replace(",", ", .html-embed-wrapper")
-                    if rule.parentRule is None:
-                        relevant_classes += f"{processed_selectors} {{{rule.style.cssText}}}\n"
-                    else:
-                        relevant_classes += f"{rule.parentRule.cssText} {{ {processed_selectors} {{{rule.style.cssText}}} }}\n"
-        elif rule.type == rule.MEDIA_RULE:
-            media_relevant = ""
-            for sub_rule in rule.cssRules:
-                if sub_rule.type == sub_rule.STYLE_RULE:
-                    selector_text = sub_rule.selectorText
-                    for class_name in classList:
-                        if f".{class_name}" in selector_text:
-                            processed_selectors = '.html-embed-wrapper ' + selector_text.replace(",", ", .html-embed-wrapper")
-                            media_relevant += f"{processed_selectors} {{{sub_rule.style.cssText}}}\n"
-            if media_relevant:
-                relevant_classes += f"@media {rule.media.mediaText} {{\n{media_relevant}}}\n"
-    return relevant_classes
+def get_relevant_classes(css_index, classList):
+    return css_index.relevant_css(classList)
 
 def invalidHtml(section):
-        # return true if dl, dt, form, or table exist
-    if section.select_one("dl, dt, form, table") is not None:
-        return True
-    # return true if multiple img or figure exist
-    if len(section.select("img")) > 1 or len(section.select("figure")) > 1:
-        return True
-    # return true if multiple blockquotes exist
-    if len(section.select("blockquote")) > 1:
-        return True
-    # return true if img parent is not figure
-    for img in section.select("img"):
-        if img.parent.name != "figure":
-            return True
-    
-    # === ADDED: return true if has inline buttons (Jump To links) ===
-    paragraphs = section.select("p")
-    for p in paragraphs:
-        strong_text = p.find("strong")
-        has_buttons = len(p.select("a.btn")) > 0
-        if strong_text and "Jump To" in strong_text.get_text() and has_buttons:
-            return True
-    
-    return False
+    # return true if any INVALID_HTML_RULES rule fires on the section
+    # (including inline buttons: Jump To links)
+    return INVALID_HTML_RULES.first_violation(section) is not None
+
+def extract_text_blocks(html, url_val, element, css_index, soup=None):
+    """Return (element_id, cf) for every `element` section on the page; cf is None when its HTML is valid.
+
+    soup is the page already parsed, instead of html; it is left unmodified.
+    """
+    if soup is None:
+        soup = parse_html(html)
+    results = []
+
+    for section in soup.find_all("section"):
+        data_element = section.get("data-element", "").strip().lower()
+        element_id = section.get("id", "").strip().lower()
+
+        if data_element == "2016 Collapsible Content".lower():
+            data_element = element.lower()
+            # set element id equal to section parent id
+            element_id = section.parent.get("id", "").strip().lower() + "-collapse"
+            # set section to section child with collapse class
+            section = section.css.select_one(".collapse")
+            # remove collapse class from section (a copy, so the page tree stays as parsed)
+            if section and "collapse" in section.get("class", []):
+                section = copy.copy(section)
+                section["class"] = [cls for cls in section.get("class", []) if cls != "collapse"]
+
+        comp_clean = element.lower()
+        if data_element == comp_clean:
+            rule = INVALID_HTML_RULES.first_violation(section)
+            if rule:
+                run_report.count("invalid_html", rule)
+                rawHtml = section.prettify()
+                rawHtml = rawHtml.replace('/index.cfm', '/')
+                rawHtml = rawHtml.replace('.cfm', '')
+                rawHtml = rawHtml.replace('src="/', f'src="{BASE_ASSET_PATH}/')
+                rawHtml = rawHtml.replace('href="/', f'href="{BASE_PAGE_PATH}/')
+
+                class_list = []
+                for child in section.descendants:
+                    if hasattr(child, 'get'):
+                        class_attr = child.get('class')
+                        if class_attr:
+                            for cls in class_attr:
+                                if cls not in class_list:
+                                    class_list.append(cls)
+                relevant_css = get_relevant_classes(css_index, class_list)
+                rawHtmlCandidate = f"\n<style>\n{relevant_css}</style>" + rawHtml
+                rawHtml = rawHtmlCandidate if rawHtmlCandidate.__len__() < 32000 else rawHtml
+
+
+                results.append((element_id, {
+                    "path": convert_url_to_path(url_val),   
+                    "name": element_id,
+                    "title": element_id,
+                    "template": TEMPLATE_PATH,
+                    "html": rawHtml
+                }))
+            else:
+                results.append((element_id, None))
+
+    return results
 
 def expand_elements(
     input_file,
@@ -85,8 +117,11 @@ def expand_elements(
     element="2016 Text Block",
     url_header="URL",
     output_sheet_name="expanded",
-    cf_output_file_name="cf_out.xlsx"
+    cf_output_file_name="cf_out.xlsx",
+    cf_output_max_rows=None,
+    cf_output_max_mb=None
 ):
+    run_report.start(__file__)
     wb = load_workbook(input_file)
     url_sheet_obj = wb[url_sheet]
 
@@ -119,91 +154,48 @@ def expand_elements(
 
     headers = {"x-user-agent": "AU-AEM-Importer"}
 
-    # --- Parse legacy CSS ---
-    css_parser = cssutils.parseFile("au-styles.css")
+    # --- Load legacy CSS rule index (parsed once, then cached until the CSS changes) ---
+    css_index = load_css_index("au-styles.css", extra_files=["extracted_css.css"])
 
-    # --- Process URLs ---
+    # --- Process URLs, streaming CF rows to the output as they are built ---
     row_idx = 2
-    cfs = []
-    for row_idx_place, url in enumerate(urls.values(), start=2):
-        url_val = url["URL"]
-
-        try:
-            response = requests.get(url_val, headers=headers, timeout=10)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, "html.parser")
-
-                for section in soup.find_all("section"):
-                    data_element = section.get("data-element", "").strip().lower()
-                    element_id = section.get("id", "").strip().lower()
-
-                    if data_element == "2016 Collapsible Content".lower():
-                        data_element = element.lower()
-                        # set element id equal to section parent id
-                        element_id = section.parent.get("id", "").strip().lower() + "-collapse"
-                        # set section to section child with collapse class
-                        section = section.css.select_one(".collapse")
-                        # remove collapse class from section
-                        if section and "collapse" in section.get("class", []):
-                            section["class"] = [cls for cls in section.get("class", []) if cls != "collapse"]
-
-                    comp_clean = element.lower()
-                    if data_element == comp_clean:
-                        if invalidHtml(section):
-                            out_sheet.cell(row=row_idx, column=1, value=url_val)
-                            out_sheet.cell(row=row_idx, column=2, value=element_id)
-                            out_sheet.cell(row=row_idx, column=3, value="✅")
-                            rawHtml = section.prettify()
-                            rawHtml = rawHtml.replace('/index.cfm', '/')
-                            rawHtml = rawHtml.replace('.cfm', '')
-                            rawHtml = rawHtml.replace('src="/', f'src="{BASE_ASSET_PATH}/')
-                            rawHtml = rawHtml.replace('href="/', f'href="{BASE_PAGE_PATH}/')
-
-                            class_list = []
-                            for child in section.descendants:
-                                if hasattr(child, 'get'):
-                                    class_attr = child.get('class')
-                                    if class_attr:
-                                        for cls in class_attr:
-                                            if cls not in class_list:
-                                                class_list.append(cls)
-                            relevant_css = get_relevant_classes(css_parser, class_list)
-                            rawHtmlCandidate = f"\n<style>\n{relevant_css}</style>" + rawHtml
-                            rawHtml = rawHtmlCandidate if rawHtmlCandidate.__len__() < 32000 else rawHtml
-
-
-                            cfs.append({
-                                "path": convert_url_to_path(url_val),   
-                                "name": element_id,
-                                "title": element_id,
-                                "template": TEMPLATE_PATH,
-                                "html": rawHtml
-                            })
-                            row_idx += 1
-                        else:
-                            out_sheet.cell(row=row_idx, column=1, value=url_val)
-                            out_sheet.cell(row=row_idx, column=2, value=element_id)
-                            out_sheet.cell(row=row_idx, column=3, value="❌")
-                            row_idx += 1
-            else:
-                print(f"⚠️ {url_val} → HTTP {response.status_code}")
-        except requests.exceptions.RequestException:
-            print(f"❌ Failed to fetch {url_val}")
-
-        # --- Write results ---
-        #for i, comp in enumerate(components, start=3):
-        #    out_sheet.cell(row=row_idx, column=i, value=dom_matches.get(comp, 0))
-
-        print(f"✅ Processed: {url_val}\n#{row_idx_place}/{len(urls)}")
-
-    wb.save(input_file)
+    with open_sink(cf_output_file_name, max_rows=cf_output_max_rows, max_mb=cf_output_max_mb) as sink:
+        for row_idx_place, url in enumerate(urls.values(), start=2):
+            url_val = url["URL"]
+
+            try:
+                response = http_cache.get(url_val, headers=headers, timeout=10)
+                if response.status_code == 200:
+                    with run_report.stage("extract"):
+                        textBlocks = extract_text_blocks(response.text, url_val, element, css_index)
+                    for element_id, cf in textBlocks:
+                        out_sheet.cell(row=row_idx, column=1, value=url_val)
+                        out_sheet.cell(row=row_idx, column=2, value=element_id)
+                        out_sheet.cell(row=row_idx, column=3, value="✅" if cf else "❌")
+                        run_report.emit(f"{input_file}:{output_sheet_name}")
+                        if cf:
+                            sink.write(cf)
+                        row_idx += 1
+                else:
+                    print(f"⚠️ {url_val} → HTTP {response.status_code}")
+                    run_report.count("failures", f"HTTP {response.status_code}")
+            except requests.exceptions.RequestException:
+                print(f"❌ Failed to fetch {url_val}")
+                run_report.count("failures", "Failed to fetch")
+
+            # --- Write results ---
+            #for i, comp in enumerate(components, start=3):
+            #    out_sheet.cell(row=row_idx, column=i, value=dom_matches.get(comp, 0))
+
+            print(f"✅ Processed: {url_val}\n#{row_idx_place}/{len(urls)}")
+
+    with run_report.stage("save"):
+        wb.save(input_file)
     print(f"\n✅ Results saved to '{output_sheet_name}' in {input_file}")
 
     # --- Save CF Output ---
-    cf_out_df = pd.DataFrame(cfs)
-    print(f"{cfs}")
-    cf_out_df.to_excel(cf_output_file_name, index=False)
-    print(f"✅ CF Output written to {cf_output_file_name}")
+    print(f"✅ CF Output written to {', '.join(sink.files)} ({sink.rows_written} rows)")
+    print(f"🔌 {http_cache.summary()}")
 
 
 if __name__ == "__main__":
@@ -1,16 +1,30 @@
-import requests
-from bs4 import BeautifulSoup
 from openpyxl import load_workbook
 from urllib.parse import urlparse
 import os
 import pandas as pd
 import cssutils
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import http_cache, run_report
+from common.markup_rules import MarkupRules, at_most_one, forbidden, parent_is
+from common.markup_stream import first_violation
+from common.pipeline import fetch_pages
 
 # Config
 TEMPLATE_PATH = "/conf/au/settings/dam/cfm/models/htmlEmbed"
 OUTPUT_XLSX = "output.xlsx"
 BASE_CF_PATH = "/content/dam/au/cf/html"
 BASE_PAGE_PATH = "/content/au"
+WORKERS = 8     # pages fetched ahead in parallel; how many hit the server at once adapts to it
+SECTION_ELEMENTS = ["2016 Collapsible Content", "2016 Text Block"]
+# What makes one of those sections need an HTML embed (see common/markup_rules.py)
+INVALID_HTML_RULES = MarkupRules([
+    forbidden("dl", "dt", "form", "table"),
+    at_most_one("img"),
+    at_most_one("figure"),
+    at_most_one("blockquote"),
+    parent_is("img", "figure"),
+])
 
 
 def convert_url_to_path(url):
@@ -54,20 +68,23 @@ def get_relevant_classes(css_parser, classList):
     return relevant_classes
 
 def invalidHtml(section):
-    # return true if dl, dt, form, or table exist
-    if section.css.select_one("dl, dt, form, table") is not None:
-        return True
-    # return true if multiple img or figure exist
-    if len(section.css.select("img")) > 1 or len(section.css.select("figure")) > 1:
-        return True
-    # return true if multiple blockquotes exist
-    if len(section.css.select("blockquote")) > 1:
-        return True
-    # return true if img parent is not figure
-    for img in section.css.select("img"):
-        if img.parent.name != "figure":
-            return True
-    return False
+    # return true if any INVALID_HTML_RULES rule fires on the section
+    return INVALID_HTML_RULES.first_violation(section) is not None
+
+def invalid_html_rule(html, soup=None):
+    """The rule the page's first invalid Text Block / Collapsible breaks, or None when they are all valid."""
+    # soup: the page already parsed (e.g. by Crawl/crawl.py), instead of html
+    if soup is None:
+        # no tree: the tag events, read until a rule fires (see common/markup_stream.py)
+        return first_violation(html, INVALID_HTML_RULES, "section", {"data-element": SECTION_ELEMENTS})
+
+    # every Text Block and Collapsible, in one pass, walked until a rule fires
+    sections = soup.find_all("section", {"data-element": SECTION_ELEMENTS})
+    _, rule = INVALID_HTML_RULES.first_violation_in(sections)
+    return rule
+
+def page_has_invalid_html(html, soup=None):
+    return invalid_html_rule(html, soup=soup) is not None
 
 def expand_elements(
     input_file,
@@ -75,6 +92,7 @@ def expand_elements(
     url_header="URL",
     output_sheet_name="expanded"
 ):
+    run_report.start(__file__)
     wb = load_workbook(input_file)
     url_sheet_obj = wb[url_sheet]
 
@@ -106,42 +124,35 @@ def expand_elements(
     # --- Process URLs ---
     row_idx = 2
     cfs = []
-    for row_idx_place, url in enumerate(urls.values(), start=2):
-        url_val = url["URL"]
-
-        try:
-            response = requests.get(url_val, headers=headers, timeout=10)
+    # (fetched in input order, WORKERS pages ahead)
+    pages = fetch_pages(list(urls), headers, workers=WORKERS)
+    for row_idx_place, (url_val, response, error) in enumerate(pages, start=2):
+        if error is None:
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, "html.parser")
-
-                # soup find all data-element = 2016 Collapsible Content
-                collapsibles = soup.find_all("section", {"data-element": "2016 Collapsible Content"})
-
-                # soup find all data-element = 2016 Text Block
-                text_blocks = soup.find_all("section", {"data-element": "2016 Text Block"})
-
-                # iterate through all collapsibles and text blocks
-                pageHasInvalidHtml = False
-                for section in collapsibles + text_blocks:
-                    if invalidHtml(section):
-                        pageHasInvalidHtml = True
-                        break
-                
-                if pageHasInvalidHtml:
+                with run_report.stage("extract"):
+                    rule = invalid_html_rule(response.text)
+                if rule:
                     out_sheet.cell(row=row_idx, column=1, value=url_val)
                     out_sheet.cell(row=row_idx, column=2, value="✅")
+                    out_sheet.cell(row=row_idx, column=3, value=rule)
+                    run_report.count("invalid_html", rule)
+                    run_report.emit(f"{input_file}:{output_sheet_name}")
                     row_idx += 1
 
 
             else:
                 print(f"⚠️ {url_val} → HTTP {response.status_code}")
-        except requests.exceptions.RequestException:
+                run_report.count("failures", f"HTTP {response.status_code}")
+        else:
             print(f"❌ Failed to fetch {url_val}")
+            run_report.count("failures", "Failed to fetch")
 
         print(f"✅ Processed: {url_val}\n#{row_idx_place} of {len(urls)}")
 
-    wb.save(input_file)
+    with run_report.stage("save"):
+        wb.save(input_file)
     print(f"\n✅ Results saved to '{output_sheet_name}' in {input_file}")
+    print(f"🔌 {http_cache.summary()}")
 
 
 if __name__ == "__main__":
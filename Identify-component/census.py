@@ -0,0 +1,107 @@
+from openpyxl import load_workbook
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import http_cache, run_report
+from common.census import CensusWriter
+from common.component_rules import component_matcher
+from common.html_parser import parse_html, subtrees
+from common.pipeline import fetch_pages
+
+# Site-wide census of the components in the element sheet: for every page of the
+# URL list, how many sections are each component. Pages stream through one at a
+# time, so the URL list can be as long as the site; the census is written to
+# CENSUS_DIR and queried with
+#   python -m common.census census summary | pages COMPONENT | page URL | together A B
+# (see common/census.py).
+
+# Config
+INPUT_FILE = "input.xlsx"
+URL_SHEET = "batch1"            # or a .txt file of URLs, one per line, as INPUT_FILE
+URL_HEADER = "URL"
+ELEMENT_SHEET = "element"
+ELEMENT_HEADER = "Component"
+CENSUS_DIR = "census"
+WORKERS = 8                     # pages fetched ahead in parallel; how many hit the server at once adapts to it
+PROGRESS_EVERY = 500            # print a progress line every this many pages
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "component_rules.json")
+RULE_SET = "detectComponent"    # a section is a component by its data-element or one of its classes
+PARSE_ONLY = subtrees("section")
+
+
+def sheet_column(wb, sheet_name, header_name):
+    """Yield the non-empty values under a header, reading the sheet as a stream."""
+    rows = wb[sheet_name].iter_rows(values_only=True)
+    header = next(rows, ())
+    columns = [col for col, val in enumerate(header) if val and str(val).strip() == header_name]
+    if not columns:
+        raise ValueError(f"Column '{header_name}' not found in sheet '{sheet_name}'")
+    for row in rows:
+        val = row[columns[0]] if columns[0] < len(row) else None
+        if val:
+            yield str(val).strip()
+
+
+def read_urls(input_file):
+    if input_file.endswith(".txt"):
+        with open(input_file, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield line.strip()
+        return
+    wb = load_workbook(input_file, read_only=True)
+    try:
+        yield from sheet_column(wb, URL_SHEET, URL_HEADER)
+    finally:
+        wb.close()
+
+
+def read_components(element_file):
+    wb = load_workbook(element_file, read_only=True)
+    try:
+        components = set()
+        for comp_val in sheet_column(wb, ELEMENT_SHEET, ELEMENT_HEADER):
+            components.update(c.strip() for c in comp_val.split(","))
+    finally:
+        wb.close()
+    return sorted(c for c in components if c)
+
+
+def count_components(html, matcher, soup=None):
+    # soup: the page already parsed, instead of html
+    if soup is None:
+        soup = parse_html(html, only=PARSE_ONLY)
+    return matcher.counts(soup)
+
+
+def main(input_file=INPUT_FILE, element_file=None, census_dir=CENSUS_DIR):
+    run_report.start(__file__)
+    components = read_components(element_file or input_file)
+    matcher = component_matcher(RULES_FILE, RULE_SET, components)
+    headers = {"x-user-agent": "AU-AEM-Importer"}
+
+    print(f"🔍 Census of {len(matcher.components)} components → {census_dir}")
+    with CensusWriter(census_dir, matcher.components) as census:
+        for url_val, response, error in fetch_pages(read_urls(input_file), headers, workers=WORKERS):
+            if error is not None:
+                print(f"❌ Failed to fetch {url_val}")
+                run_report.count("failures", "Failed to fetch")
+                census.add(url_val, {}, status=0)
+            elif response.status_code != 200:
+                print(f"⚠️ {url_val} → HTTP {response.status_code}")
+                run_report.count("failures", f"HTTP {response.status_code}")
+                census.add(url_val, {}, status=response.status_code)
+            else:
+                with run_report.stage("extract"):
+                    counts = count_components(response.text, matcher)
+                census.add(url_val, counts)
+            run_report.emit(census_dir)
+            if census.pages % PROGRESS_EVERY == 0:
+                print(f"✅ Processed {census.pages:,} pages")
+
+    print(f"✅ Census of {census.pages:,} pages written to {census_dir} ({census.failed:,} not fetched with HTTP 200)")
+    print(f"🔌 {http_cache.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,24 @@
-import requests
-from bs4 import BeautifulSoup
 from openpyxl import load_workbook
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import http_cache, run_report
+from common.component_rules import component_matcher
+from common.html_parser import parse_html, subtrees
+from common.pipeline import fetch_pages
+
+WORKERS = 8     # pages fetched ahead in parallel; how many hit the server at once adapts to it
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "component_rules.json")
+RULE_SET = "detectComponent"
+# What makes a section each component: its data-element or one of its classes is the name
+# (see common/component_rules.py); only the <section> elements are parsed
+PARSE_ONLY = subtrees("section")
+
+def detect_components(html, components, soup=None):
+    # soup: the page already parsed (e.g. by Crawl/crawl.py), instead of html
+    if soup is None:
+        soup = parse_html(html, only=PARSE_ONLY)
+    return component_matcher(RULES_FILE, RULE_SET, components).flags(soup)
 
 def expand_elements(
     input_file,
@@ -10,6 +28,7 @@ def expand_elements(
     element_header="Component",
     output_sheet_name="expanded"
 ):
+    run_report.start(__file__)
     wb = load_workbook(input_file)
     url_sheet_obj = wb[url_sheet]
     element_sheet_obj = wb[element_sheet]
@@ -57,41 +76,37 @@ def expand_elements(
 
     headers = {"x-user-agent": "AU-AEM-Importer"}
 
-    # --- Process URLs ---
-    for row_idx, url in enumerate(urls.values(), start=2):
-        url_val = url["URL"]
+    # --- Process URLs (fetched in input order, WORKERS pages ahead) ---
+    pages = fetch_pages(list(urls), headers, workers=WORKERS)
+    for row_idx, (url_val, response, error) in enumerate(pages, start=2):
         comps_for_url = url_component_map.get(url_val, [])
         out_sheet.cell(row=row_idx, column=1, value=url_val)
         out_sheet.cell(row=row_idx, column=2, value=", ".join(comps_for_url))
 
         dom_matches = {comp: 0 for comp in components}
 
-        try:
-            response = requests.get(url_val, headers=headers, timeout=10)
+        if error is None:
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, "html.parser")
-
-                for section in soup.find_all("section"):
-                    data_element = section.get("data-element", "").strip().lower()
-                    class_list = [cls.strip().lower() for cls in section.get("class", [])]
-
-                    for comp in components:
-                        comp_clean = comp.lower()
-                        if data_element == comp_clean or comp_clean in class_list:
-                            dom_matches[comp] = 1
+                with run_report.stage("extract"):
+                    dom_matches = detect_components(response.text, components)
             else:
                 print(f"⚠️ {url_val} → HTTP {response.status_code}")
-        except requests.exceptions.RequestException:
+                run_report.count("failures", f"HTTP {response.status_code}")
+        else:
             print(f"❌ Failed to fetch {url_val}")
+            run_report.count("failures", "Failed to fetch")
 
         # --- Write results ---
         for i, comp in enumerate(components, start=3):
             out_sheet.cell(row=row_idx, column=i, value=dom_matches.get(comp, 0))
+        run_report.emit(f"{input_file}:{output_sheet_name}")
 
         print(f"✅ Processed: {url_val}")
 
-    wb.save(input_file)
+    with run_report.stage("save"):
+        wb.save(input_file)
     print(f"\n✅ Results saved to '{output_sheet_name}' in {input_file}")
+    print(f"🔌 {http_cache.summary()}")
 
 
 if __name__ == "__main__":
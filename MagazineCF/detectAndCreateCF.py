@@ -1,10 +1,13 @@
-import requests
-from bs4 import BeautifulSoup
 from openpyxl import load_workbook
 from urllib.parse import urlparse
 import os
-import pandas as pd
 import cssutils
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import event_log, http_cache, run_report
+from common.cf_sink import open_sink
+from common.html_parser import parse_html, subtrees
+from common.pipeline import fetch_pages
 
 # Config
 TEMPLATE_PATH = "/conf/au/settings/dam/cfm/models/magazine-article-model"
@@ -15,8 +18,15 @@ BASE_PAGE_PATH = "/content/au"
 INPUT_FILE = "input.xlsx"
 URLS_SHEET = "batch1"
 ELEMENT_SELECTOR = "article[data-element='Magazine Article']"
+# The article plus the og:description <meta> used as a fallback teaser
+PARSE_ONLY = subtrees(["article", "meta"])
 URLS_HEADER = "urls"
 CF_OUTPUT_FILE_NAME = "cf_out.xlsx"
+EVENT_LOG = "detectAndCreateCF_events.jsonl"   # one record per URL (common/event_log.py)
+CF_OUTPUT_MAX_ROWS = None   # rotate to cf_out_2.xlsx, ... after this many rows
+CF_OUTPUT_MAX_MB = None     # or after roughly this much cell data
+WORKERS = 8                 # pages fetched ahead in parallel; how many hit the server at once
+                            # adapts to it (common/rate_control.py)
 
 
 
@@ -55,13 +65,134 @@ def find_column(sheet, header_name):
             return col
     raise ValueError(f"Column '{header_name}' not found in sheet '{sheet.title}'")
 
+def extract_article(html, url_val):
+    """Build the article CF row from a fetched magazine page.
+
+    Returns (cf, None), or (None, problem) when the page has no single article element.
+    """
+    soup = parse_html(clean_up_html(html), only=PARSE_ONLY)
+
+    # Select all sections with class matching the ELEMENT
+    articleElement = soup.select(ELEMENT_SELECTOR)
+
+    # If No elements found, print error, continue to next URL
+    if len(articleElement) == 0:
+        return None, f"No '{ELEMENT_SELECTOR}' elements found"
+
+    # If more than one element found, print error, continue to next URL
+    if len(articleElement) != 1:
+        return None, f"Expected 1 '{ELEMENT_SELECTOR}' element, found {len(articleElement)}"
+
+    articleElement = articleElement[0]
+
+    # Get article header and process header content
+    headerElement = articleElement.css.select_one("header.article-header")
+    topicText = ''
+    topicLink = ''
+    titleText = ''
+    publicationDate = ''
+    if headerElement:
+        # Get article topic
+        topicElement = headerElement.css.select_one("span.channel")
+        if topicElement:
+            topicText = topicElement.text.strip()
+            topicLink = topicElement.css.select_one("a")['href'] if topicElement.css.select_one("a") else ''
+        
+        # Get article issue
+        issueElement = headerElement.css.select_one("time.issue")
+        publicationDate = issueElement['datetime'] if issueElement and issueElement.has_attr('datetime') else ''
+        # Convert issue date to YYYY-MM-DD format if possible
+        # (Assuming issue date is in format like "YYYY-MM-DD HH:MM:SS"")
+        try:
+            from datetime import datetime
+            date_obj = datetime.strptime(publicationDate, "%Y-%m-%d %H:%M:%S")
+            publicationDate = date_obj.strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+
+        # Get article title
+        titleElement = headerElement.css.select_one("h1")
+        titleText = titleElement.text.strip() if titleElement else ''
+
+        # Get teaser blurb from header
+        teaserElement = headerElement.css.select_one("p.teaser")
+        teaserText = teaserElement.text.strip() if teaserElement else ''
+
+    # Get teaser blurb from meta og:description
+    teaserHeadElement = soup.select_one('meta[property="og:description"]')
+    teaserHeadText = teaserHeadElement['content'] if teaserHeadElement else ''
+
+    # Get article author
+    authorText = ''
+    authorElement = articleElement.css.select_one("p.credit.author") if headerElement else None
+    authorText = authorElement.text.strip() if authorElement else ''
+    authorText = authorText.replace('By ', '')
+
+    # Get photo credit
+    photoCreditText = ''
+    photoCreditElement = articleElement.css.select_one("p.credit.photo") if headerElement else None
+    photoCreditText = photoCreditElement.text.strip() if photoCreditElement else ''
+    photoCreditText = photoCreditText.replace('Photo&shy;graphy by ', '')
+    photoCreditText = photoCreditText.replace('Photography by ', '')
+
+    # Get illustration credit
+    illustrationCreditText = ''
+    illustrationCreditElement = articleElement.css.select_one("p.credit.illustration") if headerElement else None
+    illustrationCreditText = illustrationCreditElement.text.strip() if illustrationCreditElement else ''
+    illustrationCreditText = illustrationCreditText.replace('Illustra&shy;tion by ', '')
+    illustrationCreditText = illustrationCreditText.replace('Illustra­tion by ', '')
+
+    # Get article image
+    newsImagePath = ''
+    altText = ''
+    imageElement = articleElement.css.select_one("section.section-1 > figure > img")
+    if imageElement and imageElement.has_attr('src'):
+        newsImagePath = imageElement['src']
+        altText = imageElement['alt'] if imageElement.has_attr('alt') else ''
+
+    
+
+    # Get article content html
+    contentElement = articleElement.css.select_one("section.section-1")
+    if contentElement:
+        # Remove unwanted elements from content
+        for unwanted in contentElement.select(':scope > figure'):
+            unwanted.decompose()
+    contentHtml = contentElement.decode_contents() if contentElement else ''
+
+    # Determine save path
+    savePath = convert_url_to_path(url_val)
+
+    cf = {
+        "path": savePath,   
+        "name": "articleCF",
+        "title": "articleCF",
+        "template": TEMPLATE_PATH,
+        "topic": topicText,
+        "topicLink": topicLink,
+        "news_title": titleText,
+        "teaser": teaserText if teaserText else teaserHeadText,
+        "showTeaser": "true" if teaserText else "false",
+        "author": authorText,
+        "illustrationBy": illustrationCreditText,
+        "photographyBy": photoCreditText,
+        "publicationDate": publicationDate,
+        "description": contentHtml,
+        "newsImage": newsImagePath,
+        "useImage": "true",
+        "altAsCaption": altText,
+    }
+
+    return cf, None
+
+
 def expand_elements():
+    run_report.start(__file__)
     wb = load_workbook(INPUT_FILE)
     urls_sheet_obj = wb[URLS_SHEET]
 
-    # Output terminal text to log file as well
-    log_file = open("detectAndCreateCF_log.txt", "w")
-    failed_log_file = open("detectAndCreateCF_failed_log.txt", "w")
+    # Every URL's outcome goes to the event log; `python -m common.event_log` sums it up
+    events = event_log.EventLog(EVENT_LOG)
 
     # --- Find header columns ---
     header_row = 1
@@ -75,160 +206,48 @@ def expand_elements():
 
     headers = {"x-user-agent": "AU-AEM-Importer"}
     
-    # --- Process URLs ---
-    cfs = []
-    for row_idx_place, url_val in enumerate(urlsToProcess):
+    # --- Process URLs, streaming CF rows to the output as they are built ---
+    # (fetched in input order, WORKERS pages ahead of the loop)
+    with open_sink(CF_OUTPUT_FILE_NAME, max_rows=CF_OUTPUT_MAX_ROWS, max_mb=CF_OUTPUT_MAX_MB) as sink:
         #stop after 10 for testing
-        if row_idx_place > 10:
-            break
-
-        print(f"🔍 Processing URL {url_val}")
-        log_file.write(f"? Processing URL {url_val}\n")
-
-        try:
-            response = requests.get(url_val, headers=headers, timeout=10)
-            if response.status_code == 200:
-                soup = BeautifulSoup(clean_up_html(response.text), "html.parser")
-
-                # Select all sections with class matching the ELEMENT
-                articleElement = soup.select(ELEMENT_SELECTOR)
-
-                # If No elements found, print error, continue to next URL
-                if len(articleElement) == 0:
-                    print(f"⚠️ {url_val} → No '{ELEMENT_SELECTOR}' elements found")
-                    log_file.write(f"! {url_val} -> No '{ELEMENT_SELECTOR}' elements found\n")
-                    continue
-
-                # If more than one element found, print error, continue to next URL
-                if len(articleElement) != 1:
-                    print(f"⚠️ {url_val} → Expected 1 '{ELEMENT_SELECTOR}' element, found {len(articleElement)}")
-                    log_file.write(f"! {url_val} -> Expected 1 '{ELEMENT_SELECTOR}' element, found {len(articleElement)}\n")
-                    continue
-
-                articleElement = articleElement[0]
-
-                # Get article header and process header content
-                headerElement = articleElement.css.select_one("header.article-header")
-                topicText = ''
-                topicLink = ''
-                titleText = ''
-                publicationDate = ''
-                if headerElement:
-                    # Get article topic
-                    topicElement = headerElement.css.select_one("span.channel")
-                    if topicElement:
-                        topicText = topicElement.text.strip()
-                        topicLink = topicElement.css.select_one("a")['href'] if topicElement.css.select_one("a") else ''
-                    
-                    # Get article issue
-                    issueElement = headerElement.css.select_one("time.issue")
-                    publicationDate = issueElement['datetime'] if issueElement and issueElement.has_attr('datetime') else ''
-                    # Convert issue date to YYYY-MM-DD format if possible
-                    # (Assuming issue date is in format like "YYYY-MM-DD HH:MM:SS"")
-                    try:
-                        from datetime import datetime
-                        date_obj = datetime.strptime(publicationDate, "%Y-%m-%d %H:%M:%S")
-                        publicationDate = date_obj.strftime("%Y-%m-%d")
-                    except ValueError:
-                        pass
-
-                    # Get article title
-                    titleElement = headerElement.css.select_one("h1")
-                    titleText = titleElement.text.strip() if titleElement else ''
-
-                    # Get teaser blurb from header
-                    teaserElement = headerElement.css.select_one("p.teaser")
-                    teaserText = teaserElement.text.strip() if teaserElement else ''
-
-                # Get teaser blurb from meta og:description
-                teaserHeadElement = soup.select_one('meta[property="og:description"]')
-                teaserHeadText = teaserHeadElement['content'] if teaserHeadElement else ''
-
-                # Get article author
-                authorText = ''
-                authorElement = articleElement.css.select_one("p.credit.author") if headerElement else None
-                authorText = authorElement.text.strip() if authorElement else ''
-                authorText = authorText.replace('By ', '')
-
-                # Get photo credit
-                photoCreditText = ''
-                photoCreditElement = articleElement.css.select_one("p.credit.photo") if headerElement else None
-                photoCreditText = photoCreditElement.text.strip() if photoCreditElement else ''
-                photoCreditText = photoCreditText.replace('Photo&shy;graphy by ', '')
-                photoCreditText = photoCreditText.replace('Photography by ', '')
-
-                # Get illustration credit
-                illustrationCreditText = ''
-                illustrationCreditElement = articleElement.css.select_one("p.credit.illustration") if headerElement else None
-                illustrationCreditText = illustrationCreditElement.text.strip() if illustrationCreditElement else ''
-                illustrationCreditText = illustrationCreditText.replace('Illustra&shy;tion by ', '')
-                illustrationCreditText = illustrationCreditText.replace('Illustra­tion by ', '')
-
-                # Get article image
-                newsImagePath = ''
-                altText = ''
-                imageElement = articleElement.css.select_one("section.section-1 > figure > img")
-                if imageElement and imageElement.has_attr('src'):
-                    newsImagePath = imageElement['src']
-                    altText = imageElement['alt'] if imageElement.has_attr('alt') else ''
-
-                
-
-                # Get article content html
-                contentElement = articleElement.css.select_one("section.section-1")
-                if contentElement:
-                    # Remove unwanted elements from content
-                    for unwanted in contentElement.select(':scope > figure'):
-                        unwanted.decompose()
-                contentHtml = contentElement.decode_contents() if contentElement else ''
-
-                # Determine save path
-                savePath = convert_url_to_path(url_val)
-
-                cfs.append({
-                    "path": savePath,   
-                    "name": "articleCF",
-                    "title": "articleCF",
-                    "template": TEMPLATE_PATH,
-                    "topic": topicText,
-                    "topicLink": topicLink,
-                    "news_title": titleText,
-                    "teaser": teaserText if teaserText else teaserHeadText,
-                    "showTeaser": "true" if teaserText else "false",
-                    "author": authorText,
-                    "illustrationBy": illustrationCreditText,
-                    "photographyBy": photoCreditText,
-                    "publicationDate": publicationDate,
-                    "description": contentHtml,
-                    "newsImage": newsImagePath,
-                    "useImage": "true",
-                    "altAsCaption": altText,
-                })
-
+        pages = fetch_pages(urlsToProcess[:11], headers, workers=WORKERS)
+        for row_idx_place, (url_val, response, error) in enumerate(pages):
+            print(f"🔍 Processing URL {url_val}")
+
+            if error is None:
+                if response.status_code == 200:
+                    with run_report.stage("extract"):
+                        cf, problem = extract_article(response.text, url_val)
+                    if problem:
+                        print(f"⚠️ {url_val} → {problem}")
+                        events.record(event_log.problem_event(problem, url=url_val))
+                        run_report.count("failures", problem)
+                        continue
+                    sink.write(cf)
+
+                else:
+                    print(f"⚠️ {url_val} → HTTP {response.status_code}")
+                    events.write("http-status", url=url_val, status=response.status_code)
+                    run_report.count("failures", f"HTTP {response.status_code}")
             else:
-                print(f"⚠️ {url_val} → HTTP {response.status_code}")
-                log_file.write(f"! {url_val} -> HTTP {response.status_code}\n")
-        except requests.exceptions.RequestException:
-            print(f"❌ Failed to fetch {url_val}")
-            log_file.write(f"X Failed to fetch {url_val}\n")
-            print("----------------------------------")
-            log_file.write("----------------------------------\n")
-            failed_log_file.write(f"{url_val}\n")
-            continue
+                run_report.count("failures", "Failed to fetch")
+                print(f"❌ Failed to fetch {url_val}")
+                events.write("fetch-error", url=url_val, error=event_log.fetch_error(error))
+                print("----------------------------------")
+                continue
 
 
-        print(f"✅ Processed #{row_idx_place}/{len(urlsToProcess)}: {url_val}")
-        log_file.write(f"O Processed #{row_idx_place}/{len(urlsToProcess)}: {url_val}\n")
-        print("----------------------------------")
-        log_file.write("----------------------------------\n")
+            print(f"✅ Processed #{row_idx_place}/{len(urlsToProcess)}: {url_val}")
+            if error is None and response.status_code == 200:
+                events.write("processed", url=url_val, n=row_idx_place, of=len(urlsToProcess))
+            print("----------------------------------")
 
     # --- Save CF Output ---
-    cf_out_df = pd.DataFrame(cfs)
-    cf_out_df.to_excel(CF_OUTPUT_FILE_NAME, index=False)
-    print(f"✅ CF Output written to {CF_OUTPUT_FILE_NAME}")
-    log_file.write(f"O CF Output written to {CF_OUTPUT_FILE_NAME}\n")
-    log_file.close()
-    failed_log_file.close()
+    print(f"✅ CF Output written to {', '.join(sink.files)} ({sink.rows_written} rows)")
+    events.write("output", files=sink.files, rows=sink.rows_written)
+    print(f"🔌 {http_cache.summary()}")
+    events.write("http", summary=http_cache.summary())
+    events.close()
 
 
 if __name__ == "__main__":
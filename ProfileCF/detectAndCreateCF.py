@@ -1,10 +1,24 @@
 import requests
-from bs4 import BeautifulSoup
 from openpyxl import load_workbook
 from urllib.parse import urlparse
 import os
-import pandas as pd
+import json
+import hashlib
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import cssutils
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import event_log, http_cache, run_report
+from common.cf_sink import open_sink
+from common.cpu_pool import CpuPool, decode
+from common.field_map import Field, FieldMap, attr_is, child_of, has_class
+from common.html_parser import parse_html, subtrees
+from common.profile_urls import resolve_profile_urls
+from common.reference_data import ReferenceSheet
+from common.sharding import run_sharded
 
 # Config
 TEMPLATE_PATH = "/conf/au/settings/dam/cfm/models/profiles"
@@ -15,8 +29,53 @@ BASE_PAGE_PATH = "/content/au"
 INPUT_FILE = "input.xlsx"
 IDS_SHEET = "batch1"
 ELEMENT_SELECTOR = "div.CS_Element_Custom > div.profile-full"
+# Only the custom element wrappers are parsed; ELEMENT_SELECTOR is matched inside them
+PARSE_ONLY = subtrees("div", class_="CS_Element_Custom")
 IDS_HEADER = "Eaglenet ID"
 CF_OUTPUT_FILE_NAME = "cf_out.xlsx"
+WORKERS = 16           # profiles fetched/extracted in parallel; 1 = serial. How many of
+                       # them hit the server at once adapts to it (common/rate_control.py)
+PROCESSES = 0          # >0: WORKERS threads only fetch, and this many processes parse and
+                       # extract (one per core; common/cpu_pool.py)
+SHARDS = 1             # >1 splits the IDs across this many processes (common/sharding.py);
+                       # the output files are the same as with 1
+CHECKPOINT_FILE = "detectAndCreateCF_checkpoint.jsonl"
+EVENT_LOG = "detectAndCreateCF_events.jsonl"   # one record per ID (common/event_log.py)
+RESUME = True          # skip IDs already finished in CHECKPOINT_FILE and append to their
+                       # output files; False starts over
+CF_OUTPUT_MAX_ROWS = None   # rotate to cf_out_2.xlsx, ... after this many rows; a resumed
+                            # run rewrites at most the one file that was still open
+CF_OUTPUT_MAX_MB = None     # or after roughly this much cell data
+
+# Elements extract_profile reads from the ELEMENT_SELECTOR block, all collected in
+# one walk; each is what the selector in its comment would find
+PROFILE_FIELDS = FieldMap({
+    "profileContent": Field("section", has_class("profile-content")),                     # section.profile-content
+    "bio": Field("dd", has_class("bio-text")),                                            # dd.bio-text
+    "bioList": Field("dl", has_class("profile-info-bio")),                                # dl.profile-info-bio
+    "bioItems": Field(("dt", "dd"), within="bioList", many=True),                         #   dt, dd
+    "partnerships": Field("ul", child_of("div", child_of("section", attr_is("id", "profile-partnerships")))),  # section#profile-partnerships > div > ul
+    "scholarly": Field("div", child_of("section", attr_is("id", "profile-activities"))),  # section#profile-activities > div
+    "scholarlyHeader": Field("header", within="scholarly"),                               #   header
+    "contact": Field("dl", has_class("profile-contact-info")),                            # dl.profile-contact-info
+    "office1": Field("dd", has_class("office1"), within="contact"),                       #   dd.office1
+    "office2": Field("dd", has_class("office2"), within="contact"),                       #   dd.office2
+    "office3": Field("dd", has_class("office3"), within="contact"),                       #   dd.office3
+    "contactEntries": Field("dd", within="contact", many=True),                           #   dd
+    "phone": Field("dd", has_class("profile-phone"), within="contact"),                   #   dd.profile-phone
+    "phoneLink": Field("a", child_of("dd", has_class("profile-phone")), within="contact"),  #   dd.profile-phone > a
+    "email": Field("dd", has_class("profile-email"), within="contact"),                   #   dd.profile-email
+    "name": Field("h1", has_class("profile-name")),                                       # h1.profile-name
+    "nameText": Field("span", attr_is("itemprop", "name"), within="name"),                #   span[itemprop=name]
+    "jobTitle": Field("small", attr_is("itemprop", "jobTitle"), within="name"),           #   small[itemprop=jobTitle]
+    "deptName": Field("small", attr_is("itemprop", "affiliation memberOf"), within="name"),  # small[itemprop="affiliation memberOf"]
+    "seeAlso": Field("div", has_class("profile-see-also"), many=True),                    # div.profile-see-also
+    "seeAlsoTitles": Field("dt", within="seeAlso", many=True),                            #   dt
+    "seeAlsoEntries": Field("dd", child_of("dl", child_of("div", has_class("profile-see-also"))), many=True, label="dt"),  # div.profile-see-also > dl > dd, with its dt
+    "imageCv": Field("div", has_class("profile-image-cv"), many=True),                    # div.profile-image-cv
+    "cvLink": Field("a", within="imageCv"),                                               #   a
+    "image": Field("img", within="imageCv"),                                              #   img
+})
 
 
 
@@ -55,15 +114,449 @@ def find_column(sheet, header_name):
             return col
     raise ValueError(f"Column '{header_name}' not found in sheet '{sheet.title}'")
 
+def extract_profile(html, id, url_val, eaglenetIdMap):
+    """Build the profile CF row from a fetched profile page.
+
+    Returns (cf, None), or (None, problem) when the page has no usable profile block.
+    """
+    inIdMap = id in eaglenetIdMap
+
+    soup = parse_html(html, only=PARSE_ONLY)
+
+    # Select all sections with class matching the ELEMENT
+    profilesElement = soup.select(ELEMENT_SELECTOR)
+
+    # If No elements found, print error, continue to next URL
+    if len(profilesElement) == 0:
+        return None, f"No '{ELEMENT_SELECTOR}' elements found"
+
+    # If more than one element found, print error, continue to next URL
+    if len(profilesElement) != 1:
+        return None, f"Expected 1 '{ELEMENT_SELECTOR}' element, found {len(profilesElement)}"
+
+    profilesElement = profilesElement[0]
+
+    # Get profile display from url path
+    profileDisplay = get_profile_display(url_val)
+
+    # Every element the fields below read, found in one walk of the profile
+    found = PROFILE_FIELDS.collect(profilesElement)
+
+    # Determine force display value
+    if found["profileContent"] is None:
+        return None, f"No 'section.profile-content' found"
+    forceDisplay = eaglenetIdMap[id]['Force Profile'] if inIdMap else ''
+
+    # Get Bio html
+    bioElement = found["bio"]
+    bioHtml = bioElement.decode_contents() if bioElement else ''
+
+    # Get degrees and additional positions html
+    degreesHtml = ''
+    additionalPositionsHtml = ''
+    for item in found["bioItems"]:
+        if item.text.strip().lower() == 'degrees':
+            # append all neighboring dd until next dt
+            degreesHtmlParts = []
+            next_sibling = item.find_next_sibling()
+            while next_sibling and next_sibling.name == 'dd':
+                degreesHtmlParts.append(next_sibling.decode_contents())
+                next_sibling = next_sibling.find_next_sibling()
+            degreesHtml = '<br>'.join(degreesHtmlParts)
+        elif item.text.strip().lower() == 'additional positions at au':
+            # append all neighboring dd until next dt
+            additionalPositionsHtmlParts = []
+            next_sibling = item.find_next_sibling()
+            while next_sibling and next_sibling.name == 'dd':
+                additionalPositionsHtmlParts.append(next_sibling.decode_contents())
+                next_sibling = next_sibling.find_next_sibling()
+            additionalPositionsHtml = '<br>'.join(additionalPositionsHtmlParts)
+
+    # Get Partnerships and Affiliations html
+    partnershipsElement = found["partnerships"]
+    partnershipsHtml = partnershipsElement.decode_contents() if partnershipsElement else ''
+
+    # Get Scholarly html
+    scholarlyElement = found["scholarly"]
+    # remove h2 from scholarlyHtml
+    if found["scholarlyHeader"]:
+        found["scholarlyHeader"].decompose()
+    scholarlyHtml = scholarlyElement.decode_contents() if scholarlyElement else ''
+
+    # Get contact info element
+    contactInfoElement = found["contact"]
+
+    # Get profile name element
+    profileNameElement = found["name"]
+
+    # Get name from contact info
+    nameElement = found["nameText"]
+    first_name = nameElement.text if nameElement else ''
+
+    is_staff = True
+    # Get For the Media block
+    for element in found["seeAlsoTitles"]:
+        if element.text.strip().lower() == 'for the media':
+            is_staff = False
+            break
+    # TODO: Temporary for profiles not in Worday
+    forceDisplay = 'Staff' if is_staff else 'Faculty'
+
+    # Get faculty title from contact info
+    facultyTitleElement = found["jobTitle"]
+    faculty_title = facultyTitleElement.text if facultyTitleElement and not is_staff else ''
+    staff_title = facultyTitleElement.text if facultyTitleElement and is_staff else ''
+
+    # Get faculty dept name from contact info
+    facultyDeptNameElement = found["deptName"]
+    faculty_dept_name = facultyDeptNameElement.text if facultyDeptNameElement and not is_staff else ''
+    staff_dept_name = facultyDeptNameElement.text if facultyDeptNameElement and is_staff else ''
+
+    # Get fso lines 1-3
+    fso1 = found["office1"].text if found["office1"] else ''
+    fso2 = found["office2"].text if found["office2"] else ''
+    fso3 = found["office3"].text if found["office3"] else ''
+
+    # Get office hours html from last dd in contact info
+    officeHoursHtml = ''
+    if found["contactEntries"]:
+        officeHoursHtml = found["contactEntries"][-1].decode_contents()
+
+    # Get phone number from contact info
+    altPhoneNumber = ''
+    altPhoneType = ''
+    altPhoneNumberElement = found["phoneLink"]
+    if (altPhoneNumberElement and altPhoneNumberElement.get('itemprop', '') == 'faxNumber'):
+        altPhoneNumber = altPhoneNumberElement.text.strip()
+        altPhoneNumberElement.decompose()  # remove phone number element to avoid duplication
+        altPhoneTypeElement = found["phone"]
+        altPhoneType = altPhoneTypeElement.text.strip() if altPhoneTypeElement else ''
+
+    # Get hide email value from contact info
+    hideEmail = 'false'
+    if contactInfoElement:
+        emailElement = found["email"]
+        if emailElement and emailElement.text.strip() != '':
+            hideEmail = 'false'
+        else:
+            hideEmail = 'true'
+
+    # Get hide phone value from contact info
+    hidePhone = 'false'
+    if contactInfoElement:
+        phoneElement = found["phone"]
+        if phoneElement and phoneElement.text.strip() != '':
+            hidePhone = 'false'
+        else:
+            hidePhone = 'true'
+
+    # Get See also links and areas of specialization, by the dt each dd follows
+    contactLinksHtml = ''
+    areasOfSpecializationMigrated = ''
+    for entry, prev_dt in found["seeAlsoEntries"]:
+        label = prev_dt.text.strip().lower() if prev_dt else ''
+        if label == 'see also':
+            contactLinksHtml += entry.decode_contents() + '<br>'
+        elif label == 'areas of specialization':
+            areasOfSpecializationMigrated += entry.text + '|'
+    # remove trailing | from areasOfSpecializationMigrated
+    if areasOfSpecializationMigrated.endswith('|'):
+        areasOfSpecializationMigrated = areasOfSpecializationMigrated[:-1]
+
+    # Add resume if present
+    resume = BASE_ASSET_PATH + '/migrated-profile-resumes/' + found["cvLink"]['href'].lstrip('/') if found["cvLink"] else ''
+
+    resume = eaglenetIdMap[id]['Resume'] if inIdMap else resume
+    if resume and isinstance(resume, str) and resume.strip() != '':
+        resume = resume.strip()
+        resume = BASE_ASSET_PATH + '/migrated-profile-resumes/' + resume.lstrip('/')
+
+    # Overwrite resume with CV if present
+    cv = eaglenetIdMap[id]['CV'] if inIdMap else ''
+    if cv and isinstance(cv, str) and cv.strip() != '':
+        cv = cv.strip()
+        cv = BASE_ASSET_PATH + '/migrated-profile-resumes/' + cv.lstrip('/')
+        resume = cv  # overwrite resume with CV
+
+    # Add profile image if present and not default
+    profileImage = BASE_ASSET_PATH + '/migrated-profile-images/' + found["image"]['src'].lstrip('/') if found["image"] else ''
+
+    profileImage = eaglenetIdMap[id]['Profile Image'] if inIdMap else profileImage
+    if profileImage and isinstance(profileImage, str) and profileImage.strip() != '':
+        profileImage = profileImage.strip()
+        if not profileImage.lower().endswith('/uploads/defaults/original/au_profile.jpg'):
+            profileImage = BASE_ASSET_PATH + '/migrated-profile-images/' + profileImage.lstrip('/')
+        else:
+            profileImage = '/content/dam/au/assets/global/images/au_profile.jpg'  # default image
+    
+    if profileImage.lower().endswith('/uploads/defaults/original/au_profile.jpg'):
+        profileImage = '/content/dam/au/assets/global/images/au_profile.jpg'  # default image
+
+    # Add authorized admins if present
+    authorizedAdmins = eaglenetIdMap[id]['Authorized Admins'] if inIdMap else ''
+    authorizedAdminsString = ''
+    if authorizedAdmins and isinstance(authorizedAdmins, str) and authorizedAdmins.strip() != '':
+        for admin in authorizedAdmins.split(','):
+            authorizedAdminsString += '{"authorizedAdminCMF":"(' + admin.strip() + '@american.edu)"}|'
+    # remove trailing |, add closing bracket
+    if len(authorizedAdminsString) > 1:
+        authorizedAdminsString = authorizedAdminsString[:-1]
+    else:
+        authorizedAdminsString = ''
+
+    savePath = BASE_CF_PATH + '/' + id
+    if (len(id.strip()) >= 2):
+        # CFs save path is BASE_CF_PATH + first two chars of id + full id
+        savePath = BASE_CF_PATH + '/' + id[:2] + '/' + id
+
+    cf = {
+        "path": savePath,   
+        "name": "profileCF",
+        "title": "profileCF",
+        "template": TEMPLATE_PATH,
+        "forceDisplay": forceDisplay,
+        "bio": bioHtml,
+        "degrees": degreesHtml,
+        "additionalPositions": additionalPositionsHtml,
+        "partnerships": partnershipsHtml,
+        "scholarly": scholarlyHtml,
+        "officeHours": officeHoursHtml,
+        "altPhone": altPhoneNumber,
+        "altPhoneType": altPhoneType,
+        "contactLinks": contactLinksHtml,
+        "resume": resume,
+        "photo": profileImage,
+        "defaultProfilePage": url_val.replace('https://www.american.edu', '').replace('.cfm', ''),
+        "authorizedAdminsMigrated": authorizedAdminsString,
+        "username": id,
+        "hideEmail": hideEmail,
+        "hidePhone": hidePhone,
+        "areasOfSpecializationMigrated": areasOfSpecializationMigrated,
+        "first_name": first_name,
+        "faculty_dept_name": faculty_dept_name,
+        "staff_dept_name": staff_dept_name,
+        "faculty_title": faculty_title,
+        "staff_title": staff_title,
+        "fso_line1": fso1,
+        "fso_line2": fso2,
+        "fso_phone": fso3,
+
+    }
+
+    return cf, None
+
+def fetch_profile(id, profileUrls, headers):
+    """Fetch an Eaglenet ID's profile page; only plain data comes back, so it can go to another process.
+
+    Returns (url, status, body, encoding, fetchError): url is '' when the ID has no
+    profile URL, status/body/encoding are None when there was nothing fetched, and
+    fetchError names the exception when the fetch failed.
+    """
+    url_val = profileUrls.get(id, '')
+    if url_val == '':
+        return url_val, None, None, None, None
+    try:
+        response = http_cache.get(url_val, headers=headers, timeout=10)
+    except requests.exceptions.RequestException as e:
+        return url_val, None, None, None, event_log.fetch_error(e)
+    return url_val, response.status_code, response.content, response.encoding, None
+
+def build_profile(row_idx_place, id, total, fetched, eaglenetIdMap):
+    """Extract an Eaglenet ID's CF row from its fetch_profile() result; see process_profile."""
+    cf = None
+    out = []
+    retry = False
+
+    url_val, status, content, encoding, fetchError = fetched
+    if url_val == '':
+        out.append(("print", f"❌ No URL found for Eaglenet ID {id}"))
+        out.append(("event", {"type": "no-url", "id": id}))
+        run_report.count("failures", "No URL found")
+        return None, out, False
+
+    out.append(("print", f"🔍 Processing Eaglenet ID {id} → {url_val}"))
+
+    if fetchError:
+        out.append(("print", f"❌ Failed to fetch {url_val}"))
+        out.append(("event", {"type": "fetch-error", "id": id, "url": url_val, "error": fetchError}))
+        run_report.count("failures", "Failed to fetch")
+        return None, out, True
+
+    if status == 200:
+        with run_report.stage("extract"):
+            cf, problem = extract_profile(decode(content, encoding), id, url_val, eaglenetIdMap)
+        if problem:
+            out.append(("print", f"⚠️ {url_val} → {problem}"))
+            out.append(("event", event_log.problem_event(problem, id=id, url=url_val)))
+            run_report.count("failures", problem)
+            return None, out, False
+        out.append(("print", f"✅ Processed #{row_idx_place}/{total}: {url_val}"))
+        out.append(("event", {"type": "processed", "id": id, "url": url_val, "n": row_idx_place, "of": total}))
+    else:
+        event = {"type": "http-status", "id": id, "url": url_val, "status": status}
+        out.append(("print", f"⚠️ {url_val} → HTTP {status}"))
+        out.append(("event", event))
+        run_report.count("failures", f"HTTP {status}")
+        retry = event_log.retryable(event)
+
+
+    out.append(("print", "----------------------------------"))
+
+    return cf, out, retry
+
+def process_profile(row_idx_place, id, total, eaglenetIdMap, profileUrls, headers):
+    """Fetch and extract a single Eaglenet ID from its resolved profile URL (profileUrls[id]).
+
+    Returns (cf, out, retry) where cf is the CF row dict (or None), out is the list
+    of ("print", text) lines and ("event", record) event log records, so the caller
+    can write them in input order even when profiles are processed in parallel, and retry is
+    True when the failure was transient (fetch error, 5xx/429) and worth redoing.
+    """
+    return build_profile(row_idx_place, id, total, fetch_profile(id, profileUrls, headers), eaglenetIdMap)
+
+_workerEaglenetIdMap = None    # eaglenetIdMap, in a PROCESSES worker
+
+def init_profile_worker(eaglenetIdMap):
+    global _workerEaglenetIdMap
+    _workerEaglenetIdMap = eaglenetIdMap
+
+def build_profile_task(task):
+    row_idx_place, id, total, fetched = task
+    return build_profile(row_idx_place, id, total, fetched, _workerEaglenetIdMap)
+
+def run_profiles(idsToProcess, eaglenetIdMap, profileUrls, headers, workers=WORKERS, skip=(), processes=PROCESSES):
+    """Yield (id, cf, out, retry) for every ID not in `skip`, in input order, using a pool of `workers` threads.
+
+    With processes > 0 the threads only fetch, and a pool of that many processes
+    parses and extracts (common/cpu_pool.py).
+    """
+    total = len(idsToProcess)
+    todo = [(row_idx_place, id) for row_idx_place, id in enumerate(idsToProcess) if id not in skip]
+    if processes > 0:
+        with CpuPool(processes, initializer=init_profile_worker, initargs=(eaglenetIdMap,)) as cpuPool:
+            fetched = fetch_profiles(todo, profileUrls, headers, workers)
+            tasks = ((row_idx_place, id, total, fetch) for (row_idx_place, id), fetch in zip(todo, fetched))
+            for (row_idx_place, id), result in zip(todo, cpuPool.map(build_profile_task, tasks)):
+                yield (id,) + result
+        return
+
+    if workers <= 1:
+        for row_idx_place, id in todo:
+            yield (id,) + process_profile(row_idx_place, id, total, eaglenetIdMap, profileUrls, headers)
+        return
+
+    # Keep only a small window of profiles in flight so finished rows don't pile up
+    # waiting for a slow one ahead of them
+    pending = deque()
+    todo = iter(todo)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for row_idx_place, id in todo:
+            pending.append((id, pool.submit(process_profile, row_idx_place, id, total, eaglenetIdMap, profileUrls, headers)))
+            if len(pending) >= workers * 4:
+                id, future = pending.popleft()
+                yield (id,) + future.result()
+        while pending:
+            id, future = pending.popleft()
+            yield (id,) + future.result()
+
+def fetch_profiles(todo, profileUrls, headers, workers):
+    """Yield fetch_profile() for every (row_idx_place, id) of todo, in order, using `workers` threads."""
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        for row_idx_place, id in todo:
+            pending.append(pool.submit(fetch_profile, id, profileUrls, headers))
+            if len(pending) >= workers * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def run_profile_shard(shardIds, idsToProcess, eaglenetIdMap, profileUrls, headers):
+    """run_profiles for one shard's IDs, numbered by their place in the whole list."""
+    others = set(idsToProcess) - set(shardIds)
+    yield from run_profiles(idsToProcess, eaglenetIdMap, profileUrls, headers, skip=others)
+
+JOURNAL_ROW = b'{"id": '    # how write_checkpoint's lines start
+_decoder = json.JSONDecoder()
+
+def input_fingerprint(idsToProcess):
+    """sha256 of the ID list; the checkpoint journal only resumes the batch it was written for."""
+    return hashlib.sha256("\n".join(idsToProcess).encode("utf-8")).hexdigest()
+
+def load_checkpoint(path, fingerprint):
+    """Read the checkpoint journal of an earlier run over the same IDs.
+
+    The journal is a header line with the input's fingerprint, then a line per
+    finished ID ({"id": ..., "cf": row or null}) and a {"saved": file} line each
+    time an output file was saved with every row journaled before it. Returns
+    (finished IDs, output files saved, byte offset of the rows not in a saved
+    file yet), or None when there is no journal to resume. Only each line's ID
+    is decoded, not its row.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        header = f.readline()
+        if not header.endswith(b"\n"):
+            return None
+        if json.loads(header).get("input") != fingerprint:
+            raise ValueError(f"{path} is from a run over other IDs than {INPUT_FILE} [{IDS_SHEET}] lists now; "
+                             f"delete it or set RESUME = False to start over")
+        done = set()
+        saved = []
+        good_bytes = unsaved_from = len(header)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            good_bytes += len(line)
+            if line.startswith(JOURNAL_ROW):
+                done.add(_decoder.raw_decode(line.decode("utf-8"), len(JOURNAL_ROW))[0])
+            else:
+                saved.append(json.loads(line)["saved"])
+                unsaved_from = good_bytes
+    # Drop a torn last line from a crash mid-write so new entries append cleanly;
+    # that ID simply gets redone
+    if good_bytes != os.path.getsize(path):
+        with open(path, "r+b") as f:
+            f.truncate(good_bytes)
+    missing = [file for file in saved if not os.path.exists(file)]
+    if missing:
+        raise ValueError(f"{', '.join(missing)}, saved by the run {path} resumes, is gone; set RESUME = False to start over")
+    return done, saved, unsaved_from
+
+def take_unsaved_rows(path, unsaved_from):
+    """Cut the rows journaled after the last saved output file out of the journal, to be written again.
+
+    They were in the output file that was open when the earlier run stopped.
+    """
+    rows = tempfile.TemporaryFile()
+    with open(path, "r+b") as f:
+        f.seek(unsaved_from)
+        shutil.copyfileobj(f, rows)
+        f.truncate(unsaved_from)
+    rows.seek(0)
+    return rows
+
+def write_journal(journal, entry):
+    with run_report.stage("checkpoint"):
+        journal.write(json.dumps(entry, default=str) + "\n")
+        journal.flush()
+        os.fsync(journal.fileno())
+
+def write_checkpoint(journal, id, cf):
+    write_journal(journal, {"id": id, "cf": cf})
+
+def write_messages(out, events):
+    for stream, message in out:
+        if stream == "print":
+            print(message)
+        elif stream == "event":
+            events.record(message)
+
 def expand_elements():
+    run_report.start(__file__)
     wb = load_workbook(INPUT_FILE)
     ids_sheet_obj = wb[IDS_SHEET]
 
-    # Output terminal text to log file as well
-    log_file = open("detectAndCreateCF_log.txt", "w")
-    failed_log_file = open("detectAndCreateCF_failed_log.txt", "w")
-    success_page_list = open("detectAndCreateCF_success_pages.txt", "w")
-
     # --- Find header columns ---
     header_row = 1
     ids_col = find_column(ids_sheet_obj, IDS_HEADER)
@@ -75,391 +568,81 @@ def expand_elements():
         if id_val:
             idsToProcess.append(str(id_val).strip())
 
-    headers = {"x-user-agent": "AU-AEM-Importer"}
+    # --- Load checkpoint journal of IDs finished by a previous run over the same IDs ---
+    fingerprint = input_fingerprint(idsToProcess)
+    resumed = load_checkpoint(CHECKPOINT_FILE, fingerprint) if RESUME else None
+    checkpoint, savedFiles, unsavedFrom = resumed or (set(), [], None)
+    unsavedRows = take_unsaved_rows(CHECKPOINT_FILE, unsavedFrom) if resumed else None
+    journal = open(CHECKPOINT_FILE, "a" if resumed else "w", encoding="utf-8")
+    if not resumed:
+        write_journal(journal, {"input": fingerprint})
 
-    # -- load profile report and create map of eaglenet ids ---
-    reportWb = pd.read_excel("2025_profilerotreport.xlsx", sheet_name="2025_profilerotreport")
-    eaglenetIdMap = {}
-    for index, row in reportWb.iterrows():
-        eaglenetIdMap[row['Eaglenet ID']] = row
-
-    # -- load sadea list and create map of eaglenet ids ---
-    sadeaWb = pd.read_excel("sadeaList.xlsx", sheet_name="Sheet1")
-    sadeaMap = {}
-    for index, row in sadeaWb.iterrows():
-        sadeaMap[row['eaglenet_id']] = row
-
-    # -- load new profile page list and create map of eaglenet ids to new profile pages --
-    newProfilePagesWb = pd.read_excel("new_profile_pages.xlsx", sheet_name="Sheet1")
-    newProfilePagesMap = {}
-    for index, row in newProfilePagesWb.iterrows():
-        newProfilePagesMap[row['Eaglenet ID']] = row
-    
-    # --- Process URLs ---
-    cfs = []
-    for row_idx_place, id in enumerate(idsToProcess):
-
-        #stop after 10 for testing
-        #if row_idx_place > 10:
-        #    break
-
-        inIdMap = id in eaglenetIdMap
-
-        url_val = ''
-        defaultProfilePage = eaglenetIdMap[id]['Default Profile Page'] if inIdMap else None
-        if defaultProfilePage is None or not isinstance(defaultProfilePage, str) or defaultProfilePage.strip() == '':
-
-            allProfilePages = eaglenetIdMap[id]['All Profile Pages'] if inIdMap else None
-            if allProfilePages is not None and isinstance(allProfilePages, str) and allProfilePages.strip() != '':
-                additional_urls_val = allProfilePages.strip().lower()
-                additional_urls_val = additional_urls_val.replace('faculty:', '')
-                additional_urls_val = additional_urls_val.replace('staff:', '')
-                additional_urls_val = additional_urls_val.replace('student:', '')
-                for additional_url_val in additional_urls_val.split('|'):
-                    if additional_url_val != '':
-                        url_val = additional_url_val.strip().lower()
-                        break
-        else:
-            url_val = defaultProfilePage.strip().lower()
-            
-        if url_val == '':
-            if id in sadeaMap:
-                sadeaProfilePage = sadeaMap[id]['full url']
-                if sadeaProfilePage is not None and isinstance(sadeaProfilePage, str) and sadeaProfilePage.strip() != '':
-                    url_val = sadeaProfilePage.strip()
-
-        if url_val == '':
-            if id in newProfilePagesMap:
-                newProfilePage = newProfilePagesMap[id]['URL']
-                if newProfilePage is not None and isinstance(newProfilePage, str) and newProfilePage.strip() != '':
-                    url_val = newProfilePage.strip()
-
-        if url_val == '':
-            print(f"❌ No URL found for Eaglenet ID {id}")
-            log_file.write(f"X No URL found for Eaglenet ID {id}\n")
-            failed_log_file.write(f"{id}\n")
-            continue
-
-        url_val = 'https://www.american.edu' + url_val if url_val.startswith('/') else url_val
-
-        print(f"🔍 Processing Eaglenet ID {id} → {url_val}")
-        log_file.write(f"? Processing Eaglenet ID {id} -> {url_val}\n")
-
-        try:
-            response = requests.get(url_val, headers=headers, timeout=10)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, "html.parser")
-
-                # Select all sections with class matching the ELEMENT
-                profilesElement = soup.select(ELEMENT_SELECTOR)
-
-                # If No elements found, print error, continue to next URL
-                if len(profilesElement) == 0:
-                    print(f"⚠️ {url_val} → No '{ELEMENT_SELECTOR}' elements found")
-                    log_file.write(f"! {url_val} -> No '{ELEMENT_SELECTOR}' elements found\n")
-                    failed_log_file.write(f"! {url_val} -> No '{ELEMENT_SELECTOR}' elements found\n")
-                    continue
-
-                # If more than one element found, print error, continue to next URL
-                if len(profilesElement) != 1:
-                    print(f"⚠️ {url_val} → Expected 1 '{ELEMENT_SELECTOR}' element, found {len(profilesElement)}")
-                    log_file.write(f"! {url_val} -> Expected 1 '{ELEMENT_SELECTOR}' element, found {len(profilesElement)}\n")
-                    failed_log_file.write(f"! {url_val} -> Expected 1 '{ELEMENT_SELECTOR}' element, found {len(profilesElement)}\n")
-                    continue
-
-                profilesElement = profilesElement[0]
-
-                # Get profile display from url path
-                profileDisplay = get_profile_display(url_val)
-
-                # Determine force display value
-                profileContentSection = profilesElement.css.select_one("section.profile-content")
-                if profileContentSection is None:
-                    print(f"⚠️ {url_val} → No 'section.profile-content' found")
-                    log_file.write(f"! {url_val} -> No 'section.profile-content' found\n")
-                    failed_log_file.write(f"! {url_val} -> No 'section.profile-content' found\n")
-                    continue
-                forceDisplay = eaglenetIdMap[id]['Force Profile'] if inIdMap else ''
-
-                # Get Bio html
-                bioElement = profilesElement.css.select_one("dd.bio-text")
-                bioHtml = bioElement.decode_contents() if bioElement else ''
-
-                # Get degrees and additional positions html
-                superBioElement = profilesElement.css.select_one("dl.profile-info-bio")
-                degreesHtml = ''
-                additionalPositionsHtml = ''
-                for item in superBioElement.css.select("dt, dd"):
-                    if item.text.strip().lower() == 'degrees':
-                        # append all neighboring dd until next dt
-                        degreesHtmlParts = []
-                        next_sibling = item.find_next_sibling()
-                        while next_sibling and next_sibling.name == 'dd':
-                            degreesHtmlParts.append(next_sibling.decode_contents())
-                            next_sibling = next_sibling.find_next_sibling()
-                        degreesHtml = '<br>'.join(degreesHtmlParts)
-                    elif item.text.strip().lower() == 'additional positions at au':
-                        # append all neighboring dd until next dt
-                        additionalPositionsHtmlParts = []
-                        next_sibling = item.find_next_sibling()
-                        while next_sibling and next_sibling.name == 'dd':
-                            additionalPositionsHtmlParts.append(next_sibling.decode_contents())
-                            next_sibling = next_sibling.find_next_sibling()
-                        additionalPositionsHtml = '<br>'.join(additionalPositionsHtmlParts)
-
-                # Get Partnerships and Affiliations html
-                partnershipsElement = profilesElement.css.select_one("section#profile-partnerships > div > ul")
-                partnershipsHtml = partnershipsElement.decode_contents() if partnershipsElement else ''
-
-                # Get Scholarly html
-                scholarlyElement = profilesElement.css.select_one("section#profile-activities > div")
-                # remove h2 from scholarlyHtml
-                if scholarlyElement:
-                    header = scholarlyElement.css.select_one("header")
-                    if header:
-                        header.decompose()
-                scholarlyHtml = scholarlyElement.decode_contents() if scholarlyElement else ''
-
-                """ # Get Scholarly html
-                scholarlyElement = profilesElement.css.select_one("section#profile-activities > div")
-                # select Scholarly entries which are in divs with class col-md-6
-                scholarlyEntries = scholarlyElement.css.select("div.col-md-6 > div") if scholarlyElement else []
-                scholarlyHtml = ''
-                # loop through scholarly entries, append title (h3) and content (div) to scholarlyHtml
-                # seperate entries with $#! to allow splitting in CF
-                # seperate title and content with !#$ to allow splitting in CF
-                for entry in scholarlyEntries:
-                    titleElement = entry.css.select_one("h3")
-                    titleText = titleElement.text.strip() if titleElement else ''
-                    # remove title element from entry to avoid duplication in content
-                    if titleElement:
-                        titleElement.decompose()
-                    contentHtml = entry.decode_contents()
-                    scholarlyHtml += titleText + '!#$' + contentHtml + '$#!'
-                # remove trailing $#! from scholarlyHtml
-                if scholarlyHtml.endswith('$#!'):
-                    scholarlyHtml = scholarlyHtml[:-3] """
-
-                # Get contact info element
-                contactInfoElement = profilesElement.css.select_one("dl.profile-contact-info")
-
-                # Get profile name element
-                profileNameElement = profilesElement.css.select_one('h1.profile-name')
-
-                # Get name from contact info
-                first_name = ''
-                if profileNameElement:
-                    nameElement = profileNameElement.css.select_one('span[itemprop=name]')
-                    first_name = nameElement.text if nameElement else ''
-
-                is_staff = True
-                # Get For the Media block
-                forTheMediaElements = profilesElement.css.select("div.profile-see-also dt")
-                for element in forTheMediaElements:
-                    if element.text.strip().lower() == 'for the media':
-                        is_staff = False
-                        break
-                # TODO: Temporary for profiles not in Worday
-                forceDisplay = 'Staff' if is_staff else 'Faculty'
-                
-                # Get faculty title from contact info
-                faculty_title = ''
-                staff_title = ''
-                if profileNameElement:
-                    facultyTitleElement = profileNameElement.css.select_one('small[itemprop=jobTitle]')
-                    faculty_title = facultyTitleElement.text if facultyTitleElement and not is_staff else ''
-                    staff_title = facultyTitleElement.text if facultyTitleElement and is_staff else ''
-
-                # Get faculty dept name from contact info
-                faculty_dept_name = ''
-                staff_dept_name = ''
-                if profileNameElement:
-                    facultyDeptNameElement = profileNameElement.css.select_one('small[itemprop="worksFor affiliation memberOf"]')
-                    faculty_dept_name = facultyDeptNameElement.text if facultyDeptNameElement and not is_staff else ''
-                    staff_dept_name = facultyDeptNameElement.text if facultyDeptNameElement and is_staff else ''
-                    facultyDeptNameElement = profileNameElement.css.select_one('small[itemprop="affiliation memberOf"]')
-                    faculty_dept_name = facultyDeptNameElement.text if facultyDeptNameElement and not is_staff else ''
-                    staff_dept_name = facultyDeptNameElement.text if facultyDeptNameElement and is_staff else ''
-
-                # Get fso line 1
-                fso1 = ''
-                if contactInfoElement:
-                    fsoLine1Element = contactInfoElement.css.select_one('dd.office1')
-                    fso1 = fsoLine1Element.text if fsoLine1Element else ''
-
-                # Get fso line 2
-                fso2 = ''
-                if contactInfoElement:
-                    fso2Element = contactInfoElement.css.select_one('dd.office2')
-                    fso2 = fso2Element.text if fso2Element else ''
-
-                # Get fso line 3
-                fso3 = ''
-                if contactInfoElement:
-                    fso3Element = contactInfoElement.css.select_one('dd.office3')
-                    fso3 = fso3Element.text if fso3Element else ''
-
-                # Get office hours html from last dd in contact info
-                officeHoursHtml = ''
-                if contactInfoElement:
-                    dd_elements = contactInfoElement.css.select("dd")
-                    if dd_elements:
-                        officeHoursHtml = dd_elements[-1].decode_contents()
-
-                # Get phone number from contact info
-                altPhoneNumber = ''
-                altPhoneType = ''
-                if contactInfoElement:
-                    altPhoneNumberElement = contactInfoElement.css.select_one("dd.profile-phone > a")
-                    if (altPhoneNumberElement and altPhoneNumberElement.get('itemprop', '') == 'faxNumber'):
-                        altPhoneNumber = altPhoneNumberElement.text.strip() if altPhoneNumberElement else ''
-                        altPhoneNumberElement.decompose()  # remove phone number element to avoid duplication
-                        altPhoneTypeElement = contactInfoElement.css.select_one("dd.profile-phone")
-                        altPhoneType = altPhoneTypeElement.text.strip() if altPhoneTypeElement else ''
-
-                # Get hide email value from contact info
-                hideEmail = 'false'
-                if contactInfoElement:
-                    emailElement = contactInfoElement.css.select_one("dd.profile-email")
-                    if emailElement and emailElement.text.strip() != '':
-                        hideEmail = 'false'
-                    else:
-                        hideEmail = 'true'
-
-                # Get hide phone value from contact info
-                hidePhone = 'false'
-                if contactInfoElement:
-                    phoneElement = contactInfoElement.css.select_one("dd.profile-phone")
-                    if phoneElement and phoneElement.text.strip() != '':
-                        hidePhone = 'false'
-                    else:
-                        hidePhone = 'true'
-                
-                # Get See also links
-                contactLinksHtml = ''
-                seeAlsoLinks = profilesElement.css.select("div.profile-see-also > dl > dd")
-                for link in seeAlsoLinks:
-                    # if previous sibling dt text is 'See Also', add this link to contactLinksHtml
-                    prev_dt = link.find_previous_sibling('dt')
-                    if prev_dt and prev_dt.text.strip().lower() == 'see also':
-                        contactLinksHtml += link.decode_contents() + '<br>'
-
-                # Get areas of specialization
-                areasOfSpecializationMigrated = ''
-                areasOfSpecialization = profilesElement.css.select("div.profile-see-also > dl > dd")
-                for entry in areasOfSpecialization:
-                    # if previous sibling dt text is 'Areas of Specialization', add this entry to areasOfSpecializationHtml
-                    prev_dt = entry.find_previous_sibling('dt')
-                    if prev_dt and prev_dt.text.strip().lower() == 'areas of specialization':
-                        areasOfSpecializationMigrated += entry.text + '|'
-                # remove trailing | from areasOfSpecializationMigrated
-                if areasOfSpecializationMigrated.endswith('|'):
-                    areasOfSpecializationMigrated = areasOfSpecializationMigrated[:-1]
-
-                # Add resume if present
-                resume = BASE_ASSET_PATH + '/migrated-profile-resumes/' + profilesElement.css.select_one('div.profile-image-cv a')['href'].lstrip('/') if profilesElement.css.select_one('div.profile-image-cv a') else ''
-
-                resume = eaglenetIdMap[id]['Resume'] if inIdMap else resume
-                if resume and isinstance(resume, str) and resume.strip() != '':
-                    resume = resume.strip()
-                    resume = BASE_ASSET_PATH + '/migrated-profile-resumes/' + resume.lstrip('/')
-
-                # Overwrite resume with CV if present
-                cv = eaglenetIdMap[id]['CV'] if inIdMap else ''
-                if cv and isinstance(cv, str) and cv.strip() != '':
-                    cv = cv.strip()
-                    cv = BASE_ASSET_PATH + '/migrated-profile-resumes/' + cv.lstrip('/')
-                    resume = cv  # overwrite resume with CV
-
-                # Add profile image if present and not default
-                profileImage = BASE_ASSET_PATH + '/migrated-profile-images/' + profilesElement.css.select_one('div.profile-image-cv img')['src'].lstrip('/') if profilesElement.css.select_one('div.profile-image-cv img') else ''
-
-                profileImage = eaglenetIdMap[id]['Profile Image'] if inIdMap else profileImage
-                if profileImage and isinstance(profileImage, str) and profileImage.strip() != '':
-                    profileImage = profileImage.strip()
-                    if not profileImage.lower().endswith('/uploads/defaults/original/au_profile.jpg'):
-                        profileImage = BASE_ASSET_PATH + '/migrated-profile-images/' + profileImage.lstrip('/')
-                    else:
-                        profileImage = '/content/dam/au/assets/global/images/au_profile.jpg'  # default image
-                
-                if profileImage.lower().endswith('/uploads/defaults/original/au_profile.jpg'):
-                    profileImage = '/content/dam/au/assets/global/images/au_profile.jpg'  # default image
-
-                # Add authorized admins if present
-                authorizedAdmins = eaglenetIdMap[id]['Authorized Admins'] if inIdMap else ''
-                authorizedAdminsString = ''
-                if authorizedAdmins and isinstance(authorizedAdmins, str) and authorizedAdmins.strip() != '':
-                    for admin in authorizedAdmins.split(','):
-                        authorizedAdminsString += '{"authorizedAdminCMF":"(' + admin.strip() + '@american.edu)"}|'
-                # remove trailing |, add closing bracket
-                if len(authorizedAdminsString) > 1:
-                    authorizedAdminsString = authorizedAdminsString[:-1]
-                else:
-                    authorizedAdminsString = ''
-
-                savePath = BASE_CF_PATH + '/' + id
-                if (len(id.strip()) >= 2):
-                    # CFs save path is BASE_CF_PATH + first two chars of id + full id
-                    savePath = BASE_CF_PATH + '/' + id[:2] + '/' + id
-
-                cfs.append({
-                    "path": savePath,   
-                    "name": "profileCF",
-                    "title": "profileCF",
-                    "template": TEMPLATE_PATH,
-                    "forceDisplay": forceDisplay,
-                    "bio": bioHtml,
-                    "degrees": degreesHtml,
-                    "additionalPositions": additionalPositionsHtml,
-                    "partnerships": partnershipsHtml,
-                    "scholarly": scholarlyHtml,
-                    "officeHours": officeHoursHtml,
-                    "altPhone": altPhoneNumber,
-                    "altPhoneType": altPhoneType,
-                    "contactLinks": contactLinksHtml,
-                    "resume": resume,
-                    "photo": profileImage,
-                    "defaultProfilePage": url_val.replace('https://www.american.edu', '').replace('.cfm', ''),
-                    "authorizedAdminsMigrated": authorizedAdminsString,
-                    "username": id,
-                    "hideEmail": hideEmail,
-                    "hidePhone": hidePhone,
-                    "areasOfSpecializationMigrated": areasOfSpecializationMigrated,
-                    "first_name": first_name,
-                    "faculty_dept_name": faculty_dept_name,
-                    "staff_dept_name": staff_dept_name,
-                    "faculty_title": faculty_title,
-                    "staff_title": staff_title,
-                    "fso_line1": fso1,
-                    "fso_line2": fso2,
-                    "fso_phone": fso3,
-
-                })
-
-                print(f"✅ Processed #{row_idx_place}/{len(idsToProcess)}: {url_val}")
-                log_file.write(f"O Processed #{row_idx_place}/{len(idsToProcess)}: {url_val}\n")
-                success_page_list.write(f"{url_val}\n")
-            else:
-                print(f"⚠️ {url_val} → HTTP {response.status_code}")
-                log_file.write(f"! {url_val} -> HTTP {response.status_code}\n")
-                failed_log_file.write(f"! {url_val} -> HTTP {response.status_code}\n")
-        except requests.exceptions.RequestException:
-            print(f"❌ Failed to fetch {url_val}")
-            log_file.write(f"X Failed to fetch {url_val}\n")
-            failed_log_file.write(f"{url_val}\n")
-            continue
+    # Every ID's outcome goes to the event log; `python -m common.event_log` sums it up
+    events = event_log.EventLog(EVENT_LOG, append=bool(resumed))
 
+    headers = {"x-user-agent": "AU-AEM-Importer"}
 
-        print("----------------------------------")
-        log_file.write("----------------------------------\n")
+    # -- look up the ids in the profile report, sadea list and new profile page list ---
+    # (indexed sidecars of the workbooks, built on first use; see common/reference_data.py)
+    with run_report.stage("lookup"):
+        report = ReferenceSheet("2025_profilerotreport.xlsx", "2025_profilerotreport", "Eaglenet ID")
+        sadea = ReferenceSheet("sadeaList.xlsx", "Sheet1", "eaglenet_id")
+        newProfilePages = ReferenceSheet("new_profile_pages.xlsx", "Sheet1", "Eaglenet ID")
+
+        # -- map eaglenet ids to report rows, and resolve every id's profile page in one pass ---
+        eaglenetIdMap = report.rows(idsToProcess)
+        profileUrls = resolve_profile_urls(
+            idsToProcess, report.frame(idsToProcess), sadea.frame(idsToProcess), newProfilePages.frame(idsToProcess)
+        )["url"].to_dict()
+
+    if resumed:
+        run_report.add("ids_resumed", len(checkpoint))
+        print(f"↩️ Resuming: {len(checkpoint)} IDs already done in {CHECKPOINT_FILE}, keeping {', '.join(savedFiles) or 'no output files'}")
+        events.write("resumed", ids=len(checkpoint), checkpoint=CHECKPOINT_FILE, kept=savedFiles)
+
+    # --- Process URLs, appending CF rows to the output in input order ---
+    # A resumed run carries on after the output files the earlier run saved; only
+    # the rows of the file it had open are written again, from the journal.
+    shardedRun = None
+    if SHARDS > 1:
+        # each shard fetches and extracts its IDs in its own process; results come back in input order
+        todo = [id for id in idsToProcess if id not in checkpoint]
+        shardedRun = run_sharded(todo, SHARDS, run_profile_shard, args=(idsToProcess, eaglenetIdMap, profileUrls, headers))
+        run_report.attach("http", lambda: shardedRun.summaries)
+        results = iter(shardedRun)
+    else:
+        results = run_profiles(idsToProcess, eaglenetIdMap, profileUrls, headers, skip=checkpoint)
+    # Each row goes to the sink before the journal, so a file saved (and noted in
+    # the journal) while writing it holds only rows journaled before the note
+    with open_sink(CF_OUTPUT_FILE_NAME, max_rows=CF_OUTPUT_MAX_ROWS, max_mb=CF_OUTPUT_MAX_MB,
+                   first_part=len(savedFiles) + 1, on_save=lambda file: write_journal(journal, {"saved": file})) as sink:
+        if unsavedRows:
+            with unsavedRows:
+                for line in unsavedRows:
+                    entry = json.loads(line)
+                    if entry["cf"] is not None:
+                        sink.write(entry["cf"])
+                    write_checkpoint(journal, entry["id"], entry["cf"])
+        for id in idsToProcess:
+            if id in checkpoint:
+                continue
+            _, cf, out, retry = next(results)
+            write_messages(out, events)
+            if cf is not None:
+                sink.write(cf)
+            # transient failures stay out of the journal so a restart tries them again
+            if not retry:
+                write_checkpoint(journal, id, cf)
+    next(results, None)    # let the shards finish and report
+    journal.close()
 
     # --- Save CF Output ---
-    cf_out_df = pd.DataFrame(cfs)
-    cf_out_df.to_excel(CF_OUTPUT_FILE_NAME, index=False)
-    print(f"✅ CF Output written to {CF_OUTPUT_FILE_NAME}")
-    log_file.write(f"O CF Output written to {CF_OUTPUT_FILE_NAME}\n")
-    log_file.close()
-    failed_log_file.close()
+    print(f"✅ CF Output written to {', '.join(savedFiles + sink.files)} ({sink.rows_written} rows this run)")
+    events.write("output", files=savedFiles + sink.files, rows=sink.rows_written)
+    for summary in shardedRun.summaries if shardedRun else [http_cache.summary()]:
+        print(f"🔌 {summary}")
+        events.write("http", summary=summary)
+    events.close()
 
 
 if __name__ == "__main__":
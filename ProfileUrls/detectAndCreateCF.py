@@ -1,10 +1,13 @@
-import requests
-from bs4 import BeautifulSoup
 from openpyxl import load_workbook
 from urllib.parse import urlparse
 import os
-import pandas as pd
 import cssutils
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import run_report
+from common.cf_sink import open_sink
+from common.profile_urls import resolve_listed_urls
+from common.reference_data import ReferenceSheet
 
 # Config
 TEMPLATE_PATH = "/conf/au/settings/dam/cfm/models/profiles"
@@ -17,6 +20,7 @@ IDS_SHEET = "batch1"
 ELEMENT_SELECTOR = "div.CS_Element_Custom > div.profile-full"
 IDS_HEADER = "Eaglenet ID"
 CF_OUTPUT_FILE_NAME = "cf_out.xlsx"
+FAILED_IDS_FILE_NAME = "failed_ids.xlsx"
 
 
 
@@ -56,6 +60,7 @@ def find_column(sheet, header_name):
     raise ValueError(f"Column '{header_name}' not found in sheet '{sheet.title}'")
 
 def expand_elements():
+    run_report.start(__file__)
     wb = load_workbook(INPUT_FILE)
     ids_sheet_obj = wb[IDS_SHEET]
 
@@ -75,100 +80,58 @@ def expand_elements():
 
     headers = {"x-user-agent": "AU-AEM-Importer"}
 
-    # -- load profile report and create map of eaglenet ids ---
-    reportWb = pd.read_excel("2025_profilerotreport.xlsx", sheet_name="2025_profilerotreport")
-    eaglenetIdMap = {}
-    for index, row in reportWb.iterrows():
-        eaglenetIdMap[row['Eaglenet ID']] = row
-
-    # -- load sadea list and create map of eaglenet ids ---
-    sadeaWb = pd.read_excel("sadeaList.xlsx", sheet_name="Sheet1")
-    sadeaMap = {}
-    for index, row in sadeaWb.iterrows():
-        sadeaMap[row['eaglenet_id']] = row
-    
-    # --- Process URLs ---
-    cfs = []
-    failedIds = []
-    for row_idx_place, id in enumerate(idsToProcess):
-
-        if id not in eaglenetIdMap:
-            print(f"⚠️ Eaglenet ID {id} not found in report")
-            log_file.write(f"Not found in ROT report:                {id}\n")
-            failedIds.append({
-                "id": id,
-                "reason": "Not found in ROT report"
-            })
-            continue
-        
-        url = ""
-        stage_url = ""
-        path = ""
-        defaultProfilePage = eaglenetIdMap[id]['Default Profile Page']
-        sadeaProfilePage = sadeaMap[id]['full url'] if id in sadeaMap else None
-        if defaultProfilePage is not None and isinstance(defaultProfilePage, str) and defaultProfilePage.strip() != '':
-            url_val = defaultProfilePage.strip().lower()
-            path = "/content/au" + url_val.replace('https://www.american.edu', '').replace('.cfm', '')
-            stage_url = 'https://aem-stage.american.edu' + url_val if url_val.startswith('/') else url_val
-            stage_url = stage_url.replace('https://www.american.edu', 'https://aem-stage.american.edu').replace('.cfm', '')
-            url_val = 'https://www.american.edu' + url_val if url_val.startswith('/') else url_val
-            print(f"🔍 Processing Eaglenet ID {id} → {url_val}")
-            url = url_val
-        else:
-            print(f"! Eaglenet ID {id} has no Default Profile Page")
-            #log_file.write(f"! Eaglenet ID {id} has no Default Profile Page\n")
-
-            allProfilePages = eaglenetIdMap[id]['All Profile Pages']
-            if allProfilePages is None or not isinstance(allProfilePages, str) or allProfilePages.strip() == '':
+    # -- look up the ids in the profile report and sadea list, and resolve every id's profile page in one pass ---
+    # (indexed sidecars of the workbooks, built on first use; see common/reference_data.py)
+    with run_report.stage("lookup"):
+        report = ReferenceSheet("2025_profilerotreport.xlsx", "2025_profilerotreport", "Eaglenet ID")
+        sadea = ReferenceSheet("sadeaList.xlsx", "Sheet1", "eaglenet_id")
+        reportRows = report.frame(idsToProcess)
+        reportIds = set(reportRows['Eaglenet ID'])
+        resolved = resolve_listed_urls(idsToProcess, reportRows, sadea.frame(idsToProcess)).to_dict("index")
+
+    # --- Process URLs, streaming rows to the outputs as they are built ---
+    with open_sink(CF_OUTPUT_FILE_NAME) as sink, open_sink(FAILED_IDS_FILE_NAME) as failedIdsSink:
+        for row_idx_place, id in enumerate(idsToProcess):
+
+            if id not in reportIds:
+                print(f"⚠️ Eaglenet ID {id} not found in report")
+                log_file.write(f"Not found in ROT report:                {id}\n")
+                failedIdsSink.write({
+                    "id": id,
+                    "reason": "Not found in ROT report"
+                })
+                run_report.count("failures", "Not found in ROT report")
+                continue
+
+            url = resolved[id]["url"]
+            source = resolved[id]["source"]
+            if source != "Default Profile Page":
+                print(f"! Eaglenet ID {id} has no Default Profile Page")
+            if url is None:
                 print(f"! Eaglenet ID {id} has no Additional Profile Page")
                 continue
 
-            urls_val = allProfilePages.strip().lower()
-            urls_val = urls_val.replace('faculty:', '')
-            urls_val = urls_val.replace('staff:', '')
-            urls_val = urls_val.replace('student:', '')
-            hasProfile = False
-            for url_val in urls_val.split('|'):
-                url_val = url_val.strip()
-                if url_val == '':
-                    continue
-                hasProfile = True
-                stage_url = 'https://aem-stage.american.edu' + url_val if url_val.startswith('/') else url_val
-                stage_url = stage_url.replace('https://www.american.edu', 'https://aem-stage.american.edu').replace('.cfm', '')
-                path = "/content/au" + url_val.replace('https://www.american.edu', '').replace('.cfm', '')
-                url = 'https://www.american.edu' + url_val if url_val.startswith('/') else url_val
-                print(f"🔍 Processing Eaglenet ID {id} → {url_val}")
-
-        if url == "" and sadeaProfilePage is not None and isinstance(sadeaProfilePage, str) and sadeaProfilePage.strip() != '':
-            url_val = sadeaProfilePage.strip()
-            stage_url = 'https://aem-stage.american.edu' + url_val if url_val.startswith('/') else url_val
-            stage_url = stage_url.replace('https://www.american.edu', 'https://aem-stage.american.edu').replace('.cfm', '')
-            path = "/content/au" + url_val.replace('https://www.american.edu', '').replace('.cfm', '')
-            print(f"🔍 Processing Eaglenet ID {id} → {url_val}")
-            url = url_val
-
-        if not url or url == "":
-            print(f"! Eaglenet ID {id} has no valid Additional Profile Pages")
-            log_file.write(f"Profile page missing in ROT report:     {id}\n")
-            failedIds.append({
-                "id": id,
-                "reason": "Profile page missing in ROT report and Sadea list"
-            })
-        else:
-            cfs.append({
-                "url": url,
-                "id": id,
-                "stage url": stage_url,
-                "path": '"' + path + '",',
-            })
-            print(f"✅ Processed #{row_idx_place}/{len(idsToProcess)}: {url}")
-            print("----------------------------------")
+            if url == "":
+                print(f"! Eaglenet ID {id} has no valid Additional Profile Pages")
+                log_file.write(f"Profile page missing in ROT report:     {id}\n")
+                failedIdsSink.write({
+                    "id": id,
+                    "reason": "Profile page missing in ROT report and Sadea list"
+                })
+                run_report.count("failures", "Profile page missing in ROT report and Sadea list")
+            else:
+                print(f"🔍 Processing Eaglenet ID {id} → {url}")
+                run_report.count("url_sources", source)
+                sink.write({
+                    "url": url,
+                    "id": id,
+                    "stage url": resolved[id]["stage_url"],
+                    "path": '"' + resolved[id]["path"] + '",',
+                })
+                print(f"✅ Processed #{row_idx_place}/{len(idsToProcess)}: {url}")
+                print("----------------------------------")
 
     # --- Save CF Output ---
-    cf_out_df = pd.DataFrame(cfs)
-    cf_out_df.to_excel(CF_OUTPUT_FILE_NAME, index=False)
-    failedIds_df = pd.DataFrame(failedIds)
-    failedIds_df.to_excel("failed_ids.xlsx", index=False)
     print(f"✅ CF Output written to {CF_OUTPUT_FILE_NAME}")
     log_file.write(f"O CF Output written to {CF_OUTPUT_FILE_NAME}\n")
     log_file.close()
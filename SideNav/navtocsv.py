@@ -1,21 +1,29 @@
 import pandas as pd
 import requests
-from bs4 import BeautifulSoup
 import json
 import os
 from urllib.parse import urlparse
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import http_cache, run_report
+from common.cf_sink import open_sink
+from common.html_parser import parse_html, subtrees
 
 # Config
 TEMPLATE_PATH = "/conf/au/settings/dam/cfm/models/side-nav-cf-model"
 INPUT_EXCEL = "/Users/raghvendrasingh/TA/AU/Migration/SideNav/input.xlsx"   # Excel with a column "URL"
 OUTPUT_XLSX = "output.xlsx"
+OUTPUT_MAX_ROWS = None   # rotate to output_2.xlsx, ... after this many rows
+OUTPUT_MAX_MB = None     # or after roughly this much cell data
 FAILED_LOG = "failed_urls.txt"
 BASE_CF_PATH = "/content/dam/au/cf"
 BASE_PAGE_PATH = "/content/au"
+# nav#left-navigation and the page <title> are all extract_sidenav reads
+PARSE_ONLY = subtrees(["nav", "title"])
 
 def extract_sidenav_json(nav_html):
-    """Convert <nav> HTML into sideNavLinksCMF JSON (one line per object)"""
-    soup = BeautifulSoup(nav_html, "html.parser")
+    """Convert <nav> HTML (or an already parsed <nav> tag) into sideNavLinksCMF JSON (one line per object)"""
+    soup = parse_html(nav_html) if isinstance(nav_html, str) else nav_html
     json_items = []
 
     def process_href(href):
@@ -71,50 +79,69 @@ def get_page_name(url):
     page_name, _ = os.path.splitext(filename)
     return page_name
 
+def extract_sidenav(html, url, soup=None):
+    """Build the side nav CF row for a page, or None when it has no left navigation.
+
+    soup is the page already parsed (e.g. by Crawl/crawl.py), instead of html.
+    """
+    if soup is None:
+        soup = parse_html(html, only=PARSE_ONLY)
+    nav = soup.find("nav", {"id": "left-navigation"})
+    if not nav:
+        return None
+
+    side_nav_json = extract_sidenav_json(nav)
+    converted_path = convert_url_to_path(url)
+    name = get_page_name(url)
+    title_tag = soup.find("title")
+    title = title_tag.get_text(strip=True) if title_tag else name
+
+    return {
+        "path": converted_path,
+        "name": name,
+        "title": title,
+        "template": TEMPLATE_PATH,
+        "sideNavLinksCMF": side_nav_json
+    }
+
 # --- Main Script ---
-df = pd.read_excel(INPUT_EXCEL)
-rows = []
-failed_urls = []
-
-for url in df['URL']:
-    try:
-        headers = {"x-user-agent": "AU-AEM-Importer"}
-        r = requests.get(url, headers=headers, timeout=10)
-        r.raise_for_status()  # will raise HTTPError for 404/500, etc.
-
-        soup = BeautifulSoup(r.text, "html.parser")
-        nav = soup.find("nav", {"id": "left-navigation"})
-        if not nav:
-            failed_urls.append(f"No nav found: {url}")
-            continue
-
-        side_nav_json = extract_sidenav_json(str(nav))
-        converted_path = convert_url_to_path(url)
-        name = get_page_name(url)
-        title_tag = soup.find("title")
-        title = title_tag.get_text(strip=True) if title_tag else name
-
-        rows.append({
-            "path": converted_path,
-            "name": name,
-            "title": title,
-            "template": TEMPLATE_PATH,
-            "sideNavLinksCMF": side_nav_json
-        })
-
-    except requests.exceptions.RequestException as e:
-        failed_urls.append(f"{url} -> {str(e)}")
-        continue
-
-# Save results
-out_df = pd.DataFrame(rows)
-out_df.to_excel(OUTPUT_XLSX, index=False)
-print(f"✅ Output written to {OUTPUT_XLSX}")
-
-# Save failed URLs
-if failed_urls:
-    with open(FAILED_LOG, "w") as f:
-        f.write("\n".join(failed_urls))
-    print(f"⚠️ Logged {len(failed_urls)} failed URLs to {FAILED_LOG}")
-else:
-    print("🎉 No failed URLs.")
+def main():
+    run_report.start(__file__)
+    df = pd.read_excel(INPUT_EXCEL)
+    failed_urls = []
+
+    with open_sink(OUTPUT_XLSX, max_rows=OUTPUT_MAX_ROWS, max_mb=OUTPUT_MAX_MB) as sink:
+        for url in df['URL']:
+            try:
+                headers = {"x-user-agent": "AU-AEM-Importer"}
+                r = http_cache.get(url, headers=headers, timeout=10)
+                r.raise_for_status()  # will raise HTTPError for 404/500, etc.
+
+                with run_report.stage("extract"):
+                    row = extract_sidenav(r.text, url)
+                if row is None:
+                    failed_urls.append(f"No nav found: {url}")
+                    run_report.count("failures", "No nav found")
+                    continue
+                sink.write(row)
+
+            except requests.exceptions.RequestException as e:
+                failed_urls.append(f"{url} -> {str(e)}")
+                run_report.count("failures", f"HTTP {e.response.status_code}" if e.response is not None else "Failed to fetch")
+                continue
+
+    # Save results
+    print(f"✅ Output written to {', '.join(sink.files)} ({sink.rows_written} rows)")
+
+    # Save failed URLs
+    if failed_urls:
+        with open(FAILED_LOG, "w") as f:
+            f.write("\n".join(failed_urls))
+        print(f"⚠️ Logged {len(failed_urls)} failed URLs to {FAILED_LOG}")
+    else:
+        print("🎉 No failed URLs.")
+    print(f"🔌 {http_cache.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from corpus import COMPONENTS, PAGE_URLS, load_pages, load_script
+
+from common.census import Census, CensusWriter
+from common.component_rules import component_matcher
+
+# Builds component censuses of growing size from the saved pages (each page
+# repeated under a different URL, with the occasional failed fetch), checks every
+# lookup against the pages that went in, and reports the peak memory of the
+# writer, which should not grow with the number of pages, and the lookup times.
+#
+#   python benchmarks/census.py [pages ...]
+
+SIZES = [int(n) for n in sys.argv[1:]] or [20000, 60000]
+FAIL_EVERY = 97     # every this many pages is a 404
+LOOKUPS = 20000
+
+
+def page_at(i, saved):
+    name, counts = saved[i % len(saved)]
+    status = 404 if i % FAIL_EVERY == FAIL_EVERY - 1 else 200
+    return f"{PAGE_URLS[name]}?copy={i}", (counts if status == 200 else {}), status
+
+
+def build(path, pages, saved, components):
+    tracemalloc.start()
+    start = time.perf_counter()
+    with CensusWriter(path, components) as writer:
+        for i in range(pages):
+            url, counts, status = page_at(i, saved)
+            writer.add(url, counts, status)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def check(path, pages, saved, components):
+    problems = 0
+    with Census(path) as census:
+        expected_pages = {component: [] for component in components}
+        together = {(a, b): 0 for a in components for b in components}
+        for i in range(pages):
+            url, counts, status = page_at(i, saved)
+            if census.page_number(url) != i or census.status(i) != status:
+                problems += 1
+            used = [component for component in components if counts.get(component)]
+            for component in components:
+                if census.instances(i, component) != counts.get(component, 0):
+                    problems += 1
+            for a in used:
+                expected_pages[a].append(i)
+                for b in used:
+                    together[a, b] += 1
+        for component in components:
+            if census.pages_with(component) != expected_pages[component]:
+                problems += 1
+        for (a, b), n in together.items():
+            if census.together(a, b) != n:
+                problems += 1
+        if census.page_number("https://www.american.edu/not-in-the-census.cfm") is not None:
+            problems += 1
+
+        start = time.perf_counter()
+        for k in range(LOOKUPS):
+            i = (k * 7919) % pages
+            census.instances(census.page_number(page_at(i, saved)[0]), components[k % len(components)])
+        lookup_us = (time.perf_counter() - start) / LOOKUPS * 1e6
+    return problems, lookup_us
+
+
+def main():
+    script = load_script("Identify-component", "census")
+    matcher = component_matcher(script.RULES_FILE, script.RULE_SET, COMPONENTS)
+    saved = [(name, script.count_components(html, matcher)) for name, (url, html) in load_pages().items()]
+
+    failures = 0
+    peaks = []
+    for pages in SIZES:
+        path = tempfile.mkdtemp(prefix="census_")
+        try:
+            elapsed, peak = build(path, pages, saved, matcher.components)
+            size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+            problems, lookup_us = check(path, pages, saved, matcher.components)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+        failures += problems
+        peaks.append(peak)
+        print(f"{pages:>8,} pages  built in {elapsed:6.2f}s  peak {peak / 1024:8.1f} KiB  files {size / 1024:9.1f} KiB  "
+              f"URL + instances lookup {lookup_us:5.1f} us  {problems} wrong")
+
+    if failures:
+        sys.exit(f"{failures} lookups disagree with the pages added")
+    if len(peaks) > 1 and peaks[-1] > 2 * peaks[0]:
+        sys.exit(f"Peak memory grew from {peaks[0]:,} to {peaks[-1]:,} bytes with the number of pages")
+    print("Every lookup matches the pages added; the writer's memory does not grow with the pages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import random
+import sys
+import time
+
+from corpus import COMPONENTS, load_pages, load_script
+
+from common.html_parser import parse_html
+
+# Identify-component's flags from the compiled rules (component_rules.json)
+# against the per-component loops the scripts used to run, on every saved page
+# and on synthetic pages with many sections, then times both as the component
+# list grows.
+#
+#   python benchmarks/component_matcher.py [repeats]
+
+REPEATS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+COMPONENT_COUNTS = (5, 20, 60)
+SYNTHETIC_PAGES = 20
+SECTIONS_PER_PAGE = 120
+
+
+def loop_detect_components(soup, components):
+    # detectComponent.py's detect_components as it was before the rules file
+    dom_matches = {comp: 0 for comp in components}
+    for section in soup.find_all("section"):
+        data_element = section.get("data-element", "").strip().lower()
+        class_list = [cls.strip().lower() for cls in section.get("class", [])]
+        for comp in components:
+            comp_clean = comp.lower()
+            if data_element == comp_clean or comp_clean in class_list:
+                dom_matches[comp] = 1
+    return dom_matches
+
+
+def loop_component_check(soup, components):
+    # component_check.py's detect_components as it was before the rules file
+    dom_matches = {}
+    for comp in components:
+        comp_clean = comp.strip().lower()
+        found = False
+        for section in soup.find_all("section"):
+            data_element = section.get("data-element", "").strip().lower()
+            class_list = [cls.strip().lower() for cls in section.get("class", [])]
+            if data_element == comp_clean and "hero-image-full" in class_list:
+                found = True
+                break
+        dom_matches[comp] = 1 if found else 0
+    return dom_matches
+
+
+def component_names(n):
+    names = list(COMPONENTS) + [f"Component {i}" for i in range(n)] + [f"widget-{i}" for i in range(n)]
+    return names[:n]
+
+
+def synthetic_page(rng, names):
+    # sections named (in any case) after some of the components, by data-element or class
+    sections = []
+    for _ in range(SECTIONS_PER_PAGE):
+        name = rng.choice(names + ["Other Thing"])
+        name = name.upper() if rng.random() < 0.2 else name
+        classes = ["section", "hero-image-full" if rng.random() < 0.3 else "plain"]
+        if rng.random() < 0.5:
+            sections.append(f'<section data-element=" {name} " class="{" ".join(classes)}"><p>x</p></section>')
+        else:
+            classes.append(name.replace(" ", "-"))
+            sections.append(f'<section class="{" ".join(classes)}"><section data-element="Inner"><p>y</p></section></section>')
+    return f"<html><body>{''.join(sections)}</body></html>"
+
+
+def best_of(fn):
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    scripts = {
+        "detectComponent": (load_script("Identify-component", "detectComponent"), loop_detect_components),
+        "component_check": (load_script("Identify-component", "component_check"), loop_component_check),
+    }
+    rng = random.Random(7)
+    mismatches = 0
+
+    saved = [parse_html(html) for url, html in load_pages().values()]
+    for count in COMPONENT_COUNTS:
+        names = component_names(count)
+        soups = saved + [parse_html(synthetic_page(rng, names)) for _ in range(SYNTHETIC_PAGES)]
+        for script_name, (script, loop) in scripts.items():
+            for soup in soups:
+                expected = loop(soup, names)
+                got = script.detect_components(None, names, soup=soup)
+                if got != expected:
+                    mismatches += 1
+                    print(f"MISMATCH {script_name}, {count} components: {got} != {expected}")
+            loop_s = best_of(lambda: [loop(soup, names) for soup in soups])
+            rules_s = best_of(lambda: [script.detect_components(None, names, soup=soup) for soup in soups])
+            print(f"{script_name:<16}{count:>4} components  loops {loop_s * 1000:8.1f} ms  rules {rules_s * 1000:8.1f} ms  x{loop_s / rules_s:5.1f}")
+
+    if mismatches:
+        sys.exit(f"{mismatches} pages flagged differently")
+    print("Compiled rules flag the same components as the loops")
+
+
+if __name__ == "__main__":
+    main()
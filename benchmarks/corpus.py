@@ -0,0 +1,82 @@
+import glob
+import importlib.util
+import os
+import sys
+
+# Shared helpers for the benchmarks: the saved page corpus and the extractors of
+# every script, callable on a page's HTML without touching the network.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES_DIR = os.path.join(ROOT, "benchmarks", "pages")
+sys.path.insert(0, ROOT)
+
+# Where each saved page would have been fetched from
+PAGE_URLS = {
+    "faculty_profile": "https://www.american.edu/spa/faculty/jdoe.cfm",
+    "staff_profile": "https://www.american.edu/profiles/staff/asmith.cfm",
+    "magazine_article": "https://www.american.edu/magazine/article/the-long-game.cfm",
+    "text_block_page": "https://www.american.edu/admissions/graduate/index.cfm",
+    "side_nav_page": "https://www.american.edu/sis/undergraduate/index.cfm",
+    "deep_side_nav": "https://www.american.edu/sis/graduate/index.cfm",
+}
+COMPONENTS = ["2016 Text Block", "2016 Collapsible Content", "2016 Hero Image", "hero-image-full", "Magazine Article"]
+
+_scripts = {}
+
+
+def load_script(folder, name="detectAndCreateCF"):
+    # Every folder has its own detectAndCreateCF.py, so import by path
+    key = (folder, name)
+    if key not in _scripts:
+        spec = importlib.util.spec_from_file_location(f"{folder}_{name}".replace("-", "_"), os.path.join(ROOT, folder, f"{name}.py"))
+        module = importlib.util.module_from_spec(spec)
+        # registered like an import, so its functions can be pickled to worker processes
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+        _scripts[key] = module
+    return _scripts[key]
+
+
+def load_pages(pages_dir=PAGES_DIR):
+    """{page name: (url, html)} for every saved page."""
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(pages_dir, "*.html"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, encoding="utf-8") as f:
+            pages[name] = (PAGE_URLS.get(name, f"https://www.american.edu/{name}.cfm"), f.read())
+    return pages
+
+
+def load_css():
+    """GetTextBlockHtml's CSS class index, as extract_text_blocks uses it."""
+    from common.css_index import load_css_index
+
+    css_dir = os.path.join(ROOT, "GetTextBlockHtml")
+    return load_css_index(
+        os.path.join(css_dir, "au-styles.css"),
+        extra_files=[os.path.join(css_dir, "extracted_css.css")],
+        cache_dir=os.path.join(css_dir, ".css_index_cache"),
+    )
+
+
+def extractors():
+    """{extractor name: fn(html, url) -> output} covering every script."""
+    profile_cf = load_script("ProfileCF")
+    magazine_cf = load_script("MagazineCF")
+    text_block_cf = load_script("GetTextBlockHtml")
+    text_block_detect = load_script("GetTextBlockHtml", "detectComponent")
+    side_nav = load_script("SideNav", "navtocsv")
+    components = load_script("Identify-component", "detectComponent")
+    hero_components = load_script("Identify-component", "component_check")
+
+    css_index = load_css()
+
+    return {
+        "profile": lambda html, url: profile_cf.extract_profile(html, "jdoe", url, {}),
+        "magazine": lambda html, url: magazine_cf.extract_article(html, url),
+        "text_blocks": lambda html, url: text_block_cf.extract_text_blocks(html, url, "2016 Text Block", css_index),
+        "invalid_html": lambda html, url: text_block_detect.page_has_invalid_html(html),
+        "side_nav": lambda html, url: side_nav.extract_sidenav(html, url),
+        "components": lambda html, url: components.detect_components(html, COMPONENTS),
+        "hero_components": lambda html, url: hero_components.detect_components(html, COMPONENTS),
+    }
@@ -0,0 +1,115 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Measure the network path, not the shared HTTP cache
+os.environ["AEM_HTTP_CACHE"] = "0"
+
+from corpus import ROOT, load_pages
+
+# Runs the component, invalid-HTML, text-block and side-nav extractors over the
+# saved pages (served by a local stub server with an artificial delay), first
+# the way the separate scripts do (each fetches and parses every page itself)
+# and then through Crawl's single pipeline, with extraction in this process and
+# in a pool of worker processes. All must produce the same rows.
+#
+#   python benchmarks/crawl_pipeline.py [copies_of_each_page] [latency_ms]
+
+COPIES = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+LATENCY = (int(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+ENABLED = ["components", "invalid_html", "text_blocks", "side_nav"]
+PROCESSES = max(2, os.cpu_count() or 1)
+
+PAGES = {f"/{name}.cfm": html.encode("utf-8") for name, (url, html) in load_pages().items()}
+requests_served = 0
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        global requests_served
+        requests_served += 1
+        time.sleep(LATENCY)
+        body = PAGES.get(self.path.split("?")[0])
+        self.send_response(200 if body else 404)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body or b"")))
+        self.end_headers()
+        self.wfile.write(body or b"")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def check_rows(plugins, separate, label):
+    for plugin in plugins:
+        with open(plugin.output_file, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        assert rows == separate[plugin.name], f"{plugin.name}: {label} rows differ from the separate run"
+
+
+def main():
+    global requests_served
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    urls = [f"{base_url}{path}?copy={i}" for i in range(COPIES) for path in PAGES] + [f"{base_url}/missing.cfm"]
+
+    sys.path.insert(0, os.path.join(ROOT, "Crawl"))
+    import extractors  # noqa: F401
+    from common.pipeline import EXTRACTORS, Page, fetch_pages, run_pipeline
+    plugins = [EXTRACTORS[name]() for name in ENABLED]
+    headers = {"x-user-agent": "AU-AEM-Importer"}
+
+    # --- every extractor on its own: fetch + parse + extract per URL ---
+    requests_served = 0
+    start = time.perf_counter()
+    separate = {}
+    for plugin in plugins:
+        rows = []
+        for url, response, error in fetch_pages(urls, headers):
+            if error is None and response.status_code == 200:
+                rows += plugin.extract(Page(url, response.text))
+            else:
+                rows += plugin.failed(url, "")
+        separate[plugin.name] = rows
+    separate_time = time.perf_counter() - start
+    separate_requests = requests_served
+
+    # --- one pipeline: fetch + parse once, every extractor on the same tree ---
+    out_dir = tempfile.mkdtemp(prefix="crawl_pipeline_")
+    for plugin in plugins:
+        plugin.output_file = os.path.join(out_dir, f"{plugin.name}.jsonl")
+    requests_served = 0
+    start = time.perf_counter()
+    sys.stdout = open(os.devnull, "w")
+    try:
+        run_pipeline(urls, plugins, headers, workers=1)
+        serial_time = time.perf_counter() - start
+        start = time.perf_counter()
+        run_pipeline(urls, plugins, headers, workers=4)
+        pooled_time = time.perf_counter() - start
+        check_rows(plugins, separate, "pipeline")
+        start = time.perf_counter()
+        run_pipeline(urls, plugins, headers, workers=4, processes=PROCESSES)
+        process_time = time.perf_counter() - start
+        check_rows(plugins, separate, f"pipeline with {PROCESSES} processes")
+    finally:
+        sys.stdout = sys.__stdout__
+    pipeline_requests = requests_served // 3
+
+    server.shutdown()
+    print(f"{len(urls)} URLs, {LATENCY * 1000:.0f} ms stub latency, extractors: {', '.join(ENABLED)}")
+    print(f"separate scripts      {separate_time:7.2f}s  {separate_requests:5d} requests")
+    print(f"pipeline              {serial_time:7.2f}s  {pipeline_requests:5d} requests  x{separate_time / serial_time:.1f}")
+    print(f"pipeline, 4 workers   {pooled_time:7.2f}s  {pipeline_requests:5d} requests  x{separate_time / pooled_time:.1f}")
+    print(f"  + {PROCESSES} processes       {process_time:7.2f}s  {pipeline_requests:5d} requests  x{separate_time / process_time:.1f}"
+          f"  ({os.cpu_count()} cores)")
+    print("All extractors produce the same rows through the pipeline")
+
+
+if __name__ == "__main__":
+    main()
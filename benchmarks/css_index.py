@@ -0,0 +1,103 @@
+import glob
+import logging
+import os
+import sys
+import time
+
+import cssutils
+from bs4 import BeautifulSoup
+
+# Time per section of gathering relevant CSS for GetTextBlockHtml, comparing the
+# old full-stylesheet scan against the class -> rule index. Every saved page in
+# benchmarks/pages (or the directory given) is used as the corpus.
+#
+#   python benchmarks/css_index.py [pages_dir]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from common.css_index import CssClassIndex
+
+PAGES_DIR = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, "benchmarks", "pages")
+CSS_FILE = os.path.join(ROOT, "GetTextBlockHtml", "au-styles.css")
+SECTION_ELEMENTS = {"2016 text block", "2016 collapsible content"}
+
+
+def scan_relevant_classes(css_parser, classList):
+    # get_relevant_classes as it was before the index
+    relevant_classes = ""
+    for rule in css_parser.cssRules:
+        if rule.type == rule.STYLE_RULE:
+            selector_text = rule.selectorText
+            for class_name in classList:
+                if f".{class_name}" in selector_text:
+                    processed_selectors = '.html-embed-wrapper ' + selector_text.replace(",", ", .html-embed-wrapper")
+                    if rule.parentRule is None:
+                        relevant_classes += f"{processed_selectors} {{{rule.style.cssText}}}\n"
+                    else:
+                        relevant_classes += f"{rule.parentRule.cssText} {{ {processed_selectors} {{{rule.style.cssText}}} }}\n"
+        elif rule.type == rule.MEDIA_RULE:
+            media_relevant = ""
+            for sub_rule in rule.cssRules:
+                if sub_rule.type == sub_rule.STYLE_RULE:
+                    selector_text = sub_rule.selectorText
+                    for class_name in classList:
+                        if f".{class_name}" in selector_text:
+                            processed_selectors = '.html-embed-wrapper ' + selector_text.replace(",", ", .html-embed-wrapper")
+                            media_relevant += f"{processed_selectors} {{{sub_rule.style.cssText}}}\n"
+            if media_relevant:
+                relevant_classes += f"@media {rule.media.mediaText} {{\n{media_relevant}}}\n"
+    return relevant_classes
+
+
+def section_class_lists(pages_dir):
+    class_lists = []
+    for path in sorted(glob.glob(os.path.join(pages_dir, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            soup = BeautifulSoup(f.read(), "html.parser")
+        for section in soup.find_all("section"):
+            if section.get("data-element", "").strip().lower() not in SECTION_ELEMENTS:
+                continue
+            class_list = []
+            for child in section.descendants:
+                if hasattr(child, 'get'):
+                    for cls in child.get('class') or []:
+                        if cls not in class_list:
+                            class_list.append(cls)
+            class_lists.append(class_list)
+    return class_lists
+
+
+def main():
+    cssutils.log.setLevel(logging.CRITICAL)
+    start = time.perf_counter()
+    css_parser = cssutils.parseFile(CSS_FILE)
+    parse_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    css_index = CssClassIndex(css_parser)
+    index_time = time.perf_counter() - start
+
+    class_lists = section_class_lists(PAGES_DIR)
+    if not class_lists:
+        sys.exit(f"No Text Block / Collapsible sections found in {PAGES_DIR}")
+
+    start = time.perf_counter()
+    before = [scan_relevant_classes(css_parser, class_list) for class_list in class_lists]
+    scan_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    after = [css_index.relevant_css(class_list) for class_list in class_lists]
+    lookup_time = time.perf_counter() - start
+
+    assert before == after, "index output differs from the stylesheet scan"
+
+    sections = len(class_lists)
+    print(f"{sections} sections, {len(css_index.texts)} style rules")
+    print(f"parse au-styles.css   {parse_time * 1000:9.1f} ms (once)")
+    print(f"build index           {index_time * 1000:9.1f} ms (once)")
+    print(f"scan per section      {scan_time / sections * 1000:9.3f} ms")
+    print(f"index per section     {lookup_time / sections * 1000:9.3f} ms   x{scan_time / lookup_time:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+import corpus  # noqa: F401  (puts the repo root on sys.path)
+from common.http_client import HttpClient
+
+# Plain requests.get (a new connection per page, no retries) against the pooled
+# HttpClient, using a local keep-alive stub server. The second half makes the
+# server answer 503 or drop the connection on the first attempts at some pages
+# to show what the retries recover.
+#
+#   python benchmarks/http_client.py [requests]
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+FLAKY_EVERY = 5         # every 5th page fails its first FLAKY_ATTEMPTS attempts
+FLAKY_ATTEMPTS = 2
+PAGE = b"<html><body>" + b"x" * 20000 + b"</body></html>"
+
+connections = 0
+attempts = {}
+lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive
+    # send headers and body in one segment, or delayed ACKs stall every kept-alive request
+    disable_nagle_algorithm = True
+    wbufsize = -1
+
+    def setup(self):
+        global connections
+        with lock:
+            connections += 1
+        super().setup()
+
+    def do_GET(self):
+        page = int(self.path.rsplit("/", 1)[-1])
+        with lock:
+            attempts[page] = attempts.get(page, 0) + 1
+            attempt = attempts[page]
+        if self.server.flaky and page % FLAKY_EVERY == 0 and attempt <= FLAKY_ATTEMPTS:
+            if page % (FLAKY_EVERY * 2) == 0:
+                self.close_connection = True    # reset: drop the connection without answering
+                return
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(server, get):
+    global connections
+    connections = 0
+    attempts.clear()
+    ok = failed = 0
+    start = time.perf_counter()
+    for page in range(REQUESTS):
+        try:
+            response = get(f"http://127.0.0.1:{server.server_port}/page/{page}", headers={"x-user-agent": "AU-AEM-Importer"}, timeout=10)
+            if response.status_code == 200:
+                ok += 1
+            else:
+                failed += 1
+        except requests.exceptions.RequestException:
+            failed += 1
+    return time.perf_counter() - start, ok, failed, connections
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    for flaky in (False, True):
+        server.flaky = flaky
+        print(f"\n{REQUESTS} pages{f', every {FLAKY_EVERY}th failing its first {FLAKY_ATTEMPTS} attempts' if flaky else ''}")
+        client = HttpClient(retries=3, backoff=0.01)
+        for name, get in (("requests.get", requests.get), ("HttpClient", client.get)):
+            elapsed, ok, failed, opened = run(server, get)
+            print(f"{name:<14}{elapsed:7.2f}s  {ok:4d} ok  {failed:4d} failed  {opened:4d} server connections")
+        print(f"  {client.summary()}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import random
+import sys
+import time
+
+from corpus import load_pages, load_script
+
+from common.html_parser import parse_html
+
+# GetTextBlockHtml's invalid-HTML verdicts from the declared rules (one walk per
+# section, stopping at the first rule that fires) against the selector passes
+# the scripts used to run, on every Text Block / Collapsible of the saved pages
+# and on random synthetic sections, then times both.
+#
+#   python benchmarks/markup_rules.py [synthetic sections]
+
+SYNTHETIC = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+REPEATS = 5
+SECTION_ELEMENTS = ["2016 Collapsible Content", "2016 Text Block"]
+
+
+def selector_checks(section):
+    # each check of detectComponent.py's invalidHtml, by the name of its rule
+    return {
+        "contains dl/dt/form/table": section.css.select_one("dl, dt, form, table") is not None,
+        "more than one img": len(section.css.select("img")) > 1,
+        "more than one figure": len(section.css.select("figure")) > 1,
+        "more than one blockquote": len(section.css.select("blockquote")) > 1,
+        "img outside figure": any(img.parent.name != "figure" for img in section.css.select("img")),
+    }
+
+
+def jump_to_check(section):
+    # the "Jump To" rule detectAndCreateCF.py's invalidHtml added
+    for p in section.select("p"):
+        strong_text = p.find("strong")
+        if strong_text and "Jump To" in strong_text.get_text() and len(p.select("a.btn")) > 0:
+            return True
+    return False
+
+
+def selector_invalid_html(section, jump_to=False):
+    # invalidHtml as it was, returning at the first check that holds
+    if section.css.select_one("dl, dt, form, table") is not None:
+        return True
+    if len(section.css.select("img")) > 1 or len(section.css.select("figure")) > 1:
+        return True
+    if len(section.css.select("blockquote")) > 1:
+        return True
+    for img in section.css.select("img"):
+        if img.parent.name != "figure":
+            return True
+    return jump_to and jump_to_check(section)
+
+
+def selector_page_check(soup):
+    # detectComponent.py's page_has_invalid_html as it was
+    collapsibles = soup.find_all("section", {"data-element": "2016 Collapsible Content"})
+    text_blocks = soup.find_all("section", {"data-element": "2016 Text Block"})
+    for section in collapsibles + text_blocks:
+        if selector_invalid_html(section):
+            return True
+    return False
+
+
+def synthetic_section(rng, depth=0):
+    parts = []
+    for _ in range(rng.randint(0, 4)):
+        kind = rng.random()
+        if kind < 0.25:
+            strong = "<strong>Jump To</strong>" if rng.random() < 0.4 else "<strong>Note</strong>"
+            button = "<a class='btn' href='#a'>A</a>" if rng.random() < 0.4 else ""
+            parts.append(f"<p>{strong} text {button}</p>")
+        elif kind < 0.4:
+            parts.append("<figure><img src='/a.jpg'></figure>")
+        elif kind < 0.5:
+            parts.append("<div><img src='/b.jpg'></div>")
+        elif kind < 0.6:
+            parts.append("<blockquote>q</blockquote>")
+        elif kind < 0.65:
+            parts.append(rng.choice(["<dl><dt>t</dt><dd>d</dd></dl>", "<table><tr><td>c</td></tr></table>", "<form></form>"]))
+        elif kind < 0.8 and depth < 2:
+            element = rng.choice(SECTION_ELEMENTS + ["2016 Hero Image"])
+            parts.append(f'<section data-element="{element}">{synthetic_section(rng, depth + 1)}</section>')
+        else:
+            parts.append("<div><p>plain <em>text</em></p><ul><li>x</li></ul></div>")
+    return "".join(parts)
+
+
+def best_of(fn):
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    detect = load_script("GetTextBlockHtml", "detectComponent")
+    text_block_cf = load_script("GetTextBlockHtml")
+    rng = random.Random(11)
+
+    soups = [parse_html(html) for url, html in load_pages().values()]
+    soups += [parse_html(f'<html><body><section data-element="{rng.choice(SECTION_ELEMENTS)}">{synthetic_section(rng)}</section>'
+                         f'<section data-element="{rng.choice(SECTION_ELEMENTS)}">{synthetic_section(rng)}</section></body></html>')
+              for _ in range(SYNTHETIC // 2)]
+    sections = [section for soup in soups for section in soup.find_all("section", {"data-element": SECTION_ELEMENTS})]
+
+    mismatches = 0
+    fired = {}
+    for section in sections:
+        checks = selector_checks(section)
+        rule = detect.INVALID_HTML_RULES.first_violation(section)
+        if (rule is not None) != any(checks.values()) or (rule is not None and not checks[rule]):
+            mismatches += 1
+            print(f"MISMATCH detectComponent: rule {rule!r}, selector checks {checks}")
+        checks["Jump To buttons"] = jump_to_check(section)
+        rule = text_block_cf.INVALID_HTML_RULES.first_violation(section)
+        if (rule is not None) != any(checks.values()) or (rule is not None and not checks[rule]):
+            mismatches += 1
+            print(f"MISMATCH detectAndCreateCF: rule {rule!r}, selector checks {checks}")
+        fired[rule] = fired.get(rule, 0) + 1
+    for soup in soups:
+        if detect.page_has_invalid_html(None, soup=soup) != selector_page_check(soup):
+            mismatches += 1
+            print("MISMATCH page_has_invalid_html")
+
+    print(f"{len(sections)} sections, {len(soups)} pages; first rule to fire: "
+          + ", ".join(f"{rule or 'none'} {n}" for rule, n in sorted(fired.items(), key=lambda item: -item[1])))
+    old_s = best_of(lambda: [selector_invalid_html(s, jump_to=True) for s in sections])
+    new_s = best_of(lambda: [text_block_cf.invalidHtml(s) for s in sections])
+    print(f"invalidHtml per section     selectors {old_s / len(sections) * 1e6:7.1f} us  rules {new_s / len(sections) * 1e6:7.1f} us  x{old_s / new_s:.1f}")
+    old_s = best_of(lambda: [selector_page_check(soup) for soup in soups])
+    new_s = best_of(lambda: [detect.page_has_invalid_html(None, soup=soup) for soup in soups])
+    print(f"page_has_invalid_html       selectors {old_s / len(soups) * 1e6:7.1f} us  rules {new_s / len(soups) * 1e6:7.1f} us  x{old_s / new_s:.1f}")
+
+    if mismatches:
+        sys.exit(f"{mismatches} verdicts differ")
+    print("The rules give the selector checks' verdicts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import random
+import sys
+
+from corpus import load_pages, load_script
+from markup_rules import SECTION_ELEMENTS, best_of, synthetic_section
+
+from common.html_parser import parse_html
+from common.markup_stream import CHUNK_SIZE, SectionStream, first_violation
+
+# GetTextBlockHtml/detectComponent.py's invalid-HTML verdict from the parser's
+# tag events (common/markup_stream.py) against the tree check it replaced, under
+# lxml and html.parser, on the saved pages, on pages where a stray end tag closes
+# a section from outside it, and on random pages with broken markup: unclosed
+# and stray tags, self-closing sections, void elements with end tags, markup
+# inside comments and scripts. Each page is also streamed in random
+# small pieces, which must not change the verdict. Then times both and reports
+# how much of the pages the stream read.
+#
+#   python benchmarks/markup_stream.py [synthetic pages]
+
+SYNTHETIC = int(sys.argv[1]) if len(sys.argv) > 1 else 1500
+PARSERS = ["lxml", "html.parser"]
+SECTIONS = ("section", {"data-element": SECTION_ELEMENTS})
+# Stray end tags for elements the section is inside: on the full page they end
+# the section too, so what follows is outside it
+STRAY_ENDS = [
+    "<div><section data-element=\"2016 Text Block\"><p>hi</p></div><img><img></section></div>",
+    "<main><section data-element='2016 Text Block'><figure><img></figure></main><table></table></section>",
+    "<div><div><section data-element='2016 Collapsible Content'><p>a</div><dl></dl></section></div></div>",
+    "<div><section data-element='2016 Text Block'><span><p>x</div><img></span></section>",
+    "<section data-element='2016 Text Block'><div><p>a</section><img><img></div>",
+]
+NOISE = [
+    "<p>unclosed", "</div>", "</section>", "</p>", "<div>", "<br>", "</br>", "<img src='/c.jpg'/>", "</img>",
+    "<hr/>", "<!-- <table> -->", "<script>var s = '<table><img>';</script>", "<style>img { x: '</p>' }</style>",
+    "<IMG SRC='/d.jpg'>", "<li>item", "<figure>", "</figure>", "<span/>", "&amp; <b>bold",
+    "<section data-element='2016 Text Block'/>", "<section data-element='2016 Hero Image'>", "</main>", "</body>",
+]
+
+
+def tree_rule(detect, html, parser):
+    # the check as it was: the whole page parsed, then its sections walked
+    return detect.invalid_html_rule(None, soup=parse_html(html, parser=parser))
+
+
+def messy_page(rng):
+    parts = ["<!DOCTYPE html><html><head><title>t</title></head><body><main><div class='main'>"]
+    for _ in range(rng.randint(1, 4)):
+        element = rng.choice(SECTION_ELEMENTS + ["2016 Hero Image"])
+        body = synthetic_section(rng)
+        # broken markup spliced in at tag boundaries
+        pieces = body.split("<")
+        for _ in range(rng.randint(0, 3)):
+            at = rng.randrange(len(pieces))
+            pieces[at] += rng.choice(NOISE)
+        body = "<".join(pieces)
+        closing = "</section>" if rng.random() < 0.85 else ""
+        parts.append(f'<div><section data-element="{element}">{body}{closing}</div>')
+    # the site footer and scripts after the content, as on the saved pages
+    links = "".join(f"<li><a href='/footer/{i}.cfm'>Footer link {i}</a></li>" for i in range(rng.randint(0, 400)))
+    parts.append(f"</div></main><footer><ul>{links}</ul></footer><script>var page = {{}};</script></body></html>")
+    return "".join(parts)
+
+
+def streamed_in_pieces(rng, html, parser, detect):
+    stream = SectionStream(detect.INVALID_HTML_RULES, *SECTIONS, parser=parser)
+    offset = 0
+    while offset < len(html):
+        size = rng.randint(1, 64)
+        if stream.feed(html[offset:offset + size]):
+            break
+        offset += size
+    return stream.close()
+
+
+def main():
+    detect = load_script("GetTextBlockHtml", "detectComponent")
+    rng = random.Random(24)
+    saved = [html for url, html in load_pages().values()]
+    pages = saved + STRAY_ENDS + [messy_page(rng) for _ in range(SYNTHETIC)]
+
+    mismatches = 0
+    for parser in PARSERS:
+        fired = 0
+        for html in pages:
+            expected = tree_rule(detect, html, parser)
+            streamed = first_violation(html, detect.INVALID_HTML_RULES, *SECTIONS, parser=parser)
+            pieces = streamed_in_pieces(rng, html, parser, detect)
+            if streamed != expected or pieces != expected:
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f"MISMATCH {parser}: tree {expected!r}, stream {streamed!r}, in pieces {pieces!r}\n{html}\n")
+            fired += expected is not None
+        print(f"{parser:<12} {len(pages)} pages, {fired} invalid: stream verdicts checked against the tree")
+
+    for parser in PARSERS:
+        for label, group in (("saved pages", saved), ("all pages", pages)):
+            read = total = 0
+            for html in group:
+                stream = SectionStream(detect.INVALID_HTML_RULES, *SECTIONS, parser=parser)
+                for offset in range(0, len(html), CHUNK_SIZE):
+                    if stream.feed(html[offset:offset + CHUNK_SIZE]):
+                        break
+                stream.close()
+                read += stream.fed
+                total += len(html)
+            old_s = best_of(lambda: [tree_rule(detect, html, parser) for html in group])
+            new_s = best_of(lambda: [first_violation(html, detect.INVALID_HTML_RULES, *SECTIONS, parser=parser) for html in group])
+            print(f"{parser:<12} {label:<12} tree {old_s / len(group) * 1e6:8.1f} us  stream {new_s / len(group) * 1e6:8.1f} us  "
+                  f"x{old_s / new_s:.1f}  read {read / total:6.1%} of the characters")
+
+    if mismatches:
+        sys.exit(f"{mismatches} verdicts differ")
+    print("The stream gives the tree check's verdicts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import argparse
+import gc
+import hashlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from corpus import ROOT, extractors, load_css, load_pages, load_script
+
+from common.cf_sink import SINKS, open_sink
+from common.html_parser import parse_html
+
+# Times every stage of the scripts separately on the saved page corpus
+# (benchmarks/pages: faculty and staff profile, magazine article, text-block
+# page, shallow and deep side nav) and compares against a stored baseline:
+#
+#   parse/<page>                      parse_html of the whole page
+#   extract/<extractor>/<page>        each script's extractor, as the script calls it (its own parse included)
+#   invalidHtml/<page>                GetTextBlockHtml invalidHtml on the page's text block sections
+#   get_relevant_classes/<page>       the CSS gathered for each text block section
+#   extract_sidenav_json/<page>       SideNav's nav -> JSON on the already parsed nav
+#   profile_fields/<page>             ProfileCF PROFILE_FIELDS.collect on the already parsed profile block
+#   serialize/<format>/<extractor>    writing SERIALIZE_ROWS of the extractor's CF rows to a cf_sink
+#
+# A stage is a regression when its best time is more than THRESHOLD slower than
+# the baseline (and by more than NOISE_MS). Each stage's output is hashed too, so
+# a change that alters what an extractor returns shows up as well. Exits 1 on
+# either. Timings depend on the machine: --save a baseline on the machine you
+# compare on, before making the change.
+#
+#   python benchmarks/microbench.py [--save] [--repeats N] [--threshold 0.25] [--only invalidHtml]
+
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "microbench_baseline.json")
+REPEATS = 15            # samples per stage; the fastest is reported
+SAMPLE_SECONDS = 0.005  # each sample loops the stage for at least this long
+THRESHOLD = 0.25        # slower than the baseline by more than this fraction is a regression
+NOISE_MS = 0.01         # ... and by more than this, so timer jitter on tiny stages never counts
+SERIALIZE_ROWS = 200    # CF rows written per serialize stage
+TEXT_BLOCK = "2016 Text Block"
+
+
+def digest(output):
+    return hashlib.sha1(repr(output).encode("utf-8")).hexdigest()[:12]
+
+
+def cf_rows(name, output):
+    # The CF rows in an extractor's output, as the scripts would write them
+    if name in ("profile", "magazine"):
+        return [output[0]] if output[0] else []
+    if name == "text_blocks":
+        return [cf for _, cf in output if cf]
+    if name == "side_nav":
+        return [output] if output else []
+    return []
+
+
+def build_stages(pages, out_dir):
+    """{stage name: fn()} for every stage that applies to the corpus."""
+    extractor_fns = extractors()
+    text_block_cf = load_script("GetTextBlockHtml")
+    side_nav = load_script("SideNav", "navtocsv")
+    profile_cf = load_script("ProfileCF")
+    css_index = load_css()
+
+    stages = {}
+    rows = {}
+    for page, (url, html) in pages.items():
+        stages[f"parse/{page}"] = lambda html=html: parse_html(html)
+        for name, fn in extractor_fns.items():
+            stages[f"extract/{name}/{page}"] = lambda fn=fn, html=html, url=url: fn(html, url)
+            rows.setdefault(name, []).extend(cf_rows(name, fn(html, url)))
+
+        soup = parse_html(html)
+        sections = [s for s in soup.find_all("section") if s.get("data-element", "").strip().lower() == TEXT_BLOCK.lower()]
+        if sections:
+            stages[f"invalidHtml/{page}"] = lambda sections=sections: [text_block_cf.invalidHtml(s) for s in sections]
+            class_lists = []
+            for section in sections:
+                class_list = []
+                for child in section.descendants:
+                    for cls in (child.get("class") or []) if hasattr(child, "get") else []:
+                        if cls not in class_list:
+                            class_list.append(cls)
+                class_lists.append(class_list)
+            stages[f"get_relevant_classes/{page}"] = lambda class_lists=class_lists: [
+                text_block_cf.get_relevant_classes(css_index, class_list) for class_list in class_lists
+            ]
+        nav = soup.find("nav", {"id": "left-navigation"})
+        if nav:
+            stages[f"extract_sidenav_json/{page}"] = lambda nav=nav: side_nav.extract_sidenav_json(nav)
+        profile = parse_html(html, only=profile_cf.PARSE_ONLY).select(profile_cf.ELEMENT_SELECTOR)
+        if profile:
+            stages[f"profile_fields/{page}"] = lambda element=profile[0]: profile_cf.PROFILE_FIELDS.collect(element)
+
+    for ext in SINKS:
+        for name, extractor_rows in rows.items():
+            if not extractor_rows:
+                continue
+            batch = [extractor_rows[i % len(extractor_rows)] for i in range(SERIALIZE_ROWS)]
+            path = os.path.join(out_dir, f"{name}{ext}")
+
+            def serialize(batch=batch, path=path):
+                with open_sink(path) as sink:
+                    for row in batch:
+                        sink.write(row)
+                return sink.rows_written
+
+            stages[f"serialize/{ext[1:]}/{name}"] = serialize
+    return stages
+
+
+def loops_for(fn):
+    """How many calls of fn() make one sample of at least SAMPLE_SECONDS."""
+    start = time.perf_counter()
+    fn()
+    once = time.perf_counter() - start
+    return max(1, int(SAMPLE_SECONDS / once)) if once > 0 else 1000
+
+
+def sample(fn, loops):
+    """Seconds per call of fn(), over one sample, with the garbage collector off (as timeit does)."""
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        return (time.perf_counter() - start) / loops
+    finally:
+        gc.enable()
+
+
+def time_stages(stages, repeats):
+    """{stage name: fastest milliseconds per call}. Stages are sampled round-robin,
+    so a burst of load on the machine hits every stage rather than a few in a row."""
+    loops = {name: loops_for(fn) for name, fn in stages.items()}
+    best = {name: float("inf") for name in stages}
+    for _ in range(repeats):
+        for name, fn in stages.items():
+            best[name] = min(best[name], sample(fn, loops[name]))
+    return {name: seconds * 1000 for name, seconds in best.items()}
+
+
+def slower(ms, base_ms, threshold):
+    return ms > base_ms * (1 + threshold) and ms - base_ms > NOISE_MS
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage microbenchmarks over the saved page corpus")
+    parser.add_argument("--save", action="store_true", help=f"store this run as the baseline ({os.path.relpath(BASELINE_FILE, ROOT)})")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file to compare against / save to")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="fraction slower than the baseline that counts as a regression")
+    parser.add_argument("--only", help="run only the stages whose name contains this")
+    args = parser.parse_args()
+
+    pages = load_pages()
+    with tempfile.TemporaryDirectory() as out_dir:
+        stages = build_stages(pages, out_dir)
+        if args.only:
+            stages = {name: fn for name, fn in stages.items() if args.only in name}
+        baseline = load_baseline(args.baseline)
+        known = baseline["stages"] if baseline else {}
+
+        outputs = {name: digest(fn()) for name, fn in stages.items()}
+        timings = time_stages(stages, args.repeats)
+        # Time anything that looks slower once more, so one noisy stretch isn't reported as a regression
+        suspects = {name: fn for name, fn in stages.items() if name in known and slower(timings[name], known[name]["ms"], args.threshold)}
+        if suspects:
+            for name, ms in time_stages(suspects, args.repeats).items():
+                timings[name] = min(timings[name], ms)
+
+    results = {}
+    regressions = []
+    changed = []
+    print(f"{len(stages)} stages, {len(pages)} pages, best of {args.repeats}"
+          + (f", against the baseline of {baseline['saved']}" if baseline else ", no baseline yet"))
+    print(f"{'stage':<52}{'ms':>10}{'baseline':>10}{'change':>9}")
+    for name, ms in timings.items():
+        results[name] = {"ms": round(ms, 4), "output": outputs[name]}
+
+        line = f"{name:<52}{ms:10.3f}"
+        base = known.get(name)
+        if base is None:
+            print(f"{line}{'':>10}{'new':>9}")
+            continue
+        change = ms / base["ms"] - 1 if base["ms"] else 0
+        line += f"{base['ms']:10.3f}{change:+9.0%}"
+        if slower(ms, base["ms"], args.threshold):
+            regressions.append(name)
+            line += "  X slower"
+        elif slower(base["ms"], ms, args.threshold):
+            line += "  O faster"
+        if base["output"] != results[name]["output"]:
+            changed.append(name)
+            line += "  ! output changed"
+        print(line)
+
+    if args.save:
+        saved = dict(known) if args.only else {}
+        saved.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "saved": time.strftime("%Y-%m-%d %H:%M"),
+                "python": platform.python_version(),
+                "machine": f"{platform.machine()}, {os.cpu_count()} cores",
+                "stages": dict(sorted(saved.items())),
+            }, f, indent=1)
+            f.write("\n")
+        print(f"\nSaved the baseline for {len(results)} stages to {args.baseline}")
+
+    missing = [name for name in known if name not in results and not args.only]
+    if missing:
+        print(f"\n? {len(missing)} baseline stages no longer run: {', '.join(missing)}")
+    if changed:
+        print(f"\n! {len(changed)} stages return different output than the baseline: {', '.join(changed)}")
+    if regressions:
+        print(f"\nX {len(regressions)} stages more than {args.threshold:.0%} slower than the baseline: {', '.join(regressions)}")
+    if (regressions or changed) and not args.save:
+        sys.exit(1)
+    if baseline and not args.save:
+        print(f"\nNo regressions against the baseline of {baseline['saved']}")
+
+
+if __name__ == "__main__":
+    main()
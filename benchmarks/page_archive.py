@@ -0,0 +1,113 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Measure the network path, not the shared HTTP cache, and keep the archive out of the repo
+os.environ["AEM_HTTP_CACHE"] = "0"
+os.environ["AEM_HTTP_CONCURRENCY_LOG"] = ""
+os.environ["AEM_HTTP_ARCHIVE"] = tempfile.mkdtemp(prefix="page_archive_")
+
+from corpus import PAGES_DIR, load_script
+
+# Runs ProfileCF's run_profiles against a local stub server (saved profile pages,
+# an artificial delay, some 404s) while capturing to the page archive, then
+# again replaying from the archive with the server gone. The replay must give
+# the same rows and messages, in CPU time only.
+#
+#   python benchmarks/page_archive.py [profiles] [latency_ms]
+
+PROFILES = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+LATENCY = (int(sys.argv[2]) if len(sys.argv) > 2 else 100) / 1000
+WORKERS = 8
+
+PAGES = {}
+for name in ("faculty_profile", "staff_profile"):
+    with open(os.path.join(PAGES_DIR, f"{name}.html"), "rb") as f:
+        PAGES[name] = f.read()
+bytes_served = 0
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        global bytes_served
+        time.sleep(LATENCY)
+        number = int(self.path.rsplit("/", 1)[-1].split(".")[0][4:])
+        if number % 50 == 7:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        # every page a little different, as real profiles are
+        page = PAGES["staff_profile" if number % 3 else "faculty_profile"].replace(b"</body>", f"<!-- {number} --></body>".encode())
+        bytes_served += len(page)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(page)))
+        self.end_headers()
+        self.wfile.write(page)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def archive_bytes(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    profile_cf = load_script("ProfileCF")
+    from common import page_archive
+
+    ids = [f"user{i:05d}" for i in range(PROFILES)]
+    eaglenetIdMap = {
+        id: {
+            "Default Profile Page": f"{base_url}/profiles/faculty/{id}.cfm",
+            "All Profile Pages": "",
+            "Force Profile": "",
+            "Resume": "",
+            "CV": "",
+            "Profile Image": "",
+            "Authorized Admins": "",
+        }
+        for id in ids
+    }
+    profileUrls = {id: row["Default Profile Page"] for id, row in eaglenetIdMap.items()}
+    headers = {"x-user-agent": "AU-AEM-Importer"}
+
+    print(f"{PROFILES} profiles, {LATENCY * 1000:.0f} ms stub latency, {WORKERS} workers")
+    page_archive.MODE = "capture"
+    start = time.perf_counter()
+    live = list(profile_cf.run_profiles(ids, eaglenetIdMap, profileUrls, headers, workers=WORKERS))
+    live_time = time.perf_counter() - start
+    archive = page_archive.default_archive()
+    print(f"live + capture   {live_time:7.2f}s  {archive.summary()}")
+    server.shutdown()
+    server.server_close()
+
+    # A fresh archive object, as a new run would open it
+    archive.close()
+    page_archive._default_archive = None
+    page_archive.MODE = "replay"
+    for workers in (1, WORKERS):
+        start = time.perf_counter()
+        replay = list(profile_cf.run_profiles(ids, eaglenetIdMap, profileUrls, headers, workers=workers))
+        replay_time = time.perf_counter() - start
+        assert replay == live, "replayed results differ from the live run"
+        print(f"replay, {workers} worker{'s' if workers > 1 else ' '} {replay_time:7.2f}s  x{live_time / replay_time:.1f}  "
+              f"{page_archive.default_archive().summary()}")
+
+    size = archive_bytes(os.environ["AEM_HTTP_ARCHIVE"])
+    print(f"archive {size / 1024:.0f} KB for {bytes_served / 1024:.0f} KB of pages served ({size / bytes_served:.0%})")
+    print("Replay gives the same rows and messages as the live run")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import statistics
+import sys
+import time
+
+from corpus import extractors, load_pages
+
+from common import html_parser
+
+# Runs every extractor on every saved page under each HTML parser backend, with
+# and without subtree (parse_only) parsing, checks the CF output matches a full
+# html.parser parse, and times the parse and each extractor.
+#
+#   python benchmarks/parser_backends.py [repeats]
+
+REPEATS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+REFERENCE = "html.parser"
+
+
+def available_parsers():
+    parsers = []
+    for parser in html_parser.PARSERS:
+        try:
+            html_parser.parse_html("<p></p>", parser)
+            parsers.append(parser)
+        except ValueError:
+            print(f"skipping {parser}: not installed")
+    return parsers
+
+
+def run_extractors(pages, extractor_fns, parser, subtrees):
+    html_parser.PARSER = parser
+    html_parser.SUBTREES = subtrees
+    return {
+        (page, name): fn(html, url)
+        for page, (url, html) in pages.items()
+        for name, fn in extractor_fns.items()
+    }
+
+
+def main():
+    pages = load_pages()
+    extractor_fns = extractors()
+    parsers = available_parsers()
+
+    reference = run_extractors(pages, extractor_fns, REFERENCE, subtrees=False)
+    mismatches = 0
+    for parser in parsers:
+        for subtrees in (False, True):
+            mode = f"{parser}{' +subtrees' if subtrees else ''}"
+            for key, output in run_extractors(pages, extractor_fns, parser, subtrees).items():
+                if output != reference[key]:
+                    mismatches += 1
+                    print(f"MISMATCH {mode}: {key[1]} on {key[0]}")
+                    print(f"  {REFERENCE}: {reference[key]!r:.300}")
+                    print(f"  {mode}: {output!r:.300}")
+
+    print(f"\nparse time per page (median of {REPEATS})")
+    print(f"{'page':<20}" + "".join(f"{parser:>14}" for parser in parsers))
+    for page, (url, html) in pages.items():
+        row = f"{page:<20}"
+        for parser in parsers:
+            times = []
+            for _ in range(REPEATS):
+                start = time.perf_counter()
+                html_parser.parse_html(html, parser)
+                times.append(time.perf_counter() - start)
+            row += f"{statistics.median(times) * 1000:11.2f} ms"
+        print(row)
+
+    print(f"\nextractor time over all pages, full tree vs subtrees (median of {REPEATS})")
+    print(f"{'extractor':<20}" + "".join(f"{parser:>24}" for parser in parsers))
+    for name, fn in extractor_fns.items():
+        row = f"{name:<20}"
+        for parser in parsers:
+            html_parser.PARSER = parser
+            medians = []
+            for subtrees in (False, True):
+                html_parser.SUBTREES = subtrees
+                times = []
+                for _ in range(REPEATS):
+                    start = time.perf_counter()
+                    for url, html in pages.values():
+                        fn(html, url)
+                    times.append(time.perf_counter() - start)
+                medians.append(statistics.median(times) * 1000)
+            row += f"{medians[0]:10.2f} /{medians[1]:7.2f} ms"
+        print(row)
+
+    if mismatches:
+        sys.exit(f"\n{mismatches} extractor outputs differ from {REFERENCE}")
+    print(f"\nAll extractors produce identical output under {', '.join(parsers)}, full tree and subtrees")
+
+
+if __name__ == "__main__":
+    main()
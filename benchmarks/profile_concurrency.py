@@ -0,0 +1,87 @@
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from corpus import PAGES_DIR, load_script
+
+# Compares the serial ProfileCF loop against the worker-pool mode, and against
+# worker threads that only fetch while a process pool extracts, using a local
+# stub server that serves a saved profile page with an artificial delay.
+#
+#   python benchmarks/profile_concurrency.py [profiles] [latency_ms]
+
+PAGE_FILE = os.path.join(PAGES_DIR, "faculty_profile.html")
+PROFILES = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+LATENCY = (int(sys.argv[2]) if len(sys.argv) > 2 else 100) / 1000
+WORKER_COUNTS = [1, 4, 8, 16]
+PROCESSES = max(2, os.cpu_count() or 1)
+
+
+with open(PAGE_FILE, "rb") as f:
+    PAGE = f.read()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(LATENCY)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    # Measure the network path, not the shared HTTP cache
+    os.environ["AEM_HTTP_CACHE"] = "0"
+    # The pool should be the only limit here, not the adaptive per-host limit
+    os.environ["AEM_HTTP_CONCURRENCY"] = os.environ["AEM_HTTP_CONCURRENCY_MIN"] = str(max(WORKER_COUNTS))
+    os.environ["AEM_HTTP_CONCURRENCY_LOG"] = ""
+    profile_cf = load_script("ProfileCF")
+
+    ids = [f"user{i:05d}" for i in range(PROFILES)]
+    eaglenetIdMap = {
+        id: {
+            "Default Profile Page": f"{base_url}/profiles/faculty/{id}.cfm",
+            "All Profile Pages": "",
+            "Force Profile": "",
+            "Resume": "",
+            "CV": "",
+            "Profile Image": "",
+            "Authorized Admins": "",
+        }
+        for id in ids
+    }
+    profileUrls = {id: row["Default Profile Page"] for id, row in eaglenetIdMap.items()}
+    headers = {"x-user-agent": "AU-AEM-Importer"}
+
+    print(f"{PROFILES} profiles, {LATENCY * 1000:.0f} ms stub latency")
+    baseline = None
+    results = None
+    for workers, processes in [(workers, 0) for workers in WORKER_COUNTS] + [(max(WORKER_COUNTS), PROCESSES)]:
+        start = time.perf_counter()
+        run = list(profile_cf.run_profiles(ids, eaglenetIdMap, profileUrls, headers, workers=workers, processes=processes))
+        elapsed = time.perf_counter() - start
+        rows = [cf for id, cf, out, retry in run if cf]
+        assert [row["username"] for row in rows] == ids, "rows out of input order"
+        assert results is None or run == results, f"processes={processes}: results differ from the serial run"
+        results = results or run
+        baseline = baseline or elapsed
+        label = f"workers={workers:>2}" + (f" processes={processes}" if processes else "")
+        print(f"{label:<24}{elapsed:7.2f}s  {PROFILES / elapsed:7.1f} profiles/s  x{baseline / elapsed:.1f}")
+    print(f"({os.cpu_count()} cores)")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+import statistics
+import sys
+import time
+
+from corpus import load_pages, load_script
+
+from common.html_parser import parse_html
+
+# Per-profile time of ProfileCF's extract_profile, comparing the old one-selector-
+# per-field extraction against the single walk over PROFILE_FIELDS, on the saved
+# faculty/staff profiles and on copies padded with many See Also / Areas of
+# Specialization entries (where the old find_previous_sibling('dt') scans grow
+# quadratically). Both must build the same CF row.
+#
+#   python benchmarks/profile_extraction.py [repeats]
+
+REPEATS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+PAD_ENTRIES = (50, 500)    # extra entries per padded copy
+
+profile_cf = load_script("ProfileCF")
+BASE_ASSET_PATH = profile_cf.BASE_ASSET_PATH
+BASE_CF_PATH = profile_cf.BASE_CF_PATH
+TEMPLATE_PATH = profile_cf.TEMPLATE_PATH
+ELEMENT_SELECTOR = profile_cf.ELEMENT_SELECTOR
+PARSE_ONLY = profile_cf.PARSE_ONLY
+get_profile_display = profile_cf.get_profile_display
+
+
+def selector_extract_profile(html, id, url_val, eaglenetIdMap):
+    # extract_profile as it was before PROFILE_FIELDS: one select per field
+    inIdMap = id in eaglenetIdMap
+
+    soup = parse_html(html, only=PARSE_ONLY)
+
+    # Select all sections with class matching the ELEMENT
+    profilesElement = soup.select(ELEMENT_SELECTOR)
+
+    # If No elements found, print error, continue to next URL
+    if len(profilesElement) == 0:
+        return None, f"No '{ELEMENT_SELECTOR}' elements found"
+
+    # If more than one element found, print error, continue to next URL
+    if len(profilesElement) != 1:
+        return None, f"Expected 1 '{ELEMENT_SELECTOR}' element, found {len(profilesElement)}"
+
+    profilesElement = profilesElement[0]
+
+    # Get profile display from url path
+    profileDisplay = get_profile_display(url_val)
+
+    # Determine force display value
+    profileContentSection = profilesElement.css.select_one("section.profile-content")
+    if profileContentSection is None:
+        return None, f"No 'section.profile-content' found"
+    forceDisplay = eaglenetIdMap[id]['Force Profile'] if inIdMap else ''
+
+    # Get Bio html
+    bioElement = profilesElement.css.select_one("dd.bio-text")
+    bioHtml = bioElement.decode_contents() if bioElement else ''
+
+    # Get degrees and additional positions html
+    superBioElement = profilesElement.css.select_one("dl.profile-info-bio")
+    degreesHtml = ''
+    additionalPositionsHtml = ''
+    for item in superBioElement.css.select("dt, dd"):
+        if item.text.strip().lower() == 'degrees':
+            # append all neighboring dd until next dt
+            degreesHtmlParts = []
+            next_sibling = item.find_next_sibling()
+            while next_sibling and next_sibling.name == 'dd':
+                degreesHtmlParts.append(next_sibling.decode_contents())
+                next_sibling = next_sibling.find_next_sibling()
+            degreesHtml = '<br>'.join(degreesHtmlParts)
+        elif item.text.strip().lower() == 'additional positions at au':
+            # append all neighboring dd until next dt
+            additionalPositionsHtmlParts = []
+            next_sibling = item.find_next_sibling()
+            while next_sibling and next_sibling.name == 'dd':
+                additionalPositionsHtmlParts.append(next_sibling.decode_contents())
+                next_sibling = next_sibling.find_next_sibling()
+            additionalPositionsHtml = '<br>'.join(additionalPositionsHtmlParts)
+
+    # Get Partnerships and Affiliations html
+    partnershipsElement = profilesElement.css.select_one("section#profile-partnerships > div > ul")
+    partnershipsHtml = partnershipsElement.decode_contents() if partnershipsElement else ''
+
+    # Get Scholarly html
+    scholarlyElement = profilesElement.css.select_one("section#profile-activities > div")
+    # remove h2 from scholarlyHtml
+    if scholarlyElement:
+        header = scholarlyElement.css.select_one("header")
+        if header:
+            header.decompose()
+    scholarlyHtml = scholarlyElement.decode_contents() if scholarlyElement else ''
+
+    # Get contact info element
+    contactInfoElement = profilesElement.css.select_one("dl.profile-contact-info")
+
+    # Get profile name element
+    profileNameElement = profilesElement.css.select_one('h1.profile-name')
+
+    # Get name from contact info
+    first_name = ''
+    if profileNameElement:
+        nameElement = profileNameElement.css.select_one('span[itemprop=name]')
+        first_name = nameElement.text if nameElement else ''
+
+    is_staff = True
+    # Get For the Media block
+    forTheMediaElements = profilesElement.css.select("div.profile-see-also dt")
+    for element in forTheMediaElements:
+        if element.text.strip().lower() == 'for the media':
+            is_staff = False
+            break
+    # TODO: Temporary for profiles not in Worday
+    forceDisplay = 'Staff' if is_staff else 'Faculty'
+    
+    # Get faculty title from contact info
+    faculty_title = ''
+    staff_title = ''
+    if profileNameElement:
+        facultyTitleElement = profileNameElement.css.select_one('small[itemprop=jobTitle]')
+        faculty_title = facultyTitleElement.text if facultyTitleElement and not is_staff else ''
+        staff_title = facultyTitleElement.text if facultyTitleElement and is_staff else ''
+
+    # Get faculty dept name from contact info
+    faculty_dept_name = ''
+    staff_dept_name = ''
+    if profileNameElement:
+        facultyDeptNameElement = profileNameElement.css.select_one('small[itemprop="worksFor affiliation memberOf"]')
+        faculty_dept_name = facultyDeptNameElement.text if facultyDeptNameElement and not is_staff else ''
+        staff_dept_name = facultyDeptNameElement.text if facultyDeptNameElement and is_staff else ''
+        facultyDeptNameElement = profileNameElement.css.select_one('small[itemprop="affiliation memberOf"]')
+        faculty_dept_name = facultyDeptNameElement.text if facultyDeptNameElement and not is_staff else ''
+        staff_dept_name = facultyDeptNameElement.text if facultyDeptNameElement and is_staff else ''
+
+    # Get fso line 1
+    fso1 = ''
+    if contactInfoElement:
+        fsoLine1Element = contactInfoElement.css.select_one('dd.office1')
+        fso1 = fsoLine1Element.text if fsoLine1Element else ''
+
+    # Get fso line 2
+    fso2 = ''
+    if contactInfoElement:
+        fso2Element = contactInfoElement.css.select_one('dd.office2')
+        fso2 = fso2Element.text if fso2Element else ''
+
+    # Get fso line 3
+    fso3 = ''
+    if contactInfoElement:
+        fso3Element = contactInfoElement.css.select_one('dd.office3')
+        fso3 = fso3Element.text if fso3Element else ''
+
+    # Get office hours html from last dd in contact info
+    officeHoursHtml = ''
+    if contactInfoElement:
+        dd_elements = contactInfoElement.css.select("dd")
+        if dd_elements:
+            officeHoursHtml = dd_elements[-1].decode_contents()
+
+    # Get phone number from contact info
+    altPhoneNumber = ''
+    altPhoneType = ''
+    if contactInfoElement:
+        altPhoneNumberElement = contactInfoElement.css.select_one("dd.profile-phone > a")
+        if (altPhoneNumberElement and altPhoneNumberElement.get('itemprop', '') == 'faxNumber'):
+            altPhoneNumber = altPhoneNumberElement.text.strip() if altPhoneNumberElement else ''
+            altPhoneNumberElement.decompose()  # remove phone number element to avoid duplication
+            altPhoneTypeElement = contactInfoElement.css.select_one("dd.profile-phone")
+            altPhoneType = altPhoneTypeElement.text.strip() if altPhoneTypeElement else ''
+
+    # Get hide email value from contact info
+    hideEmail = 'false'
+    if contactInfoElement:
+        emailElement = contactInfoElement.css.select_one("dd.profile-email")
+        if emailElement and emailElement.text.strip() != '':
+            hideEmail = 'false'
+        else:
+            hideEmail = 'true'
+
+    # Get hide phone value from contact info
+    hidePhone = 'false'
+    if contactInfoElement:
+        phoneElement = contactInfoElement.css.select_one("dd.profile-phone")
+        if phoneElement and phoneElement.text.strip() != '':
+            hidePhone = 'false'
+        else:
+            hidePhone = 'true'
+    
+    # Get See also links
+    contactLinksHtml = ''
+    seeAlsoLinks = profilesElement.css.select("div.profile-see-also > dl > dd")
+    for link in seeAlsoLinks:
+        # if previous sibling dt text is 'See Also', add this link to contactLinksHtml
+        prev_dt = link.find_previous_sibling('dt')
+        if prev_dt and prev_dt.text.strip().lower() == 'see also':
+            contactLinksHtml += link.decode_contents() + '<br>'
+
+    # Get areas of specialization
+    areasOfSpecializationMigrated = ''
+    areasOfSpecialization = profilesElement.css.select("div.profile-see-also > dl > dd")
+    for entry in areasOfSpecialization:
+        # if previous sibling dt text is 'Areas of Specialization', add this entry to areasOfSpecializationHtml
+        prev_dt = entry.find_previous_sibling('dt')
+        if prev_dt and prev_dt.text.strip().lower() == 'areas of specialization':
+            areasOfSpecializationMigrated += entry.text + '|'
+    # remove trailing | from areasOfSpecializationMigrated
+    if areasOfSpecializationMigrated.endswith('|'):
+        areasOfSpecializationMigrated = areasOfSpecializationMigrated[:-1]
+
+    # Add resume if present
+    resume = BASE_ASSET_PATH + '/migrated-profile-resumes/' + profilesElement.css.select_one('div.profile-image-cv a')['href'].lstrip('/') if profilesElement.css.select_one('div.profile-image-cv a') else ''
+
+    resume = eaglenetIdMap[id]['Resume'] if inIdMap else resume
+    if resume and isinstance(resume, str) and resume.strip() != '':
+        resume = resume.strip()
+        resume = BASE_ASSET_PATH + '/migrated-profile-resumes/' + resume.lstrip('/')
+
+    # Overwrite resume with CV if present
+    cv = eaglenetIdMap[id]['CV'] if inIdMap else ''
+    if cv and isinstance(cv, str) and cv.strip() != '':
+        cv = cv.strip()
+        cv = BASE_ASSET_PATH + '/migrated-profile-resumes/' + cv.lstrip('/')
+        resume = cv  # overwrite resume with CV
+
+    # Add profile image if present and not default
+    profileImage = BASE_ASSET_PATH + '/migrated-profile-images/' + profilesElement.css.select_one('div.profile-image-cv img')['src'].lstrip('/') if profilesElement.css.select_one('div.profile-image-cv img') else ''
+
+    profileImage = eaglenetIdMap[id]['Profile Image'] if inIdMap else profileImage
+    if profileImage and isinstance(profileImage, str) and profileImage.strip() != '':
+        profileImage = profileImage.strip()
+        if not profileImage.lower().endswith('/uploads/defaults/original/au_profile.jpg'):
+            profileImage = BASE_ASSET_PATH + '/migrated-profile-images/' + profileImage.lstrip('/')
+        else:
+            profileImage = '/content/dam/au/assets/global/images/au_profile.jpg'  # default image
+    
+    if profileImage.lower().endswith('/uploads/defaults/original/au_profile.jpg'):
+        profileImage = '/content/dam/au/assets/global/images/au_profile.jpg'  # default image
+
+    # Add authorized admins if present
+    authorizedAdmins = eaglenetIdMap[id]['Authorized Admins'] if inIdMap else ''
+    authorizedAdminsString = ''
+    if authorizedAdmins and isinstance(authorizedAdmins, str) and authorizedAdmins.strip() != '':
+        for admin in authorizedAdmins.split(','):
+            authorizedAdminsString += '{"authorizedAdminCMF":"(' + admin.strip() + '@american.edu)"}|'
+    # remove trailing |, add closing bracket
+    if len(authorizedAdminsString) > 1:
+        authorizedAdminsString = authorizedAdminsString[:-1]
+    else:
+        authorizedAdminsString = ''
+
+    savePath = BASE_CF_PATH + '/' + id
+    if (len(id.strip()) >= 2):
+        # CFs save path is BASE_CF_PATH + first two chars of id + full id
+        savePath = BASE_CF_PATH + '/' + id[:2] + '/' + id
+
+    cf = {
+        "path": savePath,   
+        "name": "profileCF",
+        "title": "profileCF",
+        "template": TEMPLATE_PATH,
+        "forceDisplay": forceDisplay,
+        "bio": bioHtml,
+        "degrees": degreesHtml,
+        "additionalPositions": additionalPositionsHtml,
+        "partnerships": partnershipsHtml,
+        "scholarly": scholarlyHtml,
+        "officeHours": officeHoursHtml,
+        "altPhone": altPhoneNumber,
+        "altPhoneType": altPhoneType,
+        "contactLinks": contactLinksHtml,
+        "resume": resume,
+        "photo": profileImage,
+        "defaultProfilePage": url_val.replace('https://www.american.edu', '').replace('.cfm', ''),
+        "authorizedAdminsMigrated": authorizedAdminsString,
+        "username": id,
+        "hideEmail": hideEmail,
+        "hidePhone": hidePhone,
+        "areasOfSpecializationMigrated": areasOfSpecializationMigrated,
+        "first_name": first_name,
+        "faculty_dept_name": faculty_dept_name,
+        "staff_dept_name": staff_dept_name,
+        "faculty_title": faculty_title,
+        "staff_title": staff_title,
+        "fso_line1": fso1,
+        "fso_line2": fso2,
+        "fso_phone": fso3,
+
+    }
+
+    return cf, None
+
+
+def padded(html, entries):
+    # More See Also links and specializations, as long-serving faculty profiles have
+    see_also = "".join(f'<dd><a href="/x/{i}.cfm">Link {i}</a></dd>\n' for i in range(entries))
+    areas = "".join(f"<dd>Specialization {i}</dd>\n" for i in range(entries))
+    html = html.replace("<dt>Areas of Specialization</dt>\n", f"<dt>Areas of Specialization</dt>\n{areas}", 1)
+    return html.replace("<dt>See Also</dt>\n", f"<dt>See Also</dt>\n{see_also}", 1)
+
+
+def median_time(fn, html, url):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(html, "jdoe", url, {})
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    cases = {}
+    for name, (url, html) in load_pages().items():
+        if name.endswith("_profile"):
+            cases[name] = (url, html)
+            for entries in PAD_ENTRIES:
+                cases[f"{name} +{entries}"] = (url, padded(html, entries))
+
+    print(f"per-profile time, median of {REPEATS} (parse is included in both and shown alone)")
+    print(f"{'profile':<28}{'parse':>10}{'selectors':>12}{'one walk':>12}{'extract only':>16}")
+    for name, (url, html) in cases.items():
+        before = selector_extract_profile(html, "jdoe", url, {})
+        after = profile_cf.extract_profile(html, "jdoe", url, {})
+        assert before == after, f"PROFILE_FIELDS output differs from the selectors on {name}"
+
+        parse_times = []
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            parse_html(html, only=PARSE_ONLY)
+            parse_times.append(time.perf_counter() - start)
+        parse = statistics.median(parse_times) * 1000
+        old = median_time(selector_extract_profile, html, url)
+        new = median_time(profile_cf.extract_profile, html, url)
+        print(f"{name:<28}{parse:8.2f} ms{old:9.2f} ms{new:9.2f} ms"
+              f"{old - parse:7.2f} -> {new - parse:5.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import corpus  # noqa: F401  (puts the repo root on sys.path)
+from common.profile_urls import resolve_listed_urls, resolve_profile_urls
+
+# Startup time of Eaglenet ID -> profile URL resolution, comparing the old
+# iterrows() maps + per-ID chain of ProfileCF against resolve_profile_urls(), on
+# generated sheets the size of the real ROT report and sadea list with the kinds
+# of messy cells they have (blanks, NaN, numbers, tags, padding, duplicates).
+# Every ID must resolve to the same URL, stage URL and path. ProfileUrls' own
+# loop is checked against resolve_listed_urls() the same way.
+#
+#   python benchmarks/profile_urls.py [report_rows]
+
+REPORT_ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 8605
+SADEA_ROWS = REPORT_ROWS * 2717 // 8605
+NEW_PAGES_ROWS = REPORT_ROWS // 10
+
+
+def messy_page(rng, id):
+    return rng.choice([
+        None, np.nan, "", "   ", 42,
+        f"/profiles/faculty/{id}.cfm",
+        f"  /SPA/Faculty/{id}.cfm ",
+        f"https://www.american.edu/cas/faculty/{id}.cfm",
+    ])
+
+
+def messy_pages(rng, id):
+    return rng.choice([
+        None, np.nan, "", " | ", "faculty:|",
+        f"faculty:/spa/faculty/{id}.cfm|staff:/x/{id}.cfm",
+        f"|| Staff:/Staff/{id}.cfm",
+        f"student: |faculty:https://www.american.edu/sis/faculty/{id}.cfm",
+    ])
+
+
+def make_sheets(rng):
+    ids = [f"u{i:05d}" for i in range(REPORT_ROWS)]
+    report = pd.DataFrame({
+        "Eaglenet ID": ids + rng.sample(ids, REPORT_ROWS // 50),
+        "Default Profile Page": [messy_page(rng, id) for id in ids + ids[:REPORT_ROWS // 50]],
+        "All Profile Pages": [messy_pages(rng, id) for id in ids + ids[:REPORT_ROWS // 50]],
+    })
+    sadea_ids = rng.sample(ids, SADEA_ROWS) + [f"s{i:05d}" for i in range(SADEA_ROWS // 10)]
+    sadea = pd.DataFrame({"eaglenet_id": sadea_ids, "full url": [messy_page(rng, id) for id in sadea_ids]})
+    new_ids = rng.sample(ids, NEW_PAGES_ROWS) + [f"n{i:05d}" for i in range(NEW_PAGES_ROWS)]
+    new_pages = pd.DataFrame({"Eaglenet ID": new_ids, "URL": [messy_page(rng, id) for id in new_ids]})
+    lookup_ids = ids + sadea_ids[-SADEA_ROWS // 10:] + new_ids[-NEW_PAGES_ROWS:] + ["missing1", "missing2"]
+    return lookup_ids, report, sadea, new_pages
+
+
+def chain_resolve(id, eaglenetIdMap, sadeaMap, newProfilePagesMap):
+    # ProfileCF's process_profile URL chain as it was before resolve_profile_urls
+    inIdMap = id in eaglenetIdMap
+
+    url_val = ''
+    defaultProfilePage = eaglenetIdMap[id]['Default Profile Page'] if inIdMap else None
+    if defaultProfilePage is None or not isinstance(defaultProfilePage, str) or defaultProfilePage.strip() == '':
+
+        allProfilePages = eaglenetIdMap[id]['All Profile Pages'] if inIdMap else None
+        if allProfilePages is not None and isinstance(allProfilePages, str) and allProfilePages.strip() != '':
+            additional_urls_val = allProfilePages.strip().lower()
+            additional_urls_val = additional_urls_val.replace('faculty:', '')
+            additional_urls_val = additional_urls_val.replace('staff:', '')
+            additional_urls_val = additional_urls_val.replace('student:', '')
+            for additional_url_val in additional_urls_val.split('|'):
+                if additional_url_val != '':
+                    url_val = additional_url_val.strip().lower()
+                    break
+    else:
+        url_val = defaultProfilePage.strip().lower()
+
+    if url_val == '':
+        if id in sadeaMap:
+            sadeaProfilePage = sadeaMap[id]['full url']
+            if sadeaProfilePage is not None and isinstance(sadeaProfilePage, str) and sadeaProfilePage.strip() != '':
+                url_val = sadeaProfilePage.strip()
+
+    if url_val == '':
+        if id in newProfilePagesMap:
+            newProfilePage = newProfilePagesMap[id]['URL']
+            if newProfilePage is not None and isinstance(newProfilePage, str) and newProfilePage.strip() != '':
+                url_val = newProfilePage.strip()
+
+    if url_val == '':
+        return '', '', ''
+
+    # ProfileUrls' stage URL and AEM path for the same page
+    stage_url = 'https://aem-stage.american.edu' + url_val if url_val.startswith('/') else url_val
+    stage_url = stage_url.replace('https://www.american.edu', 'https://aem-stage.american.edu').replace('.cfm', '')
+    path = "/content/au" + url_val.replace('https://www.american.edu', '').replace('.cfm', '')
+    url_val = 'https://www.american.edu' + url_val if url_val.startswith('/') else url_val
+    return url_val, stage_url, path
+
+
+def listed_resolve(id, eaglenetIdMap, sadeaMap):
+    # ProfileUrls' loop as it was before resolve_listed_urls; None when it skipped the ID
+    url = ""
+    stage_url = ""
+    path = ""
+    defaultProfilePage = eaglenetIdMap[id]['Default Profile Page']
+    sadeaProfilePage = sadeaMap[id]['full url'] if id in sadeaMap else None
+    if defaultProfilePage is not None and isinstance(defaultProfilePage, str) and defaultProfilePage.strip() != '':
+        url_val = defaultProfilePage.strip().lower()
+        path = "/content/au" + url_val.replace('https://www.american.edu', '').replace('.cfm', '')
+        stage_url = 'https://aem-stage.american.edu' + url_val if url_val.startswith('/') else url_val
+        stage_url = stage_url.replace('https://www.american.edu', 'https://aem-stage.american.edu').replace('.cfm', '')
+        url_val = 'https://www.american.edu' + url_val if url_val.startswith('/') else url_val
+        url = url_val
+    else:
+        allProfilePages = eaglenetIdMap[id]['All Profile Pages']
+        if allProfilePages is None or not isinstance(allProfilePages, str) or allProfilePages.strip() == '':
+            return None
+
+        urls_val = allProfilePages.strip().lower()
+        urls_val = urls_val.replace('faculty:', '')
+        urls_val = urls_val.replace('staff:', '')
+        urls_val = urls_val.replace('student:', '')
+        for url_val in urls_val.split('|'):
+            url_val = url_val.strip()
+            if url_val == '':
+                continue
+            stage_url = 'https://aem-stage.american.edu' + url_val if url_val.startswith('/') else url_val
+            stage_url = stage_url.replace('https://www.american.edu', 'https://aem-stage.american.edu').replace('.cfm', '')
+            path = "/content/au" + url_val.replace('https://www.american.edu', '').replace('.cfm', '')
+            url = 'https://www.american.edu' + url_val if url_val.startswith('/') else url_val
+
+    if url == "" and sadeaProfilePage is not None and isinstance(sadeaProfilePage, str) and sadeaProfilePage.strip() != '':
+        url_val = sadeaProfilePage.strip()
+        stage_url = 'https://aem-stage.american.edu' + url_val if url_val.startswith('/') else url_val
+        stage_url = stage_url.replace('https://www.american.edu', 'https://aem-stage.american.edu').replace('.cfm', '')
+        path = "/content/au" + url_val.replace('https://www.american.edu', '').replace('.cfm', '')
+        url = url_val
+    return url, stage_url, path
+
+
+def main():
+    ids, report, sadea, new_pages = make_sheets(random.Random(8605))
+
+    start = time.perf_counter()
+    eaglenetIdMap = {}
+    for index, row in report.iterrows():
+        eaglenetIdMap[row['Eaglenet ID']] = row
+    sadeaMap = {}
+    for index, row in sadea.iterrows():
+        sadeaMap[row['eaglenet_id']] = row
+    newProfilePagesMap = {}
+    for index, row in new_pages.iterrows():
+        newProfilePagesMap[row['Eaglenet ID']] = row
+    before = {id: chain_resolve(id, eaglenetIdMap, sadeaMap, newProfilePagesMap) for id in ids}
+    chain_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    resolved = resolve_profile_urls(ids, report, sadea, new_pages)
+    resolve_time = time.perf_counter() - start
+
+    after = {id: (row.url, row.stage_url, row.path) for id, row in resolved.iterrows()}
+    mismatches = [id for id in ids if before[id] != after[id]]
+    for id in mismatches[:10]:
+        print(f"MISMATCH {id}: {before[id]} != {after[id]}")
+    if mismatches:
+        sys.exit(f"{len(mismatches)} of {len(ids)} IDs resolve differently")
+
+    # ProfileUrls: only IDs in the report get this far
+    reportIds = [id for id in ids if id in eaglenetIdMap]
+    before = {id: listed_resolve(id, eaglenetIdMap, sadeaMap) for id in reportIds}
+    listed = resolve_listed_urls(reportIds, report, sadea)
+    after = {id: None if row["url"] is None else (row["url"], row["stage_url"], row["path"])
+             for id, row in listed.to_dict("index").items()}
+    mismatches = [id for id in reportIds if before[id] != after[id]]
+    for id in mismatches[:10]:
+        print(f"MISMATCH ProfileUrls {id}: {before[id]} != {after[id]}")
+    if mismatches:
+        sys.exit(f"{len(mismatches)} of {len(reportIds)} IDs resolve differently in ProfileUrls")
+
+    print(f"{len(report)} report rows, {len(sadea)} sadea rows, {len(new_pages)} new page rows, {len(ids)} IDs")
+    print(resolved["source"].replace("", "(none)").value_counts().to_string())
+    print(f"ProfileUrls: {sum(url is None for url in listed['url'])} skipped, "
+          f"{(listed['source'] == 'sadea').sum()} from sadea, {(listed['url'] == '').sum()} unresolved")
+    print(f"iterrows maps + chain   {chain_time * 1000:9.1f} ms")
+    print(f"resolve_profile_urls    {resolve_time * 1000:9.1f} ms   x{chain_time / resolve_time:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import corpus  # noqa: F401  (puts the repo root on sys.path)
+from common.http_client import HttpClient
+from common.rate_control import AdaptiveLimiter
+
+# Fixed per-host concurrency against the adaptive limiter, using a local stub
+# server that behaves like the legacy CMS under load: CAPACITY workers answer in
+# BASE_LATENCY each, further requests queue for a free worker (so latency climbs
+# with the load), and past WAF_LIMIT in flight the "WAF" answers 429 with
+# Retry-After.
+#
+#   python benchmarks/rate_control.py [requests]
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+THREADS = 24            # the worker pool: only the ceiling
+CAPACITY = 8
+WAF_LIMIT = 12
+BASE_LATENCY = 0.1
+RETRY_AFTER = 1
+PAGE = b"<html><body>" + b"x" * 5000 + b"</body></html>"
+
+in_flight = 0
+rejected = 0
+lock = threading.Lock()
+workers = threading.BoundedSemaphore(CAPACITY)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    wbufsize = -1
+
+    def do_GET(self):
+        global in_flight, rejected
+        with lock:
+            in_flight += 1
+            load = in_flight
+        try:
+            if load > WAF_LIMIT:
+                with lock:
+                    rejected += 1
+                self.send_response(429)
+                self.send_header("Retry-After", str(RETRY_AFTER))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            with workers:
+                time.sleep(BASE_LATENCY)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(PAGE)))
+            self.end_headers()
+            self.wfile.write(PAGE)
+        finally:
+            with lock:
+                in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(base_url, limiter):
+    global rejected
+    rejected = 0
+    client = HttpClient(pool_size=THREADS, retries=5, backoff=0.05, limiter=limiter)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        statuses = list(pool.map(lambda page: client.get(f"{base_url}/page/{page}").status_code, range(REQUESTS)))
+    return time.perf_counter() - start, statuses.count(200), rejected
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    print(f"{REQUESTS} requests, {THREADS} threads; server: {CAPACITY} at {BASE_LATENCY * 1000:.0f} ms, "
+          f"429 + Retry-After {RETRY_AFTER}s past {WAF_LIMIT} in flight")
+    runs = [
+        ("fixed 4", dict(initial=4, min_limit=4, max_limit=4)),
+        ("fixed 16", dict(initial=16, min_limit=16, max_limit=16)),
+        ("adaptive", dict(initial=4, min_limit=1, max_limit=THREADS, window=10)),
+    ]
+    for name, settings in runs:
+        limiter = AdaptiveLimiter(**settings)
+        elapsed, ok, refused = run(base_url, limiter)
+        print(f"{name:<10}{elapsed:7.2f}s  {REQUESTS / elapsed:6.1f} req/s  {ok:4d} ok  {refused:4d} answered 429")
+        print(f"  {limiter.summary()}")
+
+    print("\nadaptive limit over time:")
+    for elapsed, host, limit, event in limiter.history:
+        print(f"  {elapsed:6.2f}s  {limit:3d}  {event}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+import corpus
+from common.reference_data import ReferenceSheet, _cell
+
+# Startup cost of the reference workbooks in ProfileCF/ProfileUrls: reading each
+# whole sheet with pd.read_excel (what every run used to do) against building
+# its SQLite sidecar once and opening it / looking up a batch of IDs on later
+# runs. The rows looked up must equal the sheet's rows.
+#
+#   python benchmarks/reference_data.py [batch_size]
+
+BATCH_SIZE = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+WORKBOOKS = [
+    ("2025_profilerotreport.xlsx", "2025_profilerotreport", "Eaglenet ID"),
+    ("sadeaList.xlsx", "Sheet1", "eaglenet_id"),
+    ("new_profile_pages.xlsx", "Sheet1", "Eaglenet ID"),
+]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    rng = random.Random(0)
+    cache_dir = tempfile.mkdtemp(prefix="reference_cache_")
+    print(f"{'workbook':<30}{'read_excel':>12}{'build':>10}{'open':>10}{f'{BATCH_SIZE} ids':>12}")
+    for file_name, sheet_name, id_column in WORKBOOKS:
+        xlsx_file = os.path.join(corpus.ROOT, "ProfileCF", file_name)
+        if not os.path.exists(xlsx_file):
+            print(f"skipping {file_name}: not found")
+            continue
+
+        sheet, read_time = timed(lambda: pd.read_excel(xlsx_file, sheet_name=sheet_name))
+        _, build_time = timed(lambda: ReferenceSheet(xlsx_file, sheet_name, id_column, cache_dir).close())
+        reference, open_time = timed(lambda: ReferenceSheet(xlsx_file, sheet_name, id_column, cache_dir))
+        assert not reference.built, "sidecar rebuilt although the workbook did not change"
+
+        ids = [id for id in sheet[id_column].dropna().unique() if isinstance(id, str)]
+        batch = rng.sample(ids, min(BATCH_SIZE, len(ids))) + ["not-an-id"]
+        rows, lookup_time = timed(lambda: reference.rows(batch))
+
+        expected = {}
+        for row in sheet.itertuples(index=False, name=None):
+            row = dict(zip(map(str, sheet.columns), map(_cell, row)))
+            if row[id_column] in batch:
+                expected[row[id_column]] = row
+        assert rows == expected, f"sidecar rows differ from {file_name}"
+        reference.close()
+
+        print(f"{file_name:<30}{read_time:9.0f} ms{build_time:7.0f} ms{open_time:7.1f} ms{lookup_time:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from corpus import PAGES_DIR, load_script
+
+# ProfileCF's run_profiles in one process against the same IDs split over
+# worker processes by common/sharding.py, using a local stub server serving the
+# saved profile pages with an artificial delay. The merged results (CF rows and
+# every print/log/failed/success message) must equal the serial run's.
+# Sharding pays off with more cores than one process can use.
+#
+#   python benchmarks/sharding.py [profiles] [latency_ms]
+
+PROFILES = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+LATENCY = (int(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+SHARD_COUNTS = [2, 4]
+
+PAGES = {}
+for name in ("faculty_profile", "staff_profile"):
+    with open(os.path.join(PAGES_DIR, f"{name}.html"), "rb") as f:
+        PAGES[name] = f.read()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(LATENCY)
+        number = int(self.path.rsplit("/", 1)[-1].split(".")[0][4:])
+        if number % 50 == 7:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        page = PAGES["staff_profile" if number % 3 else "faculty_profile"]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(page)))
+        self.end_headers()
+        self.wfile.write(page)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    # Measure the network path, not the shared HTTP cache
+    os.environ["AEM_HTTP_CACHE"] = "0"
+    os.environ["AEM_HTTP_CONCURRENCY_LOG"] = ""
+    profile_cf = load_script("ProfileCF")
+    from common.sharding import run_sharded
+
+    ids = [f"user{i:05d}" for i in range(PROFILES)]
+    eaglenetIdMap = {
+        id: {
+            "Default Profile Page": f"{base_url}/profiles/faculty/{id}.cfm",
+            "All Profile Pages": "",
+            "Force Profile": "",
+            "Resume": "",
+            "CV": "",
+            "Profile Image": "",
+            "Authorized Admins": "",
+        }
+        for id in ids
+    }
+    profileUrls = {id: row["Default Profile Page"] for id, row in eaglenetIdMap.items()}
+    headers = {"x-user-agent": "AU-AEM-Importer"}
+
+    print(f"{PROFILES} profiles, {LATENCY * 1000:.0f} ms stub latency, {os.cpu_count()} cores")
+    start = time.perf_counter()
+    serial = list(profile_cf.run_profiles(ids, eaglenetIdMap, profileUrls, headers))
+    baseline = time.perf_counter() - start
+    print(f"1 process      {baseline:7.2f}s  {PROFILES / baseline:7.1f} profiles/s")
+
+    for shards in SHARD_COUNTS:
+        start = time.perf_counter()
+        merged = list(run_sharded(ids, shards, profile_cf.run_profile_shard, args=(ids, eaglenetIdMap, profileUrls, headers)))
+        elapsed = time.perf_counter() - start
+        assert merged == serial, f"{shards} shards: merged results differ from the serial run"
+        print(f"{shards} shards       {elapsed:7.2f}s  {PROFILES / elapsed:7.1f} profiles/s  x{baseline / elapsed:.1f}")
+
+    server.shutdown()
+    print("Sharded runs merge to the same rows and messages as the serial run")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""Site-wide component census: which pages use each component, how often, and with what.
+
+Identify-component/detectComponent.py answers "which of these components does
+each page have" with a 0/1 cell per page and component in the input workbook,
+so "which pages use X, and how many of it" meant pivoting by hand. A
+CensusWriter takes every page's component instance counts as they come and
+keeps only running totals in memory: pages and instances per component, and
+how many pages have each pair of components. Everything per page goes straight
+to files, so a census of 50k pages holds the same memory as one of 50. The
+census directory has:
+
+    census.json     components, totals, co-occurrence matrix
+    urls.bin        page URLs, back to back (UTF-8)
+    urls.idx        uint64 offset of each page's URL in urls.bin, plus the end
+    urls.hash       open-addressing table of uint32 page number + 1 by URL hash
+    status.bin      uint16 HTTP status per page (0: the fetch failed)
+    counts.bin      uint16 instances per page and component, one row per page
+    postings.bin    uint32 page numbers, each component's pages together in page order
+
+Pages are numbered from 0 in the order they were added. Census(path)
+memory-maps the files, so each lookup is constant time however big the census:
+
+    census = Census("census")
+    census.pages_with("2016 Text Block")        # page numbers, from one run of postings.bin
+    census.instances(page, "2016 Text Block")
+    census.page_number("https://...")           # or None
+    census.together("2016 Hero Image", "2016 Text Block")   # pages using both
+
+    python -m common.census census summary
+    python -m common.census census pages "2016 Text Block" [--urls]
+    python -m common.census census page https://...
+    python -m common.census census together "2016 Hero Image" "2016 Text Block"
+"""
+import argparse
+import json
+import mmap
+import os
+import sys
+import zlib
+from array import array
+
+COUNT_MAX = 0xFFFF      # instances per page and component are stored as uint16
+_SPOOL = "postings.spool"
+_CHUNK = 16 * 1024      # page, component pairs read back from the spool at a time
+
+
+def _hash_slots(pages):
+    # a power of two at least twice the pages, so probe runs stay short
+    slots = 8
+    while slots < pages * 2:
+        slots *= 2
+    return slots
+
+
+def _map(path, writable=False):
+    """A memoryview of a file's bytes (empty for an empty file, which mmap refuses)."""
+    if os.path.getsize(path) == 0:
+        return memoryview(b""), None
+    with open(path, "r+b" if writable else "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+    return memoryview(mapped), mapped
+
+
+class CensusWriter:
+    def __init__(self, path, components):
+        self.path = path
+        self.components = list(components)
+        self.index = {component: i for i, component in enumerate(self.components)}
+        self.pages = 0
+        self.failed = 0
+        size = len(self.components)
+        self.pages_with = [0] * size
+        self.instances = [0] * size
+        self.cooccurrence = [[0] * size for _ in range(size)]
+        os.makedirs(path, exist_ok=True)
+        self._urls = open(self._file("urls.bin"), "wb")
+        self._url_offsets = open(self._file("urls.idx"), "wb")
+        self._status = open(self._file("status.bin"), "wb")
+        self._counts = open(self._file("counts.bin"), "wb")
+        self._spool = open(self._file(_SPOOL), "wb")
+        self._url_bytes = 0
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def add(self, url, counts, status=200):
+        """Add a page: its URL, {component: instances} (components not given count 0) and HTTP status."""
+        page = self.pages
+        self.pages += 1
+        if status != 200:
+            self.failed += 1
+        data = url.encode("utf-8")
+        self._url_offsets.write(array("Q", [self._url_bytes]).tobytes())
+        self._urls.write(data)
+        self._url_bytes += len(data)
+        self._status.write(array("H", [status]).tobytes())
+
+        row = array("H", bytes(2 * len(self.components)))
+        present = []
+        for component, n in counts.items():
+            if n:
+                i = self.index[component]
+                row[i] = min(n, COUNT_MAX)
+                present.append(i)
+        self._counts.write(row.tobytes())
+        present.sort()
+        for i in present:
+            self.pages_with[i] += 1
+            self.instances[i] += counts[self.components[i]]
+            cooccurring = self.cooccurrence[i]
+            for j in present:
+                cooccurring[j] += 1
+        if present:
+            self._spool.write(array("I", [x for i in present for x in (page, i)]).tobytes())
+        return page
+
+    def close(self):
+        """Finish the files: the URL hash table, postings by component and census.json."""
+        if self._urls.closed:
+            return
+        self._url_offsets.write(array("Q", [self._url_bytes]).tobytes())
+        for f in (self._urls, self._url_offsets, self._status, self._counts, self._spool):
+            f.close()
+        self._write_url_hash()
+        starts = self._write_postings()
+        meta = {
+            "byteorder": sys.byteorder,
+            "pages": self.pages,
+            "failed": self.failed,
+            "components": self.components,
+            "pages_with": self.pages_with,
+            "instances": self.instances,
+            "postings_start": starts,
+            "hash_slots": _hash_slots(self.pages),
+            "cooccurrence": self.cooccurrence,
+        }
+        with open(self._file("census.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+            f.write("\n")
+
+    def _write_url_hash(self):
+        slots = _hash_slots(self.pages)
+        with open(self._file("urls.hash"), "wb") as f:
+            f.truncate(slots * 4)
+        table_view, table_map = _map(self._file("urls.hash"), writable=True)
+        offsets_view, offsets_map = _map(self._file("urls.idx"))
+        urls_view, urls_map = _map(self._file("urls.bin"))
+        table, offsets = table_view.cast("I"), offsets_view.cast("Q")
+        try:
+            for page in range(self.pages):
+                url = bytes(urls_view[offsets[page]:offsets[page + 1]])
+                slot = zlib.crc32(url) & (slots - 1)
+                while table[slot]:
+                    # a URL listed twice keeps its first page
+                    other = table[slot] - 1
+                    if bytes(urls_view[offsets[other]:offsets[other + 1]]) == url:
+                        break
+                    slot = (slot + 1) & (slots - 1)
+                else:
+                    table[slot] = page + 1
+        finally:
+            del table, offsets
+            for view, mapped in ((table_view, table_map), (offsets_view, offsets_map), (urls_view, urls_map)):
+                view.release()
+                if mapped is not None:
+                    mapped.close()
+
+    def _write_postings(self):
+        # Each component's pages go in one run, in page order: the spool (in page
+        # order) is read back once and every page number dropped into its slot
+        starts = []
+        total = 0
+        for n in self.pages_with:
+            starts.append(total)
+            total += n
+        spool_path = self._file(_SPOOL)
+        with open(self._file("postings.bin"), "wb") as f:
+            f.truncate(total * 4)
+        view, mapped = _map(self._file("postings.bin"), writable=True)
+        postings = view.cast("I")
+        filled = list(starts)
+        try:
+            with open(spool_path, "rb") as spool:
+                while True:
+                    chunk = spool.read(_CHUNK * 8)
+                    if not chunk:
+                        break
+                    pairs = array("I")
+                    pairs.frombytes(chunk)
+                    for k in range(0, len(pairs), 2):
+                        i = pairs[k + 1]
+                        postings[filled[i]] = pairs[k]
+                        filled[i] += 1
+        finally:
+            del postings
+            view.release()
+            if mapped is not None:
+                mapped.close()
+        os.remove(spool_path)
+        return starts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class Census:
+    """Constant-time lookups in a census directory written by CensusWriter."""
+
+    def __init__(self, path):
+        with open(os.path.join(path, "census.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["byteorder"] != sys.byteorder:
+            raise ValueError(f"Census {path} was written on a {meta['byteorder']}-endian machine")
+        self.path = path
+        self.pages = meta["pages"]
+        self.failed = meta["failed"]
+        self.components = meta["components"]
+        self.index = {component: i for i, component in enumerate(self.components)}
+        self.cooccurrence = meta["cooccurrence"]
+        self._pages_with = meta["pages_with"]
+        self._instances = meta["instances"]
+        self._starts = meta["postings_start"]
+        self._slots = meta["hash_slots"]
+        self._maps = []
+        self._urls = self._open("urls.bin", None)
+        self._offsets = self._open("urls.idx", "Q")
+        self._table = self._open("urls.hash", "I")
+        self._status = self._open("status.bin", "H")
+        self._counts = self._open("counts.bin", "H")
+        self._postings = self._open("postings.bin", "I")
+
+    def _open(self, name, fmt):
+        view, mapped = _map(os.path.join(self.path, name))
+        self._maps.append((view, mapped))
+        return view.cast(fmt) if fmt else view
+
+    def _component(self, component):
+        if component not in self.index:
+            raise KeyError(f"'{component}' is not a component of this census ({', '.join(self.components)})")
+        return self.index[component]
+
+    def url(self, page):
+        return bytes(self._urls[self._offsets[page]:self._offsets[page + 1]]).decode("utf-8")
+
+    def status(self, page):
+        return self._status[page]
+
+    def page_number(self, url):
+        """The page number of a URL, or None."""
+        if not self.pages:
+            return None
+        data = url.encode("utf-8")
+        slot = zlib.crc32(data) & (self._slots - 1)
+        while self._table[slot]:
+            page = self._table[slot] - 1
+            if bytes(self._urls[self._offsets[page]:self._offsets[page + 1]]) == data:
+                return page
+            slot = (slot + 1) & (self._slots - 1)
+        return None
+
+    def instances(self, page, component):
+        """How many sections of a page are the component."""
+        return self._counts[page * len(self.components) + self._component(component)]
+
+    def page_components(self, page):
+        """{component: instances} for the components a page uses."""
+        row = self._counts[page * len(self.components):(page + 1) * len(self.components)]
+        return {component: n for component, n in zip(self.components, row) if n}
+
+    def page_count(self, component):
+        """How many pages use a component."""
+        return self._pages_with[self._component(component)]
+
+    def instance_count(self, component):
+        """Instances of a component over every page."""
+        return self._instances[self._component(component)]
+
+    def pages_with(self, component):
+        """Page numbers of the pages using a component, in page order (read from one run of postings.bin)."""
+        i = self._component(component)
+        return self._postings[self._starts[i]:self._starts[i] + self._pages_with[i]].tolist()
+
+    def together(self, a, b):
+        """How many pages use both components."""
+        return self.cooccurrence[self._component(a)][self._component(b)]
+
+    def close(self):
+        for attribute in ("_urls", "_offsets", "_table", "_status", "_counts", "_postings"):
+            getattr(self, attribute).release()
+        for view, mapped in self._maps:
+            view.release()
+            if mapped is not None:
+                mapped.close()
+        self._maps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# --- python -m common.census ---
+
+def _summary(census):
+    print(f"{census.pages:,} pages ({census.failed:,} not fetched with HTTP 200)")
+    print(f"\n{'component':<40}{'pages':>10}{'instances':>12}{'per page':>10}")
+    by_pages = sorted(census.components, key=lambda component: -census.page_count(component))
+    for component in by_pages:
+        pages = census.page_count(component)
+        per_page = f"{census.instance_count(component) / pages:10.1f}" if pages else f"{'':>10}"
+        print(f"{component:<40}{pages:>10,}{census.instance_count(component):>12,}{per_page}")
+    pairs = [(census.together(a, b), a, b) for i, a in enumerate(census.components) for b in census.components[i + 1:]]
+    pairs = sorted((pair for pair in pairs if pair[0]), reverse=True)[:20]
+    if pairs:
+        print("\nmost frequent pairs")
+        for n, a, b in pairs:
+            print(f"  {n:>9,}  {a} + {b}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m common.census", description="Query a component census.")
+    parser.add_argument("census", help="census directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("summary", help="pages and instances per component, and the most frequent pairs")
+    pages = commands.add_parser("pages", help="the pages using a component")
+    pages.add_argument("component")
+    pages.add_argument("--urls", action="store_true", help="print URLs (with instances) instead of page numbers")
+    commands.add_parser("page", help="the components of a page").add_argument("url")
+    together = commands.add_parser("together", help="pages using both components")
+    together.add_argument("a")
+    together.add_argument("b")
+    args = parser.parse_args(argv)
+
+    with Census(args.census) as census:
+        try:
+            if args.command == "summary":
+                _summary(census)
+            elif args.command == "pages":
+                for page in census.pages_with(args.component):
+                    print(f"{census.url(page)}\t{census.instances(page, args.component)}" if args.urls else page)
+            elif args.command == "page":
+                page = census.page_number(args.url)
+                if page is None:
+                    sys.exit(f"{args.url} is not in the census")
+                print(f"page {page}, HTTP {census.status(page)}")
+                for component, n in census.page_components(page).items():
+                    print(f"  {n:>5}  {component}")
+            else:
+                print(f"{census.together(args.a, args.b):,} pages use both")
+        except KeyError as e:
+            sys.exit(e.args[0])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Streaming writers for CF output rows.
+
+Scripts used to collect every CF row in a list and build a DataFrame for
+`to_excel` at the end. A sink writes each row as soon as it is produced, so
+memory stays flat however many pages a batch has:
+
+    with open_sink("cf_out.xlsx", max_rows=5000) as sink:
+        for ...:
+            sink.write({"path": ..., "name": ..., ...})
+
+The format follows the file extension: .xlsx (openpyxl write-only mode), .csv
+or .jsonl. With max_rows / max_mb set, the sink rotates to cf_out_2.xlsx,
+cf_out_3.xlsx, ... once the current file reaches the limit. Columns come from
+the first row written unless given explicitly; a later row with a key that is
+not a column raises ValueError rather than losing that value (a row may leave
+columns out; they come out empty).
+
+A run that picks up where an earlier one stopped can carry on after the files
+that run saved: first_part=3 starts at cf_out_3.xlsx, and on_save(path) is
+called as each file is saved, so a journal can note which rows are safely out.
+"""
+import csv
+import json
+import math
+import os
+
+from openpyxl import Workbook
+
+from common import run_report
+
+
+def _clean(value):
+    # NaN from pandas lookups should come out as an empty cell, like to_excel
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+class CFSink:
+    def __init__(self, file_name, max_rows=None, max_mb=None, columns=None, first_part=1, on_save=None):
+        self.file_name = file_name
+        self.first_part = first_part
+        self.on_save = on_save
+        self.max_rows = max_rows
+        self.max_bytes = max_mb * 1024 * 1024 if max_mb else None
+        self.columns = list(columns) if columns else None
+        self._known = set(self.columns or ())
+        self.files = []
+        self.rows_written = 0
+        self._part_rows = 0
+        self._part_bytes = 0
+        self._is_open = False
+
+    def _part_name(self, part):
+        if part == 1:
+            return self.file_name
+        base, ext = os.path.splitext(self.file_name)
+        return f"{base}_{part}{ext}"
+
+    def _save(self):
+        with run_report.stage("save"):
+            self._close_part()
+        if self.on_save:
+            self.on_save(self.files[-1])
+
+    def _rotate(self):
+        if self._is_open:
+            self._save()
+        path = self._part_name(len(self.files) + self.first_part)
+        self._open_part(path)
+        self._is_open = True
+        self.files.append(path)
+        self._part_rows = 0
+        self._part_bytes = 0
+        if self.columns:
+            self._part_bytes += self._write_header(self.columns)
+
+    def _full(self):
+        if self.max_rows and self._part_rows >= self.max_rows:
+            return True
+        if self.max_bytes and self._part_bytes >= self.max_bytes:
+            return True
+        return False
+
+    def write(self, row):
+        if self.columns is None:
+            self.columns = list(row.keys())
+            self._known = set(self.columns)
+        elif not row.keys() <= self._known:
+            unknown = ", ".join(str(key) for key in row if key not in self._known)
+            raise ValueError(f"Row for {self.file_name} has keys that are not among its columns: {unknown} "
+                             f"(give every column up front with columns=)")
+        if not self._is_open or self._full():
+            self._rotate()
+        with run_report.stage("write"):
+            self._part_bytes += self._write_row(row)
+        self._part_rows += 1
+        self.rows_written += 1
+        run_report.emit(self.file_name)
+
+    def close(self):
+        if not self._is_open and not self.files and self.first_part == 1:
+            # Nothing was written; still leave an (empty) output file behind
+            self._rotate()
+        if self._is_open:
+            self._is_open = False
+            self._save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --- format hooks; _write_* return the number of bytes (approximately) written ---
+
+    def _open_part(self, path):
+        raise NotImplementedError
+
+    def _write_header(self, columns):
+        return 0
+
+    def _write_row(self, row):
+        raise NotImplementedError
+
+    def _close_part(self):
+        raise NotImplementedError
+
+
+class XlsxSink(CFSink):
+    def _open_part(self, path):
+        self._path = path
+        self._wb = Workbook(write_only=True)
+        self._ws = self._wb.create_sheet("Sheet1")
+
+    def _write_header(self, columns):
+        self._ws.append(columns)
+        return sum(len(str(c)) for c in columns)
+
+    def _write_row(self, row):
+        values = [_clean(row.get(c)) for c in self.columns]
+        self._ws.append(values)
+        # The zip is only built on save, so size the part by its cell text
+        return sum(len(str(v)) for v in values if v is not None)
+
+    def _close_part(self):
+        self._wb.save(self._path)
+        self._wb = None
+        self._ws = None
+
+
+class CsvSink(CFSink):
+    def _open_part(self, path):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+
+    def _write_header(self, columns):
+        start = self._file.tell()
+        self._writer.writerow(columns)
+        return self._file.tell() - start
+
+    def _write_row(self, row):
+        start = self._file.tell()
+        self._writer.writerow(["" if _clean(row.get(c)) is None else row.get(c) for c in self.columns])
+        return self._file.tell() - start
+
+    def _close_part(self):
+        self._file.close()
+
+
+class JsonLinesSink(CFSink):
+    def _open_part(self, path):
+        self._file = open(path, "w", encoding="utf-8")
+
+    def _write_row(self, row):
+        line = json.dumps({c: _clean(row.get(c)) for c in self.columns}, ensure_ascii=False, default=str) + "\n"
+        self._file.write(line)
+        return len(line.encode("utf-8"))
+
+    def _close_part(self):
+        self._file.close()
+
+
+SINKS = {
+    ".xlsx": XlsxSink,
+    ".csv": CsvSink,
+    ".jsonl": JsonLinesSink,
+}
+
+
+def open_sink(file_name, max_rows=None, max_mb=None, columns=None, first_part=1, on_save=None):
+    ext = os.path.splitext(file_name)[1].lower()
+    if ext not in SINKS:
+        raise ValueError(f"Unsupported CF output format '{ext}' for {file_name} (use .xlsx, .csv or .jsonl)")
+    return SINKS[ext](file_name, max_rows=max_rows, max_mb=max_mb, columns=columns, first_part=first_part, on_save=on_save)
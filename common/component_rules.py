@@ -0,0 +1,122 @@
+"""Flag every component on a page in one walk of its sections.
+
+Identify-component's scripts used to loop over the components for every
+section (or over every section for every component), lowercasing each name
+again on the way, so a page cost sections x components comparisons. The rules
+for what makes a section a component now live in a rules file, one rule set
+per script:
+
+    {
+      "detectComponent": [{"data-element": "{component}"}, {"class": "{component}"}],
+      "component_check": [{"data-element": "{component}", "class": "hero-image-full"}],
+      ...
+    }
+
+A rule is a conjunction: the section's data-element equals the value, and it
+has every listed class ("class" is a name or a list of names). A component
+matches a section when any of its rules does. "{component}" stands for each
+component name given at compile time (e.g. from the input's element sheet); a
+rule with its own "component" key always applies, under that name. Comparisons
+ignore case and surrounding spaces, as the scripts always did.
+
+compile_rules() turns a rule set into hashed lookup tables, by data-element
+value and by class, so each section only checks the few rules keyed on its own
+data-element and classes, however many components there are:
+
+    matcher = component_matcher(RULES_FILE, "detectComponent", components)
+    matcher.flags(soup)     # {component: 1 or 0}
+    matcher.counts(soup)    # {component: sections matching it}
+
+component_matcher() compiles each (rules file, rule set, components) once per
+process, so a script can ask for its matcher on every page.
+"""
+import json
+from typing import FrozenSet, NamedTuple, Optional
+
+
+class Rule(NamedTuple):
+    component: str
+    data_element: Optional[str]         # required data-element value (lowercase), if any
+    classes: FrozenSet[str]             # classes the section must all have (lowercase)
+
+
+def load_rules(path):
+    """{rule set name: [rule dicts]} from a rules file."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _clean(value):
+    return value.strip().lower()
+
+
+def _expand(rule_dict, components):
+    """The Rules one rule dict stands for, one per component for a "{component}" template."""
+    names = [rule_dict["component"]] if "component" in rule_dict else components
+    classes = rule_dict.get("class", [])
+    if isinstance(classes, str):
+        classes = [classes]
+    for name in names:
+        data_element = rule_dict.get("data-element")
+        rule = Rule(
+            name,
+            _clean(data_element.replace("{component}", name)) if data_element is not None else None,
+            frozenset(_clean(c.replace("{component}", name)) for c in classes),
+        )
+        if rule.data_element is None and not rule.classes:
+            raise ValueError(f"Component rule {rule_dict} has no data-element or class to match")
+        yield rule
+
+
+class ComponentMatcher:
+    def __init__(self, rules, components):
+        self.components = list(components)
+        self.by_data_element = {}   # data-element value -> [Rule]
+        self.by_class = {}          # class -> [Rule], for rules without a data-element
+        for rule in rules:
+            if rule.data_element is not None:
+                self.by_data_element.setdefault(rule.data_element, []).append(rule)
+            else:
+                # keyed on one of its classes; the others are checked on a hit
+                self.by_class.setdefault(min(rule.classes), []).append(rule)
+
+    def section_components(self, section):
+        """The components a <section> tag (or any tag) matches."""
+        classes = {_clean(c) for c in section.get("class", ())}
+        found = {rule.component for rule in self.by_data_element.get(_clean(section.get("data-element", "")), ())
+                 if rule.classes <= classes}
+        for class_name in classes:
+            for rule in self.by_class.get(class_name, ()):
+                if rule.classes <= classes:
+                    found.add(rule.component)
+        return found
+
+    def counts(self, soup):
+        """{component: number of sections matching it} for every component, in one walk."""
+        counts = dict.fromkeys(self.components, 0)
+        for section in soup.find_all("section"):
+            for component in self.section_components(section):
+                counts[component] += 1
+        return counts
+
+    def flags(self, soup):
+        """{component: 1 if any section matches it, else 0}."""
+        return {component: 1 if n else 0 for component, n in self.counts(soup).items()}
+
+
+def compile_rules(rule_dicts, components):
+    """A ComponentMatcher for a rule set, with "{component}" rules applied to each of `components`."""
+    components = [c for c in components if c]
+    rules = [rule for rule_dict in rule_dicts for rule in _expand(rule_dict, components)]
+    return ComponentMatcher(rules, dict.fromkeys(components + [rule.component for rule in rules]))
+
+
+_matchers = {}     # (rules file, rule set, tuple of components) -> compiled ComponentMatcher
+
+
+def component_matcher(rules_file, rule_set, components):
+    """The `rule_set` rules from `rules_file`, compiled for these components (once per combination)."""
+    key = (rules_file, rule_set, tuple(components))
+    if key not in _matchers:
+        _matchers[key] = compile_rules(load_rules(rules_file)[rule_set], components)
+    return _matchers[key]
@@ -0,0 +1,90 @@
+"""Process pool for the CPU half of a crawl: decoding, parsing and extraction.
+
+BeautifulSoup parsing, prettify() and the CSS gathering for text blocks hold
+the GIL, so adding fetch threads stops helping once one core is busy. With a
+CpuPool the fetch threads only download; each page's raw bytes go to a worker
+process that decodes, parses and extracts it and sends back plain row dicts.
+
+Tasks and results must be plain picklable data (bytes in, dicts out). They
+travel in batches of BATCH_SIZE, so the per-task cost of pickling and the
+round trip between processes is paid once per batch; a few batches per worker
+are kept in flight so the workers never wait on the parent.
+
+    with CpuPool(PROCESSES, initializer=..., initargs=(...)) as pool:
+        for result in pool.map(func, tasks):    # func(task) for every task, in order
+            ...
+
+func and initializer must be module-level functions. Whatever every task needs
+(extractor objects, lookup tables) goes to the workers once through initargs
+rather than with each task. What the workers record in common.run_report comes
+back with each batch and is added to this process's report.
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import requests
+
+from common import run_report
+
+BATCH_SIZE = 16     # tasks per round trip to a worker
+BATCHES_AHEAD = 2   # batches in flight per worker
+
+
+def decode(content, encoding):
+    """The text requests would give as response.text for this body and encoding."""
+    response = requests.Response()
+    response._content = content
+    response.encoding = encoding
+    return response.text
+
+
+def _init_worker(initializer, initargs):
+    # The worker starts with a copy of the parent's report; only its own figures go back
+    run_report.reset()
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _run_batch(func, batch):
+    return [func(task) for task in batch], run_report.drain()
+
+
+class CpuPool:
+    def __init__(self, processes, initializer=None, initargs=(), batch_size=BATCH_SIZE):
+        self.processes = processes
+        self.batch_size = batch_size
+        self._pool = ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(initializer, initargs))
+        # Start the workers now, before the caller starts fetch threads, so no
+        # thread's half-held lock is copied into them
+        self._pool.submit(int).result()
+
+    def map(self, func, tasks):
+        """Yield func(task) for every task, in order, computed in the worker processes."""
+        pending = deque()
+        batch = []
+        for task in tasks:
+            batch.append(task)
+            if len(batch) >= self.batch_size:
+                pending.append(self._pool.submit(_run_batch, func, batch))
+                batch = []
+                # Hand back finished results as soon as enough batches are queued
+                while len(pending) > self.processes * BATCHES_AHEAD or (pending and pending[0].done()):
+                    yield from self._results(pending.popleft())
+        if batch:
+            pending.append(self._pool.submit(_run_batch, func, batch))
+        while pending:
+            yield from self._results(pending.popleft())
+
+    def _results(self, future):
+        results, figures = future.result()
+        run_report.merge(figures)
+        return results
+
+    def close(self):
+        self._pool.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
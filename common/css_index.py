@@ -0,0 +1,137 @@
+"""Class name -> CSS rule index over the legacy stylesheet.
+
+`get_relevant_classes()` used to walk every rule of au-styles.css (and every
+rule inside each @media block) for every qualifying section, testing
+`".{class}" in selectorText` against each class. CssClassIndex does that walk
+once: every style rule's output text is rendered up front and the rule is
+filed under each class token that follows a "." in its selector. Gathering the
+CSS for a section is then a few lookups, and produces exactly the same text
+(same rules, order and duplicates) as the original scan.
+
+Parsing au-styles.css with cssutils takes seconds (and floods the console with
+validation warnings), so load_css_index() keeps the built index as a compressed
+pickle keyed by the hash of the stylesheet(s); later runs load it in
+milliseconds and only reparse when a stylesheet changes.
+"""
+import glob
+import hashlib
+import os
+import pickle
+import re
+import zlib
+from bisect import bisect_left
+
+# A class as written after "." in a selector; "x.col-md-6:hover" -> "col-md-6"
+_SELECTOR_CLASS = re.compile(r"\.([\w-]*)")
+_PLAIN_CLASS = re.compile(r"[\w-]+")
+# Bump when CssClassIndex changes shape so old cache files are ignored
+INDEX_VERSION = 1
+
+
+def _wrap_selectors(selector_text):
+    return '.html-embed-wrapper ' + selector_text.replace(",", ", .html-embed-wrapper")
+
+
+class CssClassIndex:
+    def __init__(self, css_parser):
+        self.selectors = []     # selectorText per style rule, in stylesheet order
+        self.texts = []         # rendered output per style rule
+        self.media_of = []      # index into self.media for rules inside @media, else None
+        self.media = []         # mediaText per @media block
+        self.by_token = {}      # class token -> ids of rules whose selector has ".token"
+
+        for rule in css_parser.cssRules:
+            if rule.type == rule.STYLE_RULE:
+                processed_selectors = _wrap_selectors(rule.selectorText)
+                if rule.parentRule is None:
+                    text = f"{processed_selectors} {{{rule.style.cssText}}}\n"
+                else:
+                    text = f"{rule.parentRule.cssText} {{ {processed_selectors} {{{rule.style.cssText}}} }}\n"
+                self._add(rule.selectorText, text, None)
+            elif rule.type == rule.MEDIA_RULE:
+                media_id = len(self.media)
+                self.media.append(rule.media.mediaText)
+                for sub_rule in rule.cssRules:
+                    if sub_rule.type == sub_rule.STYLE_RULE:
+                        text = f"{_wrap_selectors(sub_rule.selectorText)} {{{sub_rule.style.cssText}}}\n"
+                        self._add(sub_rule.selectorText, text, media_id)
+
+        self.tokens = sorted(self.by_token)
+
+    def _add(self, selector_text, text, media_id):
+        rule_id = len(self.texts)
+        self.selectors.append(selector_text)
+        self.texts.append(text)
+        self.media_of.append(media_id)
+        for token in set(_SELECTOR_CLASS.findall(selector_text)):
+            self.by_token.setdefault(token, []).append(rule_id)
+
+    def rules_for_class(self, class_name):
+        """Ids of the rules whose selector contains ".{class_name}" (substring, like the old scan)."""
+        if not _PLAIN_CLASS.fullmatch(class_name):
+            # Odd class names (escaped characters etc.) fall back to a plain scan
+            needle = f".{class_name}"
+            return {rule_id for rule_id, selector in enumerate(self.selectors) if needle in selector}
+        # ".col" is a substring of ".col-md-6", so every token starting with the class counts
+        rule_ids = set()
+        i = bisect_left(self.tokens, class_name)
+        while i < len(self.tokens) and self.tokens[i].startswith(class_name):
+            rule_ids.update(self.by_token[self.tokens[i]])
+            i += 1
+        return rule_ids
+
+    def relevant_css(self, class_list):
+        # A rule is emitted once per class that matches it, as the old nested loops did
+        counts = {}
+        for class_name in class_list:
+            for rule_id in self.rules_for_class(class_name):
+                counts[rule_id] = counts.get(rule_id, 0) + 1
+
+        relevant_classes = ""
+        open_media = None
+        for rule_id in sorted(counts):
+            media_id = self.media_of[rule_id]
+            if media_id != open_media:
+                if open_media is not None:
+                    relevant_classes += "}\n"
+                if media_id is not None:
+                    relevant_classes += f"@media {self.media[media_id]} {{\n"
+                open_media = media_id
+            relevant_classes += self.texts[rule_id] * counts[rule_id]
+        if open_media is not None:
+            relevant_classes += "}\n"
+        return relevant_classes
+
+
+def _cache_key(css_files):
+    digest = hashlib.sha256(f"css-index-v{INDEX_VERSION}".encode())
+    for css_file in css_files:
+        if os.path.exists(css_file):
+            with open(css_file, "rb") as f:
+                digest.update(f.read())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def load_css_index(css_file, extra_files=(), cache_dir=".css_index_cache"):
+    """Return the CssClassIndex for css_file, from cache_dir when none of css_file/extra_files changed."""
+    key = _cache_key([css_file, *extra_files])
+    cache_file = os.path.join(cache_dir, f"{key[:32]}.pickle.z")
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, "rb") as f:
+                return pickle.loads(zlib.decompress(f.read()))
+        except (OSError, zlib.error, pickle.UnpicklingError, EOFError, AttributeError):
+            pass  # unreadable or stale artifact; rebuild below
+
+    import cssutils
+    css_index = CssClassIndex(cssutils.parseFile(css_file))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    for old_file in glob.glob(os.path.join(cache_dir, "*.pickle.z")):
+        os.remove(old_file)
+    tmp_file = f"{cache_file}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(zlib.compress(pickle.dumps(css_index, pickle.HIGHEST_PROTOCOL)))
+    os.replace(tmp_file, cache_file)
+    return css_index
@@ -0,0 +1,205 @@
+"""One buffered JSON Lines stream of what happened to every item of a run.
+
+ProfileCF used to write each profile's outcome as several lines across three
+text files (_log, _failed_log, _success_pages), each flushed on its own and
+each in its own format ("X ...", "! url -> problem", bare URLs), so finding out
+why pages failed, or which ones to run again, meant grepping. The scripts now
+write one record per outcome to an EventLog instead:
+
+    {"type":"processed","id":"jdoe","url":"https://...","n":12,"of":500,"time":...}
+    {"type":"no-url","id":"asmith","time":...}
+    {"type":"no-element","id":...,"url":...,"selector":"div.CS_Element_Custom > div.profile-full","time":...}
+    {"type":"multiple-elements","id":...,"url":...,"selector":...,"found":2,"time":...}
+    {"type":"http-status","id":...,"url":...,"status":503,"time":...}
+    {"type":"fetch-error","id":...,"url":...,"error":"ConnectionError","time":...}
+
+plus a few run-level records (resumed, output, http). MagazineCF and
+Crawl/crawl.py write the same records, keyed by URL only.
+
+Records are buffered and written out every FLUSH_SECONDS and on close, so a
+crash can lose the last few seconds of them; the run's checkpoint, not the
+event log, decides what a restart redoes.
+
+    python -m common.event_log summary events.jsonl [more.jsonl ...]
+    python -m common.event_log retry events.jsonl [--all] [--field id|url]
+    python -m common.event_log list processed events.jsonl [--field url]
+
+summary counts the records per type and reason (status, error, selector);
+retry prints the items whose latest record is a transient failure (a fetch
+error, 5xx or 429), or any failure with --all, one per line, ready to paste
+back into an input sheet; list prints the items whose latest record has a type.
+
+Settings come from the environment:
+    AEM_EVENT_LOG_FLUSH     seconds between writes of buffered records (default 5)
+"""
+import argparse
+import json
+import os
+import re
+import time
+from collections import Counter, defaultdict
+
+FLUSH_SECONDS = float(os.environ.get("AEM_EVENT_LOG_FLUSH", 5))
+BUFFER_BYTES = 1024 * 1024
+
+# Item outcomes; anything else in a log is a run-level record
+FAILURES = ("no-url", "no-element", "multiple-elements", "http-status", "fetch-error", "problem")
+ITEM_TYPES = ("processed",) + FAILURES
+# The field that tells one failure of a type from another, for summary
+REASON_FIELDS = {"no-element": "selector", "multiple-elements": "selector", "http-status": "status",
+                 "fetch-error": "error", "problem": "problem", "extract-error": "extractor"}
+
+# The problems extract_profile / extract_article return
+_NO_ELEMENT = re.compile(r"No '(.+)' (?:elements )?found$")
+_MULTIPLE_ELEMENTS = re.compile(r"Expected 1 '(.+)' element, found (\d+)$")
+
+
+def retryable(record):
+    """True for an outcome worth running again: a fetch error, or a 5xx/429 response."""
+    if record["type"] == "fetch-error":
+        return True
+    return record["type"] == "http-status" and (record["status"] >= 500 or record["status"] == 429)
+
+
+def problem_event(problem, **fields):
+    """The record for an extractor's problem text ("No '...' elements found", ...) about an item."""
+    match = _NO_ELEMENT.match(problem)
+    if match:
+        return {"type": "no-element", **fields, "selector": match.group(1)}
+    match = _MULTIPLE_ELEMENTS.match(problem)
+    if match:
+        return {"type": "multiple-elements", **fields, "selector": match.group(1), "found": int(match.group(2))}
+    return {"type": "problem", **fields, "problem": problem}
+
+
+def fetch_error(error):
+    """The error field of a fetch-error record for an exception."""
+    return type(error).__name__
+
+
+class EventLog:
+    """Buffered writer of event records; written from one thread (the one keeping input order)."""
+
+    def __init__(self, path, append=False, flush_seconds=FLUSH_SECONDS):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.counts = Counter()
+        torn = append and os.path.exists(path) and not _ends_with_newline(path)
+        self._file = open(path, "a" if append else "w", encoding="utf-8", buffering=BUFFER_BYTES)
+        if torn:
+            # the last record of a crashed run was cut short; start ours on a line of their own
+            self._file.write("\n")
+        self._last_flush = time.monotonic()
+
+    def write(self, type, **fields):
+        self.record(dict(type=type, **fields))
+
+    def record(self, record):
+        record["time"] = round(time.time(), 3)
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str) + "\n")
+        self.counts[record["type"]] += 1
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_seconds:
+            self._file.flush()
+            self._last_flush = now
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        if f.seek(0, os.SEEK_END) == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def read_events(paths):
+    """Yield every record of the given logs, in order, skipping lines a crash cut short."""
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def item_key(record):
+    return record.get("id") or record.get("url")
+
+
+def latest(paths):
+    """{item: its last item record}: a failure retried later and processed counts as processed."""
+    last = {}
+    for record in read_events(paths):
+        if record.get("type") in ITEM_TYPES:
+            last[item_key(record)] = record
+    return last
+
+
+# --- python -m common.event_log ---
+
+def _summary(paths):
+    types = Counter()
+    reasons = defaultdict(Counter)
+    items = {}
+    for record in read_events(paths):
+        type = record.get("type")
+        types[type] += 1
+        field = REASON_FIELDS.get(type)
+        if field:
+            reasons[type][record.get(field)] += 1
+        if type in ITEM_TYPES:
+            items[item_key(record)] = record
+    outcomes = Counter(record["type"] for record in items.values())
+    print(f"{len(items):,} items, by latest outcome")
+    for type, n in outcomes.most_common():
+        print(f"  {n:>9,}  {type}")
+    print(f"\n{sum(types.values()):,} records")
+    for type, n in types.most_common():
+        print(f"  {n:>9,}  {type}")
+        for reason, m in reasons.get(type, Counter()).most_common():
+            print(f"  {'':>9}  {m:>9,}  {reason}")
+    retry = sum(1 for record in items.values() if record["type"] in FAILURES and retryable(record))
+    print(f"\n{retry:,} items worth retrying")
+
+
+def _print_items(records, field):
+    for record in records:
+        print((record.get(field) if field else None) or item_key(record))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m common.event_log", description="Summarise event logs or list their items.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("summary", help="records per type and reason").add_argument("logs", nargs="+")
+    retry = commands.add_parser("retry", help="items whose latest record is a transient failure")
+    retry.add_argument("logs", nargs="+")
+    retry.add_argument("--all", action="store_true", help="every failed item, not only the transient failures")
+    retry.add_argument("--field", choices=("id", "url"), help="print this field (default: the id, or the URL)")
+    listing = commands.add_parser("list", help="items whose latest record has a type")
+    listing.add_argument("type", choices=ITEM_TYPES)
+    listing.add_argument("logs", nargs="+")
+    listing.add_argument("--field", choices=("id", "url"), help="print this field (default: the id, or the URL)")
+    args = parser.parse_args(argv)
+
+    if args.command == "summary":
+        _summary(args.logs)
+    elif args.command == "retry":
+        items = latest(args.logs).values()
+        _print_items((r for r in items if r["type"] in FAILURES and (args.all or retryable(r))), args.field)
+    else:
+        _print_items((r for r in latest(args.logs).values() if r["type"] == args.type), args.field)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Collect every element an extractor reads from a subtree in one walk.
+
+Extractors used to call `select_one`/`select` once per field, each of which
+walks the whole subtree again, and looked up labels with
+`find_previous_sibling('dt')`, which walks back over the siblings for every
+entry. A FieldMap declares the fields instead:
+
+    PROFILE_FIELDS = FieldMap({
+        "contact": Field("dl", has_class("profile-contact-info")),
+        "office1": Field("dd", has_class("office1"), within="contact"),
+        "seeAlso": Field("dd", child_of("dl", child_of("div", has_class("profile-see-also"))),
+                         many=True, label="dt"),
+        ...
+    })
+    found = PROFILE_FIELDS.collect(element)
+
+and collect() fills them all in a single pre-order walk of the element's
+descendants. The matches are the ones the equivalent selectors would return:
+the first match in document order (or every match, in document order, with
+many=True), and with `within` only matches inside the element(s) collected
+for that other field. With `label`, each match comes with its nearest
+preceding sibling of that tag (or None), as find_previous_sibling() would give.
+"""
+from typing import Callable, NamedTuple, Optional, Tuple, Union
+
+from bs4 import Tag
+
+
+class Field(NamedTuple):
+    name: Union[str, Tuple[str, ...]]       # tag name(s) to match
+    test: Optional[Callable] = None         # extra predicate on the tag
+    within: Optional[str] = None            # only inside what this other field collected
+    many: bool = False                      # every match instead of the first
+    label: Optional[str] = None             # collect (tag, preceding sibling of this tag name)
+
+
+def has_class(class_name):
+    return lambda tag: class_name in tag.get("class", ())
+
+
+def attr_is(attr, value):
+    return lambda tag: tag.get(attr) == value
+
+
+def child_of(name, test=None):
+    """The tag's parent is a `name` tag (passing `test`), like the `>` combinator."""
+    def check(tag):
+        parent = tag.parent
+        return parent is not None and parent.name == name and (test is None or test(parent))
+    return check
+
+
+class FieldMap:
+    def __init__(self, fields):
+        self.fields = fields
+        self.by_tag = {}        # tag name -> [(field name, Field)], in declaration order
+        for field_name, field in fields.items():
+            for name in ((field.name,) if isinstance(field.name, str) else field.name):
+                self.by_tag.setdefault(name, []).append((field_name, field))
+        self.scopes = {field.within for field in fields.values() if field.within}
+        self.labels = {field.label for field in fields.values() if field.label}
+        # Tags that need the label siblings seen before them
+        self.labelled = {name for name, rules in self.by_tag.items() if any(field.label for _, field in rules)}
+
+    def collect(self, root):
+        """{field name: tag or None} (a list for many=True fields) for the descendants of root."""
+        found = {field_name: [] if field.many else None for field_name, field in self.fields.items()}
+        stack = self._children(root, frozenset())
+        while stack:
+            tag, scopes, previous = stack.pop()
+            child_scopes = scopes
+            for field_name, field in self.by_tag.get(tag.name, ()):
+                if field.within is not None and field.within not in scopes:
+                    continue
+                if field.test is not None and not field.test(tag):
+                    continue
+                if field.many:
+                    found[field_name].append((tag, previous.get(field.label)) if field.label else tag)
+                elif found[field_name] is None:
+                    found[field_name] = tag
+                else:
+                    continue
+                if field_name in self.scopes:
+                    child_scopes = child_scopes | {field_name}
+            stack.extend(self._children(tag, child_scopes))
+        return found
+
+    def _children(self, tag, scopes):
+        # Child entries, last first so popping them walks in document order
+        entries = []
+        previous = {}
+        for child in tag.children:
+            if not isinstance(child, Tag):
+                continue
+            entries.append((child, scopes, dict(previous) if child.name in self.labelled else None))
+            if child.name in self.labels:
+                previous[child.name] = child
+        entries.reverse()
+        return entries
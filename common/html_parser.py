@@ -0,0 +1,57 @@
+"""One place to choose the BeautifulSoup tree builder for every script.
+
+"html.parser" (what every script used to hard-code) stays the default, so the
+CF output is what it always was. Set AEM_HTML_PARSER to pick another:
+    lxml          fast C parser; the same output on well-formed pages, but it
+                  can build a different tree from malformed markup
+    html5lib      parses like a browser; slowest, most forgiving
+    html.parser   the stdlib builder (default)
+
+Extractors that only read one part of a page declare it with subtrees(), e.g.
+    PARSE_ONLY = subtrees("div", class_="CS_Element_Custom")
+and pass it as parse_html(html, only=PARSE_ONLY); the builder then keeps only
+those elements (and everything inside them) instead of the whole page. Their
+selectors must still find the same elements in the reduced tree. Only lxml
+does this; html.parser and html5lib always build the full tree. bs4's
+html.parser builder ignores an end tag for an element outside the kept
+subtrees, where on the full page that end tag closes everything inside it, so
+a subtree of malformed markup could come out with more in it. (lxml balances
+the tags before bs4 sees them.) AEM_HTML_SUBTREES=0 turns it off everywhere.
+
+benchmarks/parser_backends.py checks that every extractor produces the same
+CF output under each backend, with and without subtree parsing, and times both.
+"""
+import os
+
+from bs4 import BeautifulSoup, FeatureNotFound, SoupStrainer
+
+from common import run_report
+
+PARSERS = ("lxml", "html5lib", "html.parser")
+
+PARSER = os.environ.get("AEM_HTML_PARSER") or "html.parser"
+if PARSER not in PARSERS:
+    raise ValueError(f"AEM_HTML_PARSER must be one of {', '.join(PARSERS)}, not '{PARSER}'")
+SUBTREES = os.environ.get("AEM_HTML_SUBTREES", "1") != "0"
+
+
+def subtrees(name, class_=None, **attrs):
+    """Parse-only filter for elements called `name` (a tag or list of tags) with the given attributes."""
+    if class_ is not None:
+        attrs["class"] = class_
+    return SoupStrainer(name, attrs)
+
+
+def parse_html(markup, parser=None, only=None):
+    """BeautifulSoup(markup) with the configured tree builder (or `parser` if given).
+
+    With `only` (from subtrees()) just the matching elements are built, under lxml.
+    """
+    parser = parser or PARSER
+    if not SUBTREES or parser != "lxml":
+        only = None
+    try:
+        with run_report.stage("parse"):
+            return BeautifulSoup(markup, parser, parse_only=only)
+    except FeatureNotFound:
+        raise ValueError(f"HTML parser '{parser}' is not installed (pip install {parser})")
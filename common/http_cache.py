@@ -0,0 +1,282 @@
+"""Persistent on-disk HTTP cache shared by every migration script.
+
+Use `http_cache.get(url, headers=..., timeout=...)` in place of `requests.get`.
+Bodies are stored zlib-compressed under their sha256 (identical pages are stored
+once, and a page that changes drops its old body unless another URL shares it),
+and a small SQLite index maps each URL to its body, status, headers and
+validators. Within CACHE_TTL a cached page is returned without touching the
+network; after that it is revalidated with If-None-Match / If-Modified-Since, so
+a rerun only downloads pages that actually changed. Least recently used entries
+are evicted once the stored bodies exceed CACHE_MAX_BYTES. Network requests go
+through common.http_client (pooled connections, retries with backoff). With
+AEM_HTTP_ARCHIVE_MODE set, responses are also captured to, or replayed from,
+the page archive (common/page_archive.py).
+
+The run report (common/run_report.py) counts the body bytes handed back by
+where they came from: bytes_fetched from the network, bytes_from_cache and
+bytes_from_archive from disk.
+
+Settings come from the environment:
+    AEM_HTTP_CACHE=0            disable the cache (every get goes to the network)
+    AEM_HTTP_CACHE_DIR          cache location (default: <repo>/.http_cache)
+    AEM_HTTP_CACHE_TTL          seconds a page is served without revalidation
+    AEM_HTTP_CACHE_MAX_MB       size cap for compressed bodies
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from common import http_client, page_archive, run_report
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_ENABLED = os.environ.get("AEM_HTTP_CACHE", "1") != "0"
+CACHE_DIR = os.environ.get("AEM_HTTP_CACHE_DIR", os.path.join(ROOT, ".http_cache"))
+CACHE_TTL = int(os.environ.get("AEM_HTTP_CACHE_TTL", 24 * 60 * 60))
+CACHE_MAX_BYTES = int(os.environ.get("AEM_HTTP_CACHE_MAX_MB", 2048)) * 1024 * 1024
+
+# Headers that describe the wire encoding rather than the stored (decoded) body
+_DROPPED_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection"}
+
+
+class HttpCache:
+    def __init__(self, cache_dir=CACHE_DIR, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                final_url TEXT,
+                status INTEGER,
+                headers TEXT,
+                body_hash TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL,
+                accessed_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS bodies (
+                hash TEXT PRIMARY KEY,
+                size INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed_at);
+            CREATE INDEX IF NOT EXISTS entries_body ON entries(body_hash);
+        """)
+        self._db.commit()
+
+    # --- bodies ---
+
+    def _object_path(self, body_hash):
+        return os.path.join(self.cache_dir, "objects", body_hash[:2], body_hash[2:])
+
+    def _read_body(self, body_hash):
+        try:
+            with open(self._object_path(body_hash), "rb") as f:
+                return zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+
+    def _write_body(self, body):
+        # (hash, compressed size); _store records it in `bodies` along with the entry using it
+        body_hash = hashlib.sha256(body).hexdigest()
+        path = self._object_path(body_hash)
+        try:
+            return body_hash, os.path.getsize(path)
+        except OSError:
+            pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = zlib.compress(body, 6)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return body_hash, len(data)
+
+    def _drop_body(self, body_hash):
+        # with the lock held: remove a body no entry uses any more; returns the bytes freed
+        if self._db.execute("SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1", (body_hash,)).fetchone():
+            return 0
+        size = self._db.execute("SELECT size FROM bodies WHERE hash = ?", (body_hash,)).fetchone()
+        self._db.execute("DELETE FROM bodies WHERE hash = ?", (body_hash,))
+        try:
+            os.remove(self._object_path(body_hash))
+        except OSError:
+            pass
+        return size[0] if size else 0
+
+    # --- index ---
+
+    def _lookup(self, url):
+        with self._lock:
+            return self._db.execute(
+                "SELECT final_url, status, headers, body_hash, etag, last_modified, stored_at FROM entries WHERE url = ?",
+                (url,),
+            ).fetchone()
+
+    def _touch(self, url, refreshed=False):
+        now = time.time()
+        with self._lock:
+            if refreshed:
+                self._db.execute("UPDATE entries SET stored_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+            else:
+                self._db.execute("UPDATE entries SET accessed_at = ? WHERE url = ?", (now, url))
+            self._db.commit()
+
+    def _store(self, url, response):
+        body_hash, size = self._write_body(response.content)
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS}
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT body_hash FROM entries WHERE url = ?", (url,)).fetchone()
+            self._db.execute("INSERT OR REPLACE INTO bodies (hash, size) VALUES (?, ?)", (body_hash, size))
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    response.url,
+                    response.status_code,
+                    json.dumps(headers),
+                    body_hash,
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                    now,
+                    now,
+                ),
+            )
+            # the page changed: its old body goes unless another URL has the same one
+            if old and old[0] != body_hash:
+                self._drop_body(old[0])
+            self._db.commit()
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM bodies").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # Trim to 90% so we don't evict on every single store once full
+            target = self.max_bytes * 0.9
+            # Bodies no entry points at any more (left by an older cache, or another process) go first
+            orphans = self._db.execute(
+                "SELECT hash FROM bodies WHERE hash NOT IN (SELECT body_hash FROM entries WHERE body_hash IS NOT NULL)"
+            ).fetchall()
+            for (body_hash,) in orphans:
+                total -= self._drop_body(body_hash)
+            for url, body_hash in self._db.execute("SELECT url, body_hash FROM entries ORDER BY accessed_at").fetchall():
+                if total <= target:
+                    break
+                self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+                total -= self._drop_body(body_hash)
+            self._db.commit()
+
+    def _build_response(self, url, final_url, status, headers, body):
+        response = requests.Response()
+        response.url = final_url or url
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response._content = body
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.reason = "OK (cached)"
+        return response
+
+    # --- public ---
+
+    def get(self, url, headers=None, timeout=10, **kwargs):
+        entry = self._lookup(url)
+        body = self._read_body(entry[3]) if entry else None
+        if entry and body is not None:
+            final_url, status, cached_headers, body_hash, etag, last_modified, stored_at = entry
+            if time.time() - stored_at < self.ttl:
+                self._touch(url)
+                self.hits += 1
+                run_report.add("bytes_from_cache", len(body))
+                return self._build_response(url, final_url, status, cached_headers, body)
+
+            conditional_headers = dict(headers or {})
+            if etag:
+                conditional_headers["If-None-Match"] = etag
+            if last_modified:
+                conditional_headers["If-Modified-Since"] = last_modified
+            response = http_client.get(url, headers=conditional_headers, timeout=timeout, **kwargs)
+            if response.status_code == 304:
+                self._touch(url, refreshed=True)
+                self.revalidated += 1
+                run_report.add("bytes_from_cache", len(body))
+                return self._build_response(url, final_url, status, cached_headers, body)
+        else:
+            response = http_client.get(url, headers=headers, timeout=timeout, **kwargs)
+
+        self.misses += 1
+        run_report.add("bytes_fetched", len(response.content))
+        # Only successful pages are worth keeping; errors should be retried next run
+        if response.status_code == 200:
+            self._store(url, response)
+        return response
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = HttpCache()
+        return _default_cache
+
+
+def _get(url, headers, timeout, **kwargs):
+    if page_archive.MODE == "replay":
+        response = page_archive.default_archive().get(url)
+        run_report.add("bytes_from_archive", len(response.content))
+        return response
+    if not CACHE_ENABLED:
+        response = http_client.get(url, headers=headers, timeout=timeout, **kwargs)
+        run_report.add("bytes_fetched", len(response.content))
+    else:
+        response = default_cache().get(url, headers=headers, timeout=timeout, **kwargs)
+    if page_archive.MODE == "capture":
+        page_archive.default_archive().capture(url, response)
+    return response
+
+
+def get(url, headers=None, timeout=10, **kwargs):
+    """Drop-in replacement for requests.get backed by the shared disk cache."""
+    with run_report.stage("fetch"):
+        try:
+            response = _get(url, headers, timeout, **kwargs)
+        except requests.exceptions.RequestException as e:
+            run_report.count("fetch_errors", type(e).__name__)
+            raise
+    run_report.count("http_status", response.status_code)
+    return response
+
+
+def summary():
+    """One line on the cache and the network requests behind it, for the end of a run."""
+    archive = page_archive.summary()
+    if page_archive.MODE == "replay":
+        return archive
+    network = f"HTTP {http_client.summary()}"
+    if CACHE_ENABLED and _default_cache is not None:
+        cache = _default_cache
+        network = f"cache {cache.hits} hits, {cache.revalidated} revalidated, {cache.misses} misses; {network}"
+    return f"{network}; {archive}" if archive else network
+
+
+run_report.attach("http", summary)
@@ -0,0 +1,143 @@
+"""Shared pooled HTTP client with retry/backoff for every migration script.
+
+`requests.get` opens a new TCP+TLS connection for every page and gives up on
+the first reset or timeout. HttpClient sends every request through one
+requests.Session whose connection pools keep connections to each host alive,
+and retries GETs that time out, lose their connection or get a 5xx, waiting a
+random time up to BACKOFF * 2**attempt (capped at BACKOFF_MAX) in between. When
+the retries run out the last response is returned, or the last error raised,
+exactly as a single requests.get would. Every attempt holds a slot of the
+client's AdaptiveLimiter (common/rate_control.py), which sets how many requests
+may be in flight to a host from its latency, 429/503s and Retry-After.
+
+http_cache sends its network requests through the default client, so scripts
+get pooling and retries without changes. summary() reports requests, retries
+how many were served over a reused connection and how concurrency moved;
+scripts print it at the end of a run.
+
+Settings come from the environment:
+    AEM_HTTP_POOL_SIZE      connections kept per host (default 16)
+    AEM_HTTP_POOL_HOSTS     hosts with their own connection pool (default 10)
+    AEM_HTTP_RETRIES        retries after the first attempt (default 3; 0 = none)
+    AEM_HTTP_BACKOFF        base backoff in seconds (default 0.5)
+    AEM_HTTP_BACKOFF_MAX    longest single wait in seconds (default 10)
+"""
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common import rate_control, run_report
+
+POOL_SIZE = int(os.environ.get("AEM_HTTP_POOL_SIZE", 16))
+POOL_HOSTS = int(os.environ.get("AEM_HTTP_POOL_HOSTS", 10))
+RETRIES = int(os.environ.get("AEM_HTTP_RETRIES", 3))
+BACKOFF = float(os.environ.get("AEM_HTTP_BACKOFF", 0.5))
+BACKOFF_MAX = float(os.environ.get("AEM_HTTP_BACKOFF_MAX", 10))
+
+# Worth another try: the server or the connection had a bad moment
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_ERRORS = (requests.exceptions.Timeout, requests.exceptions.ConnectionError)
+
+
+class HttpClient:
+    def __init__(self, pool_size=POOL_SIZE, pool_hosts=POOL_HOSTS, retries=RETRIES, backoff=BACKOFF, backoff_max=BACKOFF_MAX, limiter=None):
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.requests = 0       # attempts sent, retries included
+        self.retried = 0        # attempts that were retries
+        self.gave_up = 0        # GETs still failing after every retry
+        self._lock = threading.Lock()
+        self._adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+        self.limiter = limiter or rate_control.AdaptiveLimiter()
+
+    def _count(self, attempt):
+        with self._lock:
+            self.requests += 1
+            if attempt:
+                self.retried += 1
+
+    def _wait(self, attempt):
+        # "Full jitter": spread retries out so parallel workers don't retry in lockstep
+        time.sleep(random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt)))
+
+    def get(self, url, headers=None, timeout=10, **kwargs):
+        """requests.get over the pooled session, retrying timeouts, dropped connections, 429 and 5xx."""
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            self._count(attempt)
+            ticket = self.limiter.acquire(url)
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, headers=headers, timeout=timeout, **kwargs)
+            except RETRY_ERRORS:
+                run_report.observe("request", time.perf_counter() - start)
+                self.limiter.release(ticket, error=True)
+                if last_attempt:
+                    with self._lock:
+                        self.gave_up += 1
+                    raise
+            except BaseException:
+                self.limiter.release(ticket)
+                raise
+            else:
+                run_report.observe("request", time.perf_counter() - start)
+                run_report.add("bytes_downloaded", len(response.content))
+                # elapsed is the time to the response headers: the server's share, whatever the page size
+                self.limiter.release(ticket, response.status_code, response.elapsed.total_seconds(), response.headers.get("Retry-After"))
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                if last_attempt:
+                    with self._lock:
+                        self.gave_up += 1
+                    return response
+                response.close()
+            self._wait(attempt)
+
+    def connection_stats(self):
+        """(connections opened, requests sent over them) for the hosts still pooled."""
+        opened = sent = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+                sent += pool.num_requests
+        return opened, sent
+
+    def summary(self):
+        opened, sent = self.connection_stats()
+        reused = max(sent - opened, 0)
+        share = f" ({reused / sent:.0%})" if sent else ""
+        return (f"{self.requests} requests ({self.retried} retries, {self.gave_up} gave up) over "
+                f"{opened} connections, {reused} on a reused connection{share}; {self.limiter.summary()}")
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def default_client():
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            limiter = rate_control.AdaptiveLimiter(initial=rate_control.INITIAL, max_limit=rate_control.MAX_LIMIT,
+                                                   log_path=rate_control.CONCURRENCY_LOG)
+            _default_client = HttpClient(limiter=limiter)
+        return _default_client
+
+
+def get(url, headers=None, timeout=10, **kwargs):
+    """Drop-in replacement for requests.get using the shared pooled client."""
+    return default_client().get(url, headers=headers, timeout=timeout, **kwargs)
+
+
+def summary():
+    return default_client().summary()
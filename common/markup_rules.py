@@ -0,0 +1,179 @@
+"""Check a section's markup against a set of rules in one walk, stopping at the first that fires.
+
+GetTextBlockHtml's invalidHtml() decides whether a Text Block / Collapsible
+needs an HTML embed CF with a selector pass per rule (dl/dt/form/table, img,
+figure, blockquote, img again for its parent, p then strong/a.btn for the
+"Jump To" buttons), each walking the whole section and most building a full
+list just to count it. The rules are declared instead:
+
+    INVALID_HTML_RULES = MarkupRules([
+        forbidden("dl", "dt", "form", "table"),
+        at_most_one("img"),
+        parent_is("img", "figure"),
+        ...
+    ])
+    INVALID_HTML_RULES.first_violation(section)     # the rule's name, or None
+
+and first_violation() walks the section's descendants once, giving each tag to
+the rules that look at its tag name, and returns as soon as one fires. The
+verdict is the one the selector passes gave; the rule reported is the first to
+fire in document order.
+
+Every rule here fires on a section if it fires on any section inside it, so
+first_violation_in() walks only the outermost of the sections it is given:
+nested ones cannot change the answer.
+"""
+
+
+class Rule:
+    name = None
+    tags = ()           # tag names the rule looks at
+    streamable = False  # visit_start() can stand in for visit()
+
+    def visit(self, tag, root, state):
+        """True when `tag` (a descendant of root) makes the rule fire; state is this rule's, for this walk."""
+        raise NotImplementedError
+
+    def visit_start(self, name, parent, state):
+        """visit() from a start tag event alone: the tag's name and its parent's (common/markup_stream.py)."""
+        raise NotImplementedError(f"Rule '{self.name}' needs the tree; it can't be checked from tag events")
+
+    def new_state(self):
+        return None
+
+
+class _Forbidden(Rule):
+    streamable = True
+
+    def __init__(self, tags):
+        self.tags = tags
+        self.name = f"contains {'/'.join(tags)}"
+
+    def visit(self, tag, root, state):
+        return True
+
+    def visit_start(self, name, parent, state):
+        return True
+
+
+class _AtMostOne(Rule):
+    streamable = True
+
+    def __init__(self, tag):
+        self.tags = (tag,)
+        self.name = f"more than one {tag}"
+
+    def new_state(self):
+        return [0]
+
+    def visit(self, tag, root, state):
+        state[0] += 1
+        return state[0] > 1
+
+    def visit_start(self, name, parent, state):
+        state[0] += 1
+        return state[0] > 1
+
+
+class _ParentIs(Rule):
+    streamable = True
+
+    def __init__(self, tag, parent):
+        self.tags = (tag,)
+        self.parent = parent
+        self.name = f"{tag} outside {parent}"
+
+    def visit(self, tag, root, state):
+        return tag.parent.name != self.parent
+
+    def visit_start(self, name, parent, state):
+        return parent != self.parent
+
+
+class _JumpToButtons(Rule):
+    # A <p> whose first <strong> says "Jump To" and that has an a.btn, anywhere
+    # inside it; each p's state fills in as its strong and a tags come by
+    name = "Jump To buttons"
+    tags = ("strong", "a")
+
+    def new_state(self):
+        return {}       # id(p) -> [first strong seen, it says "Jump To", has a.btn]
+
+    def _paragraphs(self, tag, root, state):
+        for parent in tag.parents:
+            if parent is root or parent is None:
+                break
+            if parent.name == "p":
+                yield state.setdefault(id(parent), [False, False, False])
+
+    def visit(self, tag, root, state):
+        if tag.name == "strong":
+            for p in self._paragraphs(tag, root, state):
+                if not p[0]:
+                    p[0] = True
+                    p[1] = "Jump To" in tag.get_text()
+                if p[1] and p[2]:
+                    return True
+        elif "btn" in tag.get("class", ()):
+            for p in self._paragraphs(tag, root, state):
+                p[2] = True
+                if p[1]:
+                    return True
+        return False
+
+
+def forbidden(*tags):
+    """Fires on any of these tags."""
+    return _Forbidden(tags)
+
+
+def at_most_one(tag):
+    """Fires on the second of this tag."""
+    return _AtMostOne(tag)
+
+
+def parent_is(tag, parent):
+    """Fires on this tag when its parent is not a `parent` tag."""
+    return _ParentIs(tag, parent)
+
+
+def jump_to_buttons():
+    """Fires on a <p> with a "Jump To" <strong> (its first) and an a.btn."""
+    return _JumpToButtons()
+
+
+class MarkupRules:
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.by_tag = {}        # tag name -> [rule], in declaration order
+        for rule in self.rules:
+            for name in rule.tags:
+                self.by_tag.setdefault(name, []).append(rule)
+
+    def first_violation(self, root):
+        """The name of the first rule that fires among root's descendants, or None."""
+        states = {rule: rule.new_state() for rule in self.rules}
+        by_tag = self.by_tag
+        for tag in root.descendants:
+            # strings have no name, so no rules
+            rules = by_tag.get(tag.name)
+            if rules:
+                for rule in rules:
+                    if rule.visit(tag, root, states[rule]):
+                        return rule.name
+        return None
+
+    def first_violation_in(self, sections):
+        """(section, rule name) for the first section, in the order given, with a rule firing; (None, None) if none.
+
+        Sections inside one already walked are skipped.
+        """
+        walked = set()
+        for section in sections:
+            if any(id(parent) in walked for parent in section.parents):
+                continue
+            rule = self.first_violation(section)
+            if rule:
+                return section, rule
+            walked.add(id(section))
+        return None, None
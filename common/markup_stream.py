@@ -0,0 +1,177 @@
+"""Check sections against MarkupRules from the parser's tag events, without building a tree.
+
+common/markup_rules.py walks a parsed section. Most rules need no more than a
+tag's name and its parent's (forbidden, at_most_one, parent_is), and those can
+be checked as the tags go by:
+
+    stream = SectionStream(INVALID_HTML_RULES, "section", {"data-element": SECTION_ELEMENTS})
+    stream.feed(chunk)          # True once the answer is known; stop feeding
+    stream.close()              # the rule that fired, or None
+
+or, for a page already in memory, first_violation(html, rules, "section", {...}).
+The parser's start/end tag events keep a stack of the open tags' names, so
+memory is the page's nesting depth, not its size. Rules are checked inside
+the outermost matching section, with one state for everything in it as
+first_violation_in() gives, and the stream stops at the first rule that
+fires; a valid page is read to the end.
+
+The tag stack follows the tree BeautifulSoup builds from the whole page, so
+the verdicts and the rule reported are the tree check's:
+    lxml          libxml2's own events (implied end tags included), fed to
+                  an lxml target parser in CHUNK_SIZE pieces
+    html.parser   the stdlib tokenizer, with bs4's rules: void elements end at
+                  once, and an end tag closes the nearest open tag of that
+                  name, with everything inside it, or nothing; so a stray
+                  </div> can end a section from outside it
+    html5lib      has no event API; first_violation() parses the page instead
+benchmarks/markup_stream.py checks this against the tree check.
+"""
+from html.parser import HTMLParser
+
+from bs4.builder import HTMLTreeBuilder
+
+from common import html_parser
+
+CHUNK_SIZE = 4096   # characters per feed() in first_violation()
+VOID_ELEMENTS = HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS
+
+
+class _Found(Exception):
+    """Raised from inside the parser's callbacks to stop it at the first rule that fires."""
+
+
+class _Events:
+    # start()/end() from either parser; the state is only the open tags' names
+    def __init__(self, rules, section, attrs):
+        self.rules = rules
+        self.section = section
+        self.attrs = {key: [value] if isinstance(value, str) else list(value) for key, value in attrs.items()}
+        self.stack = []         # names of the open tags
+        self.outer = None       # stack index of the outermost matching section, if in one
+        self.states = None
+        self.rule = None
+
+    def start(self, name, attrs):
+        stack = self.stack
+        if self.outer is not None:
+            rules = self.rules.by_tag.get(name)
+            if rules:
+                parent = stack[-1]
+                for rule in rules:
+                    if rule.visit_start(name, parent, self.states[rule]):
+                        self.rule = rule.name
+                        raise _Found()
+        elif name == self.section and all(attrs.get(key) in values for key, values in self.attrs.items()):
+            self.outer = len(stack)
+            self.states = {rule: rule.new_state() for rule in self.rules.rules}
+        stack.append(name)
+
+    def end(self, name):
+        stack = self.stack
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i] == name:
+                del stack[i:]
+                if self.outer is not None and self.outer >= i:
+                    self.outer = None
+                return
+
+
+class _LxmlTarget:
+    # an lxml parser target: only start and end are called
+    def __init__(self, events):
+        self.start_event = events.start
+        self.end_event = events.end
+
+    def start(self, name, attrs, nsmap=None):
+        self.start_event(name, attrs)
+
+    def end(self, name):
+        self.end_event(name)
+
+    def close(self):
+        return None
+
+
+class _Tokenizer(HTMLParser):
+    def __init__(self, events):
+        super().__init__(convert_charrefs=False)
+        self.events = events
+
+    def handle_starttag(self, tag, attrs):
+        # later duplicate attributes win and a bare attribute is "", as in bs4
+        self.events.start(tag, {key: value or "" for key, value in attrs})
+        if tag in VOID_ELEMENTS:
+            self.events.end(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.events.start(tag, {key: value or "" for key, value in attrs})
+        self.events.end(tag)
+
+    def handle_endtag(self, tag):
+        self.events.end(tag)
+
+
+class SectionStream:
+    def __init__(self, rules, section, attrs, parser=None):
+        """Feed a page to check its `section` elements with these `attrs` (a value or list of values each).
+
+        parser: "lxml" or "html.parser"; html_parser.PARSER by default.
+        """
+        parser = parser or html_parser.PARSER
+        unstreamable = [rule.name for rule in rules.rules if not rule.streamable]
+        if unstreamable:
+            raise ValueError(f"These rules need the tree, not tag events: {', '.join(unstreamable)}")
+        self.events = _Events(rules, section, attrs)
+        if parser == "lxml":
+            from lxml import etree
+            self.parser = etree.HTMLParser(target=_LxmlTarget(self.events), strip_cdata=False, recover=True)
+        elif parser == "html.parser":
+            self.parser = _Tokenizer(self.events)
+        else:
+            raise ValueError(f"HTML parser '{parser}' has no tag events to stream")
+        self.done = False
+        self.fed = 0            # characters fed so far
+
+    @property
+    def rule(self):
+        return self.events.rule
+
+    def feed(self, text):
+        """Feed the next piece of the page; True once a rule has fired and the rest can be skipped."""
+        if self.done:
+            return True
+        if not self.fed and text.startswith("\ufeff"):
+            text = text[1:]
+        self.fed += len(text)
+        try:
+            self.parser.feed(text)
+        except _Found:
+            self.done = True
+        return self.done
+
+    def close(self):
+        """The name of the first rule that fired, or None for a page without one."""
+        if not self.done:
+            self.done = True
+            try:
+                self.parser.close()
+            except _Found:
+                pass
+        return self.rule
+
+
+def first_violation(markup, rules, section, attrs, parser=None):
+    """The name of the first rule that fires in the page's `section` elements with `attrs`, or None.
+
+    The page is fed CHUNK_SIZE characters at a time, and no more once a rule fires.
+    """
+    parser = parser or html_parser.PARSER
+    if parser not in ("lxml", "html.parser"):
+        # the whole page: a stray end tag can close a section from outside it
+        soup = html_parser.parse_html(markup, parser=parser)
+        return rules.first_violation_in(soup.find_all(section, attrs))[1]
+    stream = SectionStream(rules, section, attrs, parser=parser)
+    for offset in range(0, len(markup), CHUNK_SIZE):
+        if stream.feed(markup[offset:offset + CHUNK_SIZE]):
+            break
+    return stream.close()
@@ -0,0 +1,197 @@
+"""Offline page archive: capture what a crawl fetched, replay it without the network.
+
+Iterating on ProfileCF or MagazineCF selectors used to mean re-crawling the live
+site every time, and the results drifted as the site changed. With
+AEM_HTTP_ARCHIVE_MODE=capture every response a script gets through http_cache
+(status, headers, final URL and raw body) is also appended to the archive in
+AEM_HTTP_ARCHIVE. With AEM_HTTP_ARCHIVE_MODE=replay every http_cache.get is
+answered from the archive and nothing touches the network, so re-extracting a
+batch costs CPU time only and gives the same result every time. A URL that was
+never captured raises NotArchived (a requests ConnectionError), which scripts
+report as a failed fetch.
+
+Layout: each capturing process appends to its own segment, so threads share a
+lock and shard processes never write the same file:
+
+    <archive>/<segment>.dat   records: 4-byte length + zlib(JSON header line + body)
+    <archive>/<segment>.idx   one JSON line per record: url, status, offset, length,
+                              body sha256, captured time
+
+Nothing is ever rewritten. On open the .idx lines of every segment are read
+into a dict (the latest capture of a URL wins), so a lookup is one dict hit,
+one seek and one read. A torn last line from a crash is ignored; its record is
+simply not in the archive. Capturing the same body again for a URL adds nothing.
+
+Settings come from the environment:
+    AEM_HTTP_ARCHIVE_MODE       capture | replay (default: off)
+    AEM_HTTP_ARCHIVE            archive directory (default: <repo>/.page_archive)
+"""
+import glob
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+import uuid
+import zlib
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODE = os.environ.get("AEM_HTTP_ARCHIVE_MODE", "").strip().lower() or None
+ARCHIVE_DIR = os.environ.get("AEM_HTTP_ARCHIVE", os.path.join(ROOT, ".page_archive"))
+
+if MODE not in (None, "capture", "replay"):
+    raise ValueError(f"AEM_HTTP_ARCHIVE_MODE must be 'capture' or 'replay', not '{MODE}'")
+
+_HEADER = struct.Struct("<I")
+# Headers that describe the wire encoding rather than the stored (decoded) body
+_DROPPED_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection"}
+
+
+class NotArchived(requests.exceptions.ConnectionError):
+    """Replay asked for a URL the archive doesn't have."""
+
+
+class PageArchive:
+    def __init__(self, archive_dir=ARCHIVE_DIR):
+        self.archive_dir = archive_dir
+        self.captured = 0       # records appended by this process
+        self.replayed = 0
+        self.missing = 0
+        self._lock = threading.Lock()
+        self._index = {}        # url -> its latest .idx entry, plus "segment"
+        self._readers = {}      # segment -> open .dat file
+        self._segment = None    # this process's segment, opened on the first capture
+        self._data = None
+        self._idx = None
+        self._pid = os.getpid()
+        os.makedirs(archive_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        for idx_path in sorted(glob.glob(os.path.join(self.archive_dir, "*.idx"))):
+            segment = os.path.splitext(os.path.basename(idx_path))[0]
+            with open(idx_path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    self._add(entry, segment)
+
+    def _add(self, entry, segment):
+        known = self._index.get(entry["url"])
+        if known is None or entry["at"] >= known["at"]:
+            self._index[entry["url"]] = dict(entry, segment=segment)
+
+    def _check_process(self):
+        # A forked shard worker must not share the parent's file offsets or segment
+        if self._pid != os.getpid():
+            self._readers = {}
+            self._segment = self._data = self._idx = None
+            self._pid = os.getpid()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, url):
+        return url in self._index
+
+    # --- capture ---
+
+    def _open_segment(self):
+        if self._segment is None:
+            self._segment = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+            base = os.path.join(self.archive_dir, self._segment)
+            self._data = open(f"{base}.dat", "ab")
+            self._idx = open(f"{base}.idx", "a", encoding="utf-8")
+
+    def capture(self, url, response):
+        """Append a response to the archive (unless the URL's latest capture has the same status and body)."""
+        body = response.content or b""
+        sha256 = hashlib.sha256(body).hexdigest()
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS}
+        meta = {"url": url, "final_url": response.url, "status": response.status_code, "reason": response.reason, "headers": headers}
+        with self._lock:
+            self._check_process()
+            known = self._index.get(url)
+            if known is not None and known["sha256"] == sha256 and known["status"] == response.status_code:
+                return
+            self._open_segment()
+            record = zlib.compress(json.dumps(meta).encode("utf-8") + b"\n" + body, 6)
+            offset = self._data.tell()
+            self._data.write(_HEADER.pack(len(record)) + record)
+            self._data.flush()
+            # The index line goes last, so it never points at a half-written record
+            entry = {"url": url, "status": response.status_code, "offset": offset, "length": len(record), "sha256": sha256, "at": time.time()}
+            self._idx.write(json.dumps(entry) + "\n")
+            self._idx.flush()
+            self._add(entry, self._segment)
+            self.captured += 1
+
+    # --- replay ---
+
+    def _read(self, url):
+        entry = self._index[url]
+        segment = entry["segment"]
+        reader = self._readers.get(segment)
+        if reader is None:
+            reader = self._readers[segment] = open(os.path.join(self.archive_dir, f"{segment}.dat"), "rb")
+        if segment == self._segment:
+            self._data.flush()
+        reader.seek(entry["offset"] + _HEADER.size)
+        meta, _, body = zlib.decompress(reader.read(entry["length"])).partition(b"\n")
+        return json.loads(meta), body
+
+    def get(self, url):
+        """The archived response for a URL, as a requests.Response; NotArchived if it was never captured."""
+        with self._lock:
+            self._check_process()
+            if url not in self._index:
+                self.missing += 1
+                raise NotArchived(f"{url} is not in the page archive {self.archive_dir}")
+            meta, body = self._read(url)
+            self.replayed += 1
+        response = requests.Response()
+        response.url = meta["final_url"] or url
+        response.status_code = meta["status"]
+        response.reason = meta["reason"]
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        response._content = body
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+    def summary(self):
+        if MODE == "replay":
+            return f"archive replay: {self.replayed} pages, {self.missing} not archived"
+        return f"archive capture: {self.captured} pages added, {len(self._index)} URLs archived"
+
+    def close(self):
+        with self._lock:
+            for f in list(self._readers.values()) + [self._data, self._idx]:
+                if f is not None:
+                    f.close()
+            self._readers = {}
+            self._segment = self._data = self._idx = None
+
+
+_default_archive = None
+_default_archive_lock = threading.Lock()
+
+
+def default_archive():
+    global _default_archive
+    with _default_archive_lock:
+        if _default_archive is None:
+            _default_archive = PageArchive()
+        return _default_archive
+
+
+def summary():
+    """The archive's line for the end-of-run summary, or None when not capturing or replaying."""
+    if MODE is None or _default_archive is None:
+        return None
+    return _default_archive.summary()
@@ -0,0 +1,225 @@
+"""Fetch -> parse -> extract -> emit, once per URL, for any set of extractors.
+
+Identify-component, GetTextBlockHtml (detectComponent.py / detectAndCreateCF.py)
+and SideNav each fetch and parse every page of a URL list on their own, and are
+often run over the same list. run_pipeline() fetches each URL once, parses it
+once, and hands the same tree to every enabled extractor; each extractor's rows
+stream to its own output file.
+
+Extractors are plugins: subclass Extractor, give it a `name` and default
+`output_file`, and register it:
+
+    @register
+    class SideNavCF(Extractor):
+        name = "side_nav"
+        output_file = "side_nav_cf_out.xlsx"
+
+        def extract(self, page):
+            row = side_nav.extract_sidenav(page.html, page.url, soup=page.soup)
+            return [row] if row else []
+
+Crawl/extractors.py registers the extractors of the existing scripts and
+Crawl/crawl.py runs them. Extractors share the parsed page, so they must not
+modify it.
+
+With processes > 0, the fetch threads only download: each page's bytes go to a
+common.cpu_pool worker process that parses it and runs the extractors there,
+so parsing and extraction use that many cores. Extractors are then pickled to
+the workers once, so they must be plain objects (load scripts when called,
+rather than keeping their functions as attributes).
+"""
+import importlib.util
+import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from common import event_log, http_cache, run_report
+from common.cf_sink import open_sink
+from common.cpu_pool import CpuPool, decode
+from common.html_parser import parse_html
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EXTRACTORS = {}     # name -> registered Extractor subclass
+_scripts = {}
+_worker_extractors = None   # the extractors, in a CpuPool worker process
+
+
+def register(cls):
+    """Class decorator adding an Extractor to EXTRACTORS under its name."""
+    if cls.name in EXTRACTORS:
+        raise ValueError(f"An extractor named '{cls.name}' is already registered")
+    EXTRACTORS[cls.name] = cls
+    return cls
+
+
+def load_script(folder, name="detectAndCreateCF"):
+    """Import <repo>/<folder>/<name>.py; every folder has its own detectAndCreateCF.py, so import by path."""
+    key = (folder, name)
+    if key not in _scripts:
+        spec = importlib.util.spec_from_file_location(f"{folder}_{name}".replace("-", "_"), os.path.join(ROOT, folder, f"{name}.py"))
+        module = importlib.util.module_from_spec(spec)
+        # registered like an import, so its functions can be pickled to worker processes
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+        _scripts[key] = module
+    return _scripts[key]
+
+
+class Page:
+    """A fetched page; `soup` is parsed on first use and shared by every extractor."""
+
+    def __init__(self, url, html):
+        self.url = url
+        self.html = html
+        self._soup = None
+
+    @property
+    def soup(self):
+        if self._soup is None:
+            self._soup = parse_html(self.html)
+        return self._soup
+
+
+class Extractor:
+    name = None             # key in EXTRACTORS
+    output_file = None      # default output file; the format follows the extension
+
+    def extract(self, page):
+        """Rows (dicts) for a page fetched with HTTP 200."""
+        raise NotImplementedError
+
+    def failed(self, url, reason):
+        """Rows for a page that could not be fetched; none by default."""
+        return []
+
+
+def fetch_pages(urls, headers, workers=1):
+    """Yield (url, response, error) for every URL, in input order, fetching with `workers` threads."""
+    def fetch(url):
+        try:
+            return url, http_cache.get(url, headers=headers, timeout=10), None
+        except requests.exceptions.RequestException as e:
+            return url, None, e
+
+    if workers <= 1:
+        for url in urls:
+            yield fetch(url)
+        return
+
+    # A small window of fetches in flight, so pages don't pile up ahead of the extractors
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for url in urls:
+            pending.append(pool.submit(fetch, url))
+            if len(pending) >= workers * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def extract_page(extractors, url, html):
+    """Parse a page once and run every extractor on it.
+
+    Returns ({extractor name: rows}, [(extractor name, error text)]) for the
+    extractors that raised, whose rows are then empty.
+    """
+    page = Page(url, html)
+    rows = {}
+    errors = []
+    for extractor in extractors:
+        try:
+            with run_report.stage(f"extract:{extractor.name}"):
+                rows[extractor.name] = list(extractor.extract(page))
+        except Exception as e:
+            rows[extractor.name] = []
+            errors.append((extractor.name, repr(e)))
+    return rows, errors
+
+
+def _init_worker(extractors):
+    global _worker_extractors
+    _worker_extractors = extractors
+
+
+def _extract_task(task):
+    # task: (url, body bytes, encoding) of a page fetched with 200, or None
+    if task is None:
+        return None
+    url, content, encoding = task
+    return extract_page(_worker_extractors, url, decode(content, encoding))
+
+
+def _extracted_pages(urls, extractors, headers, workers, processes):
+    """Yield (url, response, error, extracted) in input order; extracted is extract_page()'s result for 200s."""
+    if processes <= 0:
+        for url, response, error in fetch_pages(urls, headers, workers):
+            ok = error is None and response.status_code == 200
+            yield url, response, error, extract_page(extractors, url, response.text) if ok else None
+        return
+
+    # Fetch threads queue each page's bytes for the worker processes; the pages
+    # wait here until their extraction comes back, in the same order
+    fetched = deque()
+
+    def tasks():
+        for url, response, error in fetch_pages(urls, headers, workers):
+            fetched.append((url, response, error))
+            ok = error is None and response.status_code == 200
+            yield (url, response.content, response.encoding) if ok else None
+
+    with CpuPool(processes, initializer=_init_worker, initargs=(extractors,)) as pool:
+        for extracted in pool.map(_extract_task, tasks()):
+            yield fetched.popleft() + (extracted,)
+
+
+def run_pipeline(urls, extractors, headers, workers=1, processes=0, events=None, max_rows=None, max_mb=None):
+    """Fetch and parse every URL once and stream each extractor's rows to its output_file.
+
+    workers threads fetch; with processes > 0, parsing and extraction run in that
+    many worker processes. Each URL's outcome is recorded in `events`, a
+    common.event_log.EventLog, when given. Returns {extractor name: sink} (closed)
+    so callers can report files and row counts.
+    """
+    def log(type, **fields):
+        if events:
+            events.write(type, **fields)
+
+    sinks = {extractor.name: open_sink(extractor.output_file, max_rows=max_rows, max_mb=max_mb) for extractor in extractors}
+    try:
+        pages = _extracted_pages(urls, extractors, headers, workers, processes)
+        for row_idx_place, (url, response, error, extracted) in enumerate(pages, start=1):
+            if error is not None:
+                reason = "Failed to fetch"
+                run_report.count("failures", reason)
+                print(f"❌ Failed to fetch {url}")
+                log("fetch-error", url=url, error=event_log.fetch_error(error))
+            elif response.status_code != 200:
+                reason = f"HTTP {response.status_code}"
+                run_report.count("failures", reason)
+                print(f"⚠️ {url} → HTTP {response.status_code}")
+                log("http-status", url=url, status=response.status_code)
+            else:
+                # one broken extractor shouldn't lose the others' rows for this page
+                rows, errors = extracted
+                for extractor in extractors:
+                    for row in rows[extractor.name]:
+                        sinks[extractor.name].write(row)
+                for name, problem in errors:
+                    run_report.count("failures", f"{name} failed")
+                    print(f"⚠️ {url} → {name} failed: {problem}")
+                    log("extract-error", url=url, extractor=name, error=problem)
+                print(f"✅ Processed #{row_idx_place}/{len(urls)}: {url}")
+                log("processed", url=url, n=row_idx_place, of=len(urls))
+                continue
+
+            for extractor in extractors:
+                for row in extractor.failed(url, reason):
+                    sinks[extractor.name].write(row)
+    finally:
+        for sink in sinks.values():
+            sink.close()
+    return sinks
@@ -0,0 +1,118 @@
+"""Eaglenet ID -> profile page URL resolution for ProfileCF and ProfileUrls.
+
+Both scripts used to turn the ROT report and the sadea / new profile page
+lists into {id: row} maps with DataFrame.iterrows() and then resolve each ID
+through a chain of isinstance/strip/replace checks. resolve_profile_urls() does
+the whole chain as column operations over every ID at once:
+
+    1. Default Profile Page            (ROT report, lower-cased)
+    2. first entry of All Profile Pages (ROT report, lower-cased, with the
+                                        faculty:/staff:/student: tags removed)
+    3. full url                        (sadea list)
+    4. URL                             (new profile pages list)
+
+and returns, per ID, the live URL (site-relative paths get the www host), the
+AEM stage URL, the AEM page path and which of the sources it came from ("" and
+an empty url when none had one). Duplicate IDs in a sheet resolve to the last
+row, as the old maps did.
+
+ProfileUrls has always had its own chain, and resolve_listed_urls() keeps it:
+the last All Profile Pages entry wins, an ID with no Default Profile Page and
+no All Profile Pages is skipped (url None) rather than looked up in sadea,
+sadea is only tried when All Profile Pages has no usable entry, and a sadea URL
+is used as listed, without the www host.
+"""
+import numpy as np
+import pandas as pd
+
+LIVE_HOST = "https://www.american.edu"
+STAGE_HOST = "https://aem-stage.american.edu"
+PAGE_ROOT = "/content/au"
+
+SOURCES = ("Default Profile Page", "All Profile Pages", "sadea", "new profile pages")
+
+
+def _by_id(sheet, id_column):
+    # One row per ID, the last one winning like `map[row[id_column]] = row` did
+    return sheet.drop_duplicates(id_column, keep="last").set_index(id_column)
+
+
+def _text(values):
+    # Stripped string values; NaN for non-strings and blanks
+    values = values.astype(object)
+    values = values.where(values.map(lambda value: isinstance(value, str))).str.strip()
+    return values.where(values != "")
+
+
+def _all_pages(report):
+    # All Profile Pages, lower-cased, with the faculty:/staff:/student: tags removed
+    all_pages = _text(report["All Profile Pages"]).str.lower()
+    for tag in ("faculty:", "staff:", "student:"):
+        all_pages = all_pages.str.replace(tag, "", regex=False)
+    return all_pages
+
+
+def _locations(url_val, url, source):
+    # ProfileUrls' stage URL and AEM path, from the URL as the sheet had it
+    stage_url = url_val.where(~url_val.str.startswith("/"), STAGE_HOST + url_val)
+    resolved = pd.DataFrame({
+        "url": url,
+        "stage_url": stage_url.str.replace(LIVE_HOST, STAGE_HOST, regex=False).str.replace(".cfm", "", regex=False),
+        "path": PAGE_ROOT + url_val.str.replace(LIVE_HOST, "", regex=False).str.replace(".cfm", "", regex=False),
+        "source": source,
+    })
+    resolved.loc[url_val == "", ["stage_url", "path"]] = ""
+    return resolved
+
+
+def resolve_profile_urls(ids, report, sadea=None, new_pages=None):
+    """DataFrame indexed by the (unique) ids with url, stage_url, path and source columns.
+
+    report is the ROT report sheet, sadea the sadea list and new_pages the new
+    profile pages list, as DataFrames (whole sheets or just the rows for ids);
+    sadea and new_pages are optional.
+    """
+    index = pd.Index(pd.unique(pd.Series(ids, dtype=object)), dtype=object)
+    report = _by_id(report, "Eaglenet ID").reindex(index)
+
+    default_page = _text(report["Default Profile Page"]).str.lower()
+
+    # the first non-empty "|"-separated entry
+    all_pages = _text(_all_pages(report).str.extract(r"([^|]+)", expand=False))
+
+    candidates = [default_page, all_pages]
+    if sadea is not None:
+        candidates.append(_text(_by_id(sadea, "eaglenet_id").reindex(index)["full url"]))
+    else:
+        candidates.append(pd.Series(np.nan, index=index, dtype=object))
+    if new_pages is not None:
+        candidates.append(_text(_by_id(new_pages, "Eaglenet ID").reindex(index)["URL"]))
+    else:
+        candidates.append(pd.Series(np.nan, index=index, dtype=object))
+
+    found = [candidate.notna() for candidate in candidates]
+    url_val = pd.Series(np.select(found, candidates, default=""), index=index, dtype=object)
+    source = pd.Series(np.select(found, SOURCES, default=""), index=index, dtype=object)
+    return _locations(url_val, url_val.where(~url_val.str.startswith("/"), LIVE_HOST + url_val), source)
+
+
+def resolve_listed_urls(ids, report, sadea=None):
+    """resolve_profile_urls() with ProfileUrls' chain (see the module docstring); url is None for skipped IDs."""
+    index = pd.Index(pd.unique(pd.Series(ids, dtype=object)), dtype=object)
+    report = _by_id(report, "Eaglenet ID").reindex(index)
+
+    default_page = _text(report["Default Profile Page"]).str.lower()
+    listed = _text(report["All Profile Pages"]).notna()
+    # the last "|"-separated entry that isn't blank
+    all_pages = _text(_all_pages(report).str.extract(r"([^|]*[^|\s][^|]*)[|\s]*$", expand=False))
+    if sadea is not None:
+        sadea_page = _text(_by_id(sadea, "eaglenet_id").reindex(index)["full url"])
+    else:
+        sadea_page = pd.Series(np.nan, index=index, dtype=object)
+
+    found = [default_page.notna(), all_pages.notna(), listed & sadea_page.notna()]
+    url_val = pd.Series(np.select(found, [default_page, all_pages, sadea_page], default=""), index=index, dtype=object)
+    source = pd.Series(np.select(found, SOURCES[:2] + ("sadea",), default=""), index=index, dtype=object)
+    url = url_val.where(~url_val.str.startswith("/") | (source == "sadea"), LIVE_HOST + url_val)
+    skipped = default_page.isna() & ~listed
+    return _locations(url_val, pd.Series(np.where(skipped, None, url), index=index, dtype=object), source)
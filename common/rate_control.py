@@ -0,0 +1,241 @@
+"""Adaptive per-host concurrency for requests to the legacy CMS.
+
+A fixed number of parallel requests is either too timid (the server could take
+more) or trips the WAF (429/503) once crawls overlap. AdaptiveLimiter decides
+how many requests may be in flight to each host and adjusts it as responses
+come back, AIMD style:
+
+  * every WINDOW responses it takes their p95 latency; if that is within
+    LATENCY_HOLD of the host's baseline and the limit was actually in use, the
+    limit goes up by one
+  * between LATENCY_HOLD and LATENCY_TOLERANCE the limit stays where it is;
+    past LATENCY_TOLERANCE it is cut by LATENCY_BACKOFF
+  * a 429 or 503, a timeout or a dropped connection cuts it by OVERLOAD_BACKOFF
+    (once per round: the other requests already in flight report the same
+    overload and don't cut it again)
+  * a Retry-After header holds every new request to that host until it expires
+  * once back near the limit that drew the last 429/503, it only probes one
+    step higher every PROBE_WINDOWS stable samples
+
+common.http_client takes a slot around every network request, so ProfileCF,
+MagazineCF, the component scanners and Crawl all share it; their worker pools
+only set the ceiling. Processes that fetch side by side (common/sharding.py)
+each call share_limits() first, so between them they stay within one host's
+limits rather than a multiple of them. With AEM_HTTP_CONCURRENCY_LOG set, the default client
+writes each change of limit to that CSV (seconds since start, host, limit, in
+flight, p95 ms, event) so a run's concurrency can be plotted afterwards.
+
+Settings come from the environment:
+    AEM_HTTP_CONCURRENCY        starting limit per host (default 4)
+    AEM_HTTP_CONCURRENCY_MIN    lowest limit (default 1)
+    AEM_HTTP_CONCURRENCY_MAX    highest limit (default 16)
+    AEM_HTTP_LATENCY_WINDOW     responses per p95 sample (default 20)
+    AEM_HTTP_CONCURRENCY_LOG    CSV log of limit changes (default: none)
+"""
+import email.utils
+import math
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+INITIAL = int(os.environ.get("AEM_HTTP_CONCURRENCY", 4))
+MIN_LIMIT = int(os.environ.get("AEM_HTTP_CONCURRENCY_MIN", 1))
+MAX_LIMIT = int(os.environ.get("AEM_HTTP_CONCURRENCY_MAX", 16))
+WINDOW = int(os.environ.get("AEM_HTTP_LATENCY_WINDOW", 20))
+CONCURRENCY_LOG = os.environ.get("AEM_HTTP_CONCURRENCY_LOG", "")
+
+LATENCY_HOLD = 1.2          # p95 this many times the baseline stops increases
+LATENCY_TOLERANCE = 1.5     # p95 this many times the baseline counts as rising
+LATENCY_BACKOFF = 0.75      # limit multiplier when latency rises
+OVERLOAD_BACKOFF = 0.5      # limit multiplier on 429/503 or a failed connection
+RETRY_AFTER_MAX = 300       # never hold a host longer than this, whatever it asks
+LATENCY_FLOOR = 0.05        # baselines below this count as this much; sub-50 ms jitter is noise
+PROBE_WINDOWS = 5           # stable samples before probing past the last overloaded limit
+
+# The server telling us to slow down
+OVERLOAD_STATUSES = {429, 503}
+
+
+def share_limits(processes):
+    """Cut this process's INITIAL and MAX_LIMIT to its share of `processes` processes fetching from the same hosts."""
+    global INITIAL, MAX_LIMIT
+    MAX_LIMIT = max(MIN_LIMIT, MAX_LIMIT // processes)
+    INITIAL = max(MIN_LIMIT, min(INITIAL // processes, MAX_LIMIT))
+
+
+def retry_after_seconds(value):
+    """Seconds to wait for a Retry-After header (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+class _Host:
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.peak = 0               # most in flight since the last sample
+        self.latencies = []
+        self.baseline = None        # p95 (seconds) the host normally answers in
+        self.p95 = None
+        self.blocked_until = 0.0    # monotonic time a Retry-After expires
+        self.last_decrease = 0.0
+        self.overloaded_at = None   # limit that drew the last 429/503/connection failure
+        self.probe_wait = 0         # stable samples spent below it
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial=INITIAL, min_limit=MIN_LIMIT, max_limit=MAX_LIMIT, window=WINDOW, log_path=None):
+        self.initial = max(min_limit, min(initial, max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.window = window
+        self.log_path = log_path
+        self.increases = 0
+        self.backoffs = 0
+        self.retry_after_waits = 0
+        self.history = []           # (seconds since start, host, limit, event) for every change
+        self._hosts = {}
+        self._cond = threading.Condition()
+        self._start = time.monotonic()
+        self._log = None
+
+    # --- slots ---
+
+    def acquire(self, url):
+        """Wait for a free slot on the URL's host; returns the ticket to hand to release()."""
+        host = urlparse(url).netloc
+        with self._cond:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = _Host(self.initial)
+                self._record(host, state, "start")
+            while True:
+                wait = state.blocked_until - time.monotonic()
+                if wait <= 0 and state.in_flight < state.limit:
+                    break
+                self._cond.wait(wait if wait > 0 else None)
+            state.in_flight += 1
+            state.peak = max(state.peak, state.in_flight)
+            return host, time.monotonic()
+
+    def release(self, ticket, status=None, latency=None, retry_after=None, error=False):
+        """Free the slot and adjust the host's limit from how the request went.
+
+        status/latency/retry_after describe the response; error=True means the
+        request timed out or lost its connection. With none of them (e.g. the
+        request raised for an unrelated reason) the slot is only freed.
+        """
+        host, started = ticket
+        with self._cond:
+            state = self._hosts[host]
+            state.in_flight -= 1
+            delay = retry_after_seconds(retry_after)
+            if delay:
+                state.blocked_until = max(state.blocked_until, time.monotonic() + min(delay, RETRY_AFTER_MAX))
+                self.retry_after_waits += 1
+                self._record(host, state, f"Retry-After {delay:.0f}s")
+            if error or status in OVERLOAD_STATUSES:
+                if started >= state.last_decrease:
+                    state.overloaded_at = state.limit
+                self._decrease(host, state, started, OVERLOAD_BACKOFF, "connection failed" if error else f"HTTP {status}")
+            elif latency is not None and started >= state.last_decrease:
+                # (requests sent before the last cut still show the old queue)
+                state.latencies.append(latency)
+                if len(state.latencies) >= self.window:
+                    self._sample(host, state, started)
+            self._cond.notify_all()
+
+    # --- adjusting ---
+
+    def _decrease(self, host, state, started, factor, event):
+        # Requests sent before the last cut report the overload that caused it
+        if started < state.last_decrease:
+            return
+        state.last_decrease = time.monotonic()
+        state.latencies = []
+        state.peak = state.in_flight
+        limit = max(self.min_limit, int(state.limit * factor))
+        if limit != state.limit:
+            state.limit = limit
+            self.backoffs += 1
+            self._record(host, state, event)
+
+    def _sample(self, host, state, started):
+        latencies = sorted(state.latencies)
+        p95 = latencies[min(len(latencies) - 1, math.ceil(len(latencies) * 0.95) - 1)]
+        saturated = state.peak >= state.limit
+        state.latencies = []
+        state.peak = state.in_flight
+        state.p95 = p95
+
+        if state.baseline is None:
+            state.baseline = p95
+        elif p95 > max(state.baseline, LATENCY_FLOOR) * LATENCY_TOLERANCE:
+            if state.limit > self.min_limit:
+                self._decrease(host, state, started, LATENCY_BACKOFF, f"p95 {p95 * 1000:.0f} ms rising")
+                return
+            # Already at the floor: this is simply how fast the host answers now
+            state.baseline = p95
+            return
+        elif p95 < state.baseline:
+            state.baseline = p95
+        else:
+            # Let the baseline follow slow drift, so the host getting a little slower
+            # overall doesn't read as overload forever
+            state.baseline = 0.95 * state.baseline + 0.05 * p95
+
+        if p95 > max(state.baseline, LATENCY_FLOOR) * LATENCY_HOLD:
+            return
+        if saturated and state.limit < self.max_limit:
+            if state.overloaded_at is not None and state.limit + 1 >= state.overloaded_at:
+                state.probe_wait += 1
+                if state.probe_wait < PROBE_WINDOWS:
+                    return
+                state.probe_wait = 0
+                state.overloaded_at = None
+            state.limit += 1
+            self.increases += 1
+            self._record(host, state, f"p95 {p95 * 1000:.0f} ms stable")
+
+    # --- reporting ---
+
+    def _record(self, host, state, event):
+        elapsed = time.monotonic() - self._start
+        self.history.append((elapsed, host, state.limit, event))
+        if not self.log_path:
+            return
+        if self._log is None:
+            self._log = open(self.log_path, "w", encoding="utf-8")
+            self._log.write("seconds,host,limit,in_flight,p95_ms,event\n")
+        p95 = f"{state.p95 * 1000:.0f}" if state.p95 is not None else ""
+        self._log.write(f"{elapsed:.3f},{host},{state.limit},{state.in_flight},{p95},{event}\n")
+        self._log.flush()
+
+    def limits(self):
+        """{host: current limit}."""
+        with self._cond:
+            return {host: state.limit for host, state in self._hosts.items()}
+
+    def summary(self):
+        with self._cond:
+            if not self._hosts:
+                return "concurrency not used"
+            limits = [limit for _, _, limit, _ in self.history]
+            now = max(state.limit for state in self._hosts.values())
+        return (f"concurrency {min(limits)}-{max(limits)} per host (now {now}), "
+                f"{self.increases} increases, {self.backoffs} backoffs, {self.retry_after_waits} Retry-After waits")
+
+    def close(self):
+        with self._cond:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
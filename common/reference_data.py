@@ -0,0 +1,158 @@
+"""Indexed SQLite sidecars for the reference workbooks.
+
+ProfileCF and ProfileUrls look up their input IDs in 2025_profilerotreport.xlsx,
+sadeaList.xlsx and new_profile_pages.xlsx. Reading those with pd.read_excel
+parses every cell through openpyxl and takes seconds on each run, however few
+IDs the batch has. ReferenceSheet converts a sheet once into a SQLite file
+(one table, indexed on the ID column) under .reference_cache/ next to the
+workbook, and later runs look rows up there through a memory-mapped read-only
+connection:
+
+    report = ReferenceSheet("2025_profilerotreport.xlsx", "2025_profilerotreport", "Eaglenet ID")
+    rows = report.rows(idsToProcess)       # {id: {column: value}}
+    frame = report.frame(idsToProcess)     # the same rows as a DataFrame
+
+The sidecar remembers the workbook's mtime, size and sha256. When mtime or
+size differ the workbook is hashed, and only rebuilt if the content changed.
+Empty cells come back as None and dates as ISO strings.
+"""
+import datetime
+import hashlib
+import json
+import os
+import re
+import sqlite3
+
+import pandas as pd
+
+# Bump when the sidecar layout changes so old files are rebuilt
+SIDECAR_VERSION = 1
+MMAP_BYTES = 256 * 1024 * 1024
+_LOOKUP_CHUNK = 500     # ids per IN (...) query, under SQLite's variable limit
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cell(value):
+    # Plain Python values SQLite can store
+    if pd.isna(value):
+        return None
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()     # numpy scalar
+    return value
+
+
+class ReferenceSheet:
+    def __init__(self, xlsx_file, sheet_name, id_column, cache_dir=None):
+        self.xlsx_file = xlsx_file
+        self.sheet_name = sheet_name
+        self.id_column = id_column
+        cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(xlsx_file)), ".reference_cache")
+        base = os.path.splitext(os.path.basename(xlsx_file))[0]
+        sheet = re.sub(r"[^\w-]", "_", sheet_name)
+        self.sidecar_file = os.path.join(cache_dir, f"{base}.{sheet}.sqlite")
+        self.built = self._ensure_sidecar()
+
+        self._db = sqlite3.connect(f"file:{self.sidecar_file}?mode=ro", uri=True)
+        self._db.execute(f"PRAGMA mmap_size={MMAP_BYTES}")
+        self.columns = json.loads(self._db.execute("SELECT value FROM meta WHERE key = 'columns'").fetchone()[0])
+        self._id_col = f"c{self.columns.index(id_column)}"
+
+    # --- sidecar ---
+
+    def _read_meta(self):
+        try:
+            db = sqlite3.connect(f"file:{self.sidecar_file}?mode=ro", uri=True)
+            try:
+                return dict(db.execute("SELECT key, value FROM meta"))
+            finally:
+                db.close()
+        except sqlite3.Error:
+            return None
+
+    def _ensure_sidecar(self):
+        """Build the sidecar unless it matches the workbook; True when it was (re)built."""
+        stat = os.stat(self.xlsx_file)
+        meta = self._read_meta() if os.path.exists(self.sidecar_file) else None
+        if meta and meta.get("version") == str(SIDECAR_VERSION) and meta.get("sheet") == self.sheet_name \
+                and meta.get("id_column") == self.id_column:
+            if meta.get("mtime_ns") == str(stat.st_mtime_ns) and meta.get("size") == str(stat.st_size):
+                return False
+            digest = _file_hash(self.xlsx_file)
+            if meta.get("sha256") == digest:
+                # touched or copied, same content: just remember the new mtime
+                with sqlite3.connect(self.sidecar_file) as db:
+                    db.executemany("UPDATE meta SET value = ? WHERE key = ?",
+                                   [(str(stat.st_mtime_ns), "mtime_ns"), (str(stat.st_size), "size")])
+                db.close()
+                return False
+        else:
+            digest = _file_hash(self.xlsx_file)
+        self._build(stat, digest)
+        return True
+
+    def _build(self, stat, digest):
+        sheet = pd.read_excel(self.xlsx_file, sheet_name=self.sheet_name)
+        columns = [str(column) for column in sheet.columns]
+        if self.id_column not in columns:
+            raise ValueError(f"Column '{self.id_column}' not found in sheet '{self.sheet_name}' of {self.xlsx_file}")
+        sql_columns = [f"c{i}" for i in range(len(columns))]
+
+        os.makedirs(os.path.dirname(self.sidecar_file), exist_ok=True)
+        tmp_file = f"{self.sidecar_file}.tmp"
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        db = sqlite3.connect(tmp_file)
+        db.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        db.execute(f"CREATE TABLE rows ({', '.join(sql_columns)})")
+        db.executemany(
+            f"INSERT INTO rows VALUES ({', '.join('?' * len(columns))})",
+            ([_cell(value) for value in row] for row in sheet.itertuples(index=False, name=None)),
+        )
+        db.execute(f"CREATE INDEX rows_id ON rows(c{columns.index(self.id_column)})")
+        db.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("version", str(SIDECAR_VERSION)),
+            ("sheet", self.sheet_name),
+            ("id_column", self.id_column),
+            ("columns", json.dumps(columns)),
+            ("mtime_ns", str(stat.st_mtime_ns)),
+            ("size", str(stat.st_size)),
+            ("sha256", digest),
+        ])
+        db.commit()
+        db.close()
+        os.replace(tmp_file, self.sidecar_file)
+
+    # --- lookups ---
+
+    def _select(self, ids):
+        # Matching rows in sheet order, so later duplicates come last
+        ids = list(dict.fromkeys(ids))
+        found = []
+        for start in range(0, len(ids), _LOOKUP_CHUNK):
+            chunk = ids[start:start + _LOOKUP_CHUNK]
+            found += self._db.execute(
+                f"SELECT rowid, * FROM rows WHERE {self._id_col} IN ({', '.join('?' * len(chunk))})", chunk
+            ).fetchall()
+        found.sort()
+        return [row[1:] for row in found]
+
+    def rows(self, ids):
+        """{id: {column: value}} for the ids present in the sheet; a repeated id gets its last row."""
+        id_index = self.columns.index(self.id_column)
+        return {row[id_index]: dict(zip(self.columns, row)) for row in self._select(ids)}
+
+    def frame(self, ids):
+        """DataFrame of every sheet row whose id is in ids, in sheet order."""
+        return pd.DataFrame(self._select(ids), columns=self.columns, dtype=object)
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,339 @@
+"""Per-stage timings and counters for a run, written as a JSON report at exit.
+
+The only record of a run used to be the emoji print lines and one log line per
+URL, which say what happened to each page but not where the hours went. The
+shared modules now time their own stages into the process's RunReport:
+
+    fetch       http_cache.get, cache and retries included
+    request     one network attempt of http_client (headers and body)
+    parse       html_parser.parse_html
+    write       one cf_sink row
+    save        closing a cf_sink output file (an .xlsx is built here)
+
+and count HTTP statuses, fetch errors, body bytes and the rows written to each
+output. Scripts add their own stages, failure reasons and rows:
+
+    with run_report.stage("extract"):
+        cf, problem = extract_profile(...)
+    run_report.count("failures", problem)
+    run_report.emit("input.xlsx:expanded")
+
+Stages nest where the code does (an extract that parses includes that parse).
+A script calls run_report.start(__file__) in its main(); the report is then
+written when the script exits, next to the log files, as
+<script>_run_report.json. Other processes' figures come back with their
+results: cpu_pool workers after every batch, sharding shards when they finish.
+
+    python -m common.run_report report.json [other_report.json]
+
+prints a report's stages and counters, or compares two runs side by side.
+
+Settings come from the environment:
+    AEM_RUN_REPORT      report path (default: <script>_run_report.json); 0 = no report
+"""
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+REPORT_PATH = os.environ.get("AEM_RUN_REPORT", "")
+# Histogram bucket upper bounds in milliseconds; anything slower lands in the last, open bucket
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+
+class Histogram:
+    """Count, total, min, max and a log-scale bucket histogram of durations."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+        self.buckets[bisect_left(BUCKETS_MS, seconds * 1000)] += 1
+
+    def merge(self, other):
+        self.count += other["count"]
+        self.total += other["total"]
+        if other["min"] is not None:
+            self.min = other["min"] if self.min is None else min(self.min, other["min"])
+        if other["max"] is not None:
+            self.max = other["max"] if self.max is None else max(self.max, other["max"])
+        for i, n in enumerate(other["buckets"]):
+            self.buckets[i] += n
+
+    def quantile(self, q):
+        # Interpolated within the bucket holding the q-th duration, and kept within min..max
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            if n and seen + n >= rank:
+                lower = BUCKETS_MS[i - 1] / 1000 if i else 0.0
+                upper = BUCKETS_MS[i] / 1000 if i < len(BUCKETS_MS) else self.max
+                value = lower + (upper - lower) * (rank - seen) / n
+                return min(max(value, self.min), self.max)
+            seen += n
+        return self.max
+
+    def state(self):
+        return {"count": self.count, "total": self.total, "min": self.min, "max": self.max, "buckets": list(self.buckets)}
+
+    def to_dict(self):
+        ms = lambda seconds: None if seconds is None else round(seconds * 1000, 3)
+        labels = [f"<={bound}ms" for bound in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"]
+        return {
+            "count": self.count,
+            "total_s": round(self.total, 3),
+            "mean_ms": ms(self.total / self.count) if self.count else None,
+            "min_ms": ms(self.min),
+            "p50_ms": ms(self.quantile(0.5)),
+            "p90_ms": ms(self.quantile(0.9)),
+            "p99_ms": ms(self.quantile(0.99)),
+            "max_ms": ms(self.max),
+            "histogram": {label: n for label, n in zip(labels, self.buckets) if n},
+        }
+
+
+class RunReport:
+    def __init__(self):
+        self.stages = {}        # stage name -> Histogram
+        self.counters = {}      # group -> {key: count}
+        self.totals = {}        # name -> running sum (bytes, rows, ...)
+        self.script = None
+        self.path = None
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._extras = {}       # name -> fn() giving a summary value, called when the report is written
+
+    # --- recording ---
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.stages.get(name)
+            if histogram is None:
+                histogram = self.stages[name] = Histogram()
+            histogram.add(seconds)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def count(self, group, key, n=1):
+        key = str(key)
+        with self._lock:
+            counter = self.counters.setdefault(group, {})
+            counter[key] = counter.get(key, 0) + n
+
+    def add(self, name, n):
+        with self._lock:
+            self.totals[name] = self.totals.get(name, 0) + n
+
+    def emit(self, output, n=1):
+        """Count n rows written to `output` (a file, or a workbook sheet)."""
+        self.count("rows", output, n)
+        self.add("rows_emitted", n)
+
+    def attach(self, name, fn):
+        """Include fn() (e.g. a module's summary line) under `name` when the report is written."""
+        self._extras[name] = fn
+
+    # --- other processes ---
+
+    def drain(self):
+        """This report's figures as plain data for merge() in another process, leaving it empty."""
+        with self._lock:
+            state = {
+                "stages": {name: histogram.state() for name, histogram in self.stages.items()},
+                "counters": self.counters,
+                "totals": self.totals,
+            }
+            self.stages, self.counters, self.totals = {}, {}, {}
+        return state
+
+    def merge(self, state):
+        with self._lock:
+            for name, other in state["stages"].items():
+                self.stages.setdefault(name, Histogram()).merge(other)
+            for group, counter in state["counters"].items():
+                mine = self.counters.setdefault(group, {})
+                for key, n in counter.items():
+                    mine[key] = mine.get(key, 0) + n
+            for name, n in state["totals"].items():
+                self.totals[name] = self.totals.get(name, 0) + n
+
+    # --- output ---
+
+    def to_dict(self):
+        finished = time.time()
+        report = {
+            "script": self.script,
+            "argv": sys.argv,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "finished": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(finished)),
+            "seconds": round(finished - self.started, 3),
+            "settings": {name: value for name, value in sorted(os.environ.items()) if name.startswith("AEM_")},
+        }
+        with self._lock:
+            report["totals"] = dict(sorted(self.totals.items()))
+            report["stages"] = {name: histogram.to_dict() for name, histogram in self.stages.items()}
+            report["counters"] = {
+                group: dict(sorted(counter.items(), key=lambda item: -item[1])) for group, counter in sorted(self.counters.items())
+            }
+        for name, fn in self._extras.items():
+            try:
+                report[name] = fn()
+            except Exception as e:
+                report[name] = f"unavailable: {e!r}"
+        return report
+
+    def write(self, path=None):
+        path = path or self.path
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=1, default=str)
+            f.write("\n")
+        os.replace(tmp_path, path)
+        return path
+
+
+_default_report = RunReport()
+_started_pid = None
+
+
+def default_report():
+    return _default_report
+
+
+def start(script_file, path=None):
+    """Name the run after the script and write its report when the process exits."""
+    global _started_pid
+    report = _default_report
+    script = os.path.abspath(script_file)
+    report.script = os.path.relpath(script, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    report.started = time.time()
+    report.path = path or REPORT_PATH or f"{os.path.splitext(os.path.basename(script))[0]}_run_report.json"
+    if report.path != "0" and _started_pid is None:
+        _started_pid = os.getpid()
+        atexit.register(_write_at_exit)
+    return report
+
+
+def _write_at_exit():
+    # Worker processes forked from the script inherit the atexit hook; only the script writes
+    if os.getpid() != _started_pid or _default_report.path == "0":
+        return
+    try:
+        path = _default_report.write()
+        print(f"📊 Run report written to {path}")
+    except OSError as e:
+        print(f"⚠️ Run report not written: {e}")
+
+
+def reset():
+    """Forget everything recorded so far, in a worker process that inherited the parent's figures."""
+    _default_report.drain()
+
+
+def stage(name):
+    return _default_report.stage(name)
+
+
+def observe(name, seconds):
+    _default_report.observe(name, seconds)
+
+
+def count(group, key, n=1):
+    _default_report.count(group, key, n)
+
+
+def add(name, n):
+    _default_report.add(name, n)
+
+
+def emit(output, n=1):
+    _default_report.emit(output, n)
+
+
+def attach(name, fn):
+    _default_report.attach(name, fn)
+
+
+def drain():
+    return _default_report.drain()
+
+
+def merge(state):
+    _default_report.merge(state)
+
+
+# --- python -m common.run_report ---
+
+def _print_report(report):
+    print(f"{report['script']}  {report['started']} -> {report['finished']}  ({report['seconds']:.1f}s)")
+    print(f"\n{'stage':<20}{'count':>9}{'total s':>11}{'mean ms':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, s in sorted(report["stages"].items(), key=lambda item: -item[1]["total_s"]):
+        cells = "".join(f"{s[key]:10.1f}" if s[key] is not None else f"{'':>10}" for key in ("mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms"))
+        print(f"{name:<20}{s['count']:9d}{s['total_s']:11.1f}{cells}")
+    if report["totals"]:
+        print()
+        for name, n in report["totals"].items():
+            print(f"{name:<30}{n:>14,}")
+    for group, counter in report["counters"].items():
+        print(f"\n{group}")
+        for key, n in counter.items():
+            print(f"  {n:>9,}  {key}")
+
+
+def _compare(a, b):
+    print(f"A: {a['script']}  {a['started']}  ({a['seconds']:.1f}s)")
+    print(f"B: {b['script']}  {b['started']}  ({b['seconds']:.1f}s)")
+    print(f"\n{'stage':<20}{'A count':>9}{'B count':>9}{'A total s':>11}{'B total s':>11}{'A p90 ms':>10}{'B p90 ms':>10}")
+    for name in sorted(set(a["stages"]) | set(b["stages"])):
+        sa, sb = a["stages"].get(name, {}), b["stages"].get(name, {})
+        cell = lambda s, key, fmt, width: format(s[key], fmt) if s.get(key) is not None else f"{'-':>{width}}"
+        print(f"{name:<20}{cell(sa, 'count', '9d', 9)}{cell(sb, 'count', '9d', 9)}{cell(sa, 'total_s', '11.1f', 11)}"
+              f"{cell(sb, 'total_s', '11.1f', 11)}{cell(sa, 'p90_ms', '10.1f', 10)}{cell(sb, 'p90_ms', '10.1f', 10)}")
+    totals = sorted(set(a["totals"]) | set(b["totals"]))
+    if totals:
+        print()
+        for name in totals:
+            print(f"{name:<30}{a['totals'].get(name, 0):>14,}{b['totals'].get(name, 0):>14,}")
+    for group in sorted(set(a["counters"]) | set(b["counters"])):
+        ca, cb = a["counters"].get(group, {}), b["counters"].get(group, {})
+        print(f"\n{group}")
+        for key in sorted(set(ca) | set(cb), key=lambda k: -(ca.get(k, 0) + cb.get(k, 0))):
+            print(f"  {ca.get(key, 0):>9,}{cb.get(key, 0):>9,}  {key}")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) not in (1, 2):
+        sys.exit("usage: python -m common.run_report report.json [other_report.json]")
+    reports = []
+    for path in argv:
+        with open(path, encoding="utf-8") as f:
+            reports.append(json.load(f))
+    if len(reports) == 1:
+        _print_report(reports[0])
+    else:
+        _compare(*reports)
+
+
+if __name__ == "__main__":
+    main()
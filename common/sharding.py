@@ -0,0 +1,175 @@
+"""Split a batch across worker processes and merge the results back in input order.
+
+Big ProfileCF jobs used to be cut into ProfileCF/1000, 2000, ... by hand and run
+one copy after another. run_sharded() does it in one run: every item (an ID or
+URL) goes to shard shard_of(item, shards), a stable hash that doesn't change
+between runs or machines, and each shard runs in its own process, so parsing
+and extraction use every core rather than one.
+
+Each shard streams its results to a spool file as they are produced
+(length-prefixed pickles, so rows come back with exactly the types they had).
+The parent reads them back in the order of the original list: for each item it
+takes the next result from that item's shard. Whatever the parent writes from
+them (CF rows, event log records) comes out exactly as a serial run
+would write it, however the shards' timing interleaves.
+
+    results = run_sharded(todo, SHARDS, work, args=(...))
+    for result in results:      # one per item of todo, in todo's order
+        ...
+    results.summaries           # one line per shard on its HTTP traffic
+
+Each shard's common.run_report figures are added to the parent's report when
+the shard finishes. Every shard has its own HTTP client, with 1/shards of the
+per-host concurrency limits (common/rate_control.py), so the shards together
+put no more load on a host than one process would.
+
+`work(shard_items, *args)` must yield one result per item, in the order given,
+and be a module-level function so it can be run in the worker process.
+"""
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+import time
+import traceback
+import zlib
+from multiprocessing import Process
+
+from common import http_cache, rate_control, run_report
+
+_HEADER = struct.Struct("<I")
+_POLL = 0.05        # seconds between looks at a spool file that hasn't caught up
+
+
+def shard_of(item, shards):
+    """Shard number of an item; the same for the same item on every run (unlike hash())."""
+    return zlib.crc32(str(item).encode("utf-8")) % shards
+
+
+def split(items, shards):
+    """Items grouped by shard, each group in input order."""
+    groups = [[] for _ in range(shards)]
+    for item in items:
+        groups[shard_of(item, shards)].append(item)
+    return groups
+
+
+def _write_record(spool, record):
+    data = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+    spool.write(_HEADER.pack(len(data)) + data)
+    spool.flush()
+
+
+def _run_shard(number, shards, spool_path, work, items, args):
+    # Each process has its own HTTP client: give it its share of the per-host limits,
+    # and keep its concurrency log apart from the others'
+    rate_control.share_limits(shards)
+    if rate_control.CONCURRENCY_LOG:
+        base, ext = os.path.splitext(rate_control.CONCURRENCY_LOG)
+        rate_control.CONCURRENCY_LOG = f"{base}_shard{number}{ext}"
+    run_report.reset()
+    with open(spool_path, "wb") as spool:
+        try:
+            for item, result in zip(items, work(items, *args)):
+                _write_record(spool, ("result", item, result))
+            _write_record(spool, ("done", None, (http_cache.summary(), run_report.drain())))
+        except BaseException:
+            _write_record(spool, ("error", None, traceback.format_exc()))
+            raise
+
+
+class _SpoolReader:
+    """Reads a shard's records as its process appends them."""
+
+    def __init__(self, number, path, process):
+        self.number = number
+        self.path = path
+        self.process = process
+        self._file = None
+
+    def _read(self, size):
+        start = self._file.tell()
+        data = self._file.read(size)
+        if len(data) == size:
+            return data
+        # Not written yet: go back and try again once there is more
+        self._file.seek(start)
+        return None
+
+    def next_record(self):
+        while True:
+            if self._file is None and os.path.exists(self.path):
+                self._file = open(self.path, "rb")
+            if self._file is not None:
+                start = self._file.tell()
+                header = self._read(_HEADER.size)
+                if header is not None:
+                    data = self._read(_HEADER.unpack(header)[0])
+                    if data is not None:
+                        return pickle.loads(data)
+                    self._file.seek(start)
+            if not self.process.is_alive() and self._caught_up():
+                raise RuntimeError(f"Shard {self.number} stopped (exit code {self.process.exitcode}) without finishing")
+            time.sleep(_POLL)
+
+    def _caught_up(self):
+        # The process is gone; anything it wrote is on disk by now
+        return self._file is None or self._file.tell() == os.path.getsize(self.path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class ShardedRun:
+    """Iterator over the merged results of run_sharded(); see the module docstring."""
+
+    def __init__(self, items, shards, work, args, spool_dir=None):
+        self.items = list(items)
+        self.shards = shards
+        self.summaries = []
+        self._spool_dir = tempfile.mkdtemp(prefix="shards_", dir=spool_dir)
+        self._readers = []
+        for number, shard_items in enumerate(split(self.items, shards)):
+            path = os.path.join(self._spool_dir, f"shard{number}.spool")
+            process = Process(target=_run_shard, args=(number, shards, path, work, shard_items, args))
+            process.start()
+            self._readers.append(_SpoolReader(number, path, process))
+
+    def __iter__(self):
+        try:
+            for item in self.items:
+                reader = self._readers[shard_of(item, self.shards)]
+                kind, got, result = reader.next_record()
+                if kind == "error":
+                    raise RuntimeError(f"Shard {reader.number} failed:\n{result}")
+                if got != item:
+                    raise RuntimeError(f"Shard {reader.number} returned {got!r} where {item!r} was expected")
+                yield result
+            for reader in self._readers:
+                kind, _, result = reader.next_record()
+                if kind == "error":
+                    raise RuntimeError(f"Shard {reader.number} failed:\n{result}")
+                summary, figures = result
+                self.summaries.append(f"shard {reader.number}: {summary}")
+                run_report.merge(figures)
+        finally:
+            self.close()
+
+    def close(self):
+        for reader in self._readers:
+            if reader.process.is_alive():
+                reader.process.terminate()
+            reader.process.join()
+            reader.close()
+        self._readers = []
+        shutil.rmtree(self._spool_dir, ignore_errors=True)
+
+
+def run_sharded(items, shards, work, args=(), spool_dir=None):
+    """Run work(shard_items, *args) for each of `shards` shards in its own process.
+
+    Returns a ShardedRun: iterate it for the results of every item, in input order.
+    """
+    return ShardedRun(items, shards, work, args, spool_dir=spool_dir)